@@ -1,8 +1,16 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 import google.generativeai as genai
 from flask import Blueprint, jsonify
 import json
+from llm_cache import llm_cache, prompt_key
+from singleflight import llm_flight
+from dish_stream import ArrayObjectParser
+from llm_client import get_client
+from db_config import db, read_db
+import inventory
+from surplus_matching import match_surplus
 
 # Load environment variables
 load_dotenv()
@@ -11,9 +19,15 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 
+MODEL_NAME = "gemini-2.0-flash"
+
+# Dish generation is user facing and jumps ahead of batch work
+LLM_LANE = "interactive"
+
 # Initialize the model
 try:
-    model = genai.GenerativeModel(model_name="gemini-2.0-flash")
+    llm = get_client(MODEL_NAME)
+    model = llm.model
 except Exception as e:
     print(f"Error initializing model: {e}")
     exit()
@@ -22,35 +36,285 @@ ai_dish_bp = Blueprint('ai_dish', __name__)
 
 def get_surplus_ingredients():
     """Get current surplus ingredients from inventory"""
-    return [
-        {"name": "Chicken Breast", "quantity": 15, "expiry_date": "2025-03-31"},
-        {"name": "Fresh Basil", "quantity": 8, "expiry_date": "2025-03-30"},
-        {"name": "Mozzarella", "quantity": 12, "expiry_date": "2025-04-01"},
-        {"name": "Tomatoes", "quantity": 20, "expiry_date": "2025-03-29"},
-        {"name": "Pasta", "quantity": 10, "expiry_date": "2025-04-06"},
-    ]
-
-def generate_ai_response(prompt):
-    """Generate response from Gemini API"""
+    return inventory.get_surplus_ingredients(db)
+
+def clean_json_content(content):
+    """Strip the markdown fences Gemini wraps around JSON"""
+    if content.startswith('```json'):
+        content = content[7:]
+    if content.endswith('```'):
+        content = content[:-3]
+    return content
+
+def _generate_and_parse(prompt):
+    response = llm.generate(prompt, lane=LLM_LANE)
+    content = response.text.strip()
+    result = json.loads(clean_json_content(content))
+    # Only responses that parse are worth caching
+    llm_cache.set(MODEL_NAME, prompt, content)
+    return result
+
+def generate_ai_response(prompt, use_cache=True):
+    """Generate response from Gemini API.
+
+    Identical prompts are answered from the response cache unless use_cache
+    is False, and identical prompts already in flight share one model call.
+    """
     try:
-        response = model.generate_content(prompt)
-        content = response.text.strip()
-
-        # Clean up JSON response
-        if content.startswith('```json'):
-            content = content[7:]
-        if content.endswith('```'):
-            content = content[:-3]
-
-        # Parse the JSON string into a Python object
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {str(e)}")
-            return {"dishes": []}
+        if use_cache:
+            content = llm_cache.get(MODEL_NAME, prompt)
+            if content is not None:
+                return json.loads(clean_json_content(content))
+        else:
+            llm_cache.record_bypass()
+
+        return llm_flight.do(prompt_key(MODEL_NAME, prompt), _generate_and_parse, prompt)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON response: {str(e)}")
+        return {"dishes": []}
     except Exception as e:
         print(f"Error in generate_ai_response: {str(e)}")
-        return {"dishes": []}
+        return {"dishes": [], "error": str(e)}
+
+def normalize_dish(dish):
+    """Ensure a generated dish has the structure the frontend expects"""
+    # Ensure recipe has proper structure
+    if "recipe" not in dish:
+        dish["recipe"] = {"steps": ["No recipe steps available."]}
+    elif isinstance(dish["recipe"], str):
+        # Convert string recipes to proper structure
+        dish["recipe"] = {"steps": [dish["recipe"]]}
+    elif not isinstance(dish["recipe"], dict):
+        dish["recipe"] = {"steps": ["No recipe steps available."]}
+
+    # Make sure steps exist in recipe
+    # print(dish["recipe"])
+    if "steps" not in dish["recipe"]:
+        dish["recipe"]["steps"] = ["No steps provided."]
+
+    # Handle ingredients
+    if "ingredients" not in dish:
+        dish["ingredients"] = []
+    elif isinstance(dish["ingredients"], list):
+        # Convert any string ingredients to proper structure
+        dish["ingredients"] = [
+            {
+                "name": ing if isinstance(ing, str) else ing.get("name", ""),
+                "quantity": 1 if isinstance(ing, str) else ing.get("quantity", 1),
+                "unit": "unit" if isinstance(ing, str) else ing.get("unit", "unit")
+            }
+            for ing in dish["ingredients"]
+        ]
+
+    # Ensure other fields exist
+    if "cost" not in dish:
+        dish["cost"] = 0
+    if "profit_margin" not in dish:
+        dish["profit_margin"] = 0
+    if "special_occasion" not in dish:
+        dish["special_occasion"] = False
+    return dish
+
+def stream_dishes(prompt, use_cache=True):
+    """Yield normalized dishes while Gemini is still generating them.
+
+    Uses the streaming API and parses the dishes array incrementally, so
+    each dish is available as soon as its JSON object closes. A cached
+    response is replayed immediately.
+    """
+    if use_cache:
+        content = llm_cache.get(MODEL_NAME, prompt)
+        if content is not None:
+            for dish in json.loads(clean_json_content(content)).get("dishes", []):
+                yield normalize_dish(dish)
+            return
+    else:
+        llm_cache.record_bypass()
+
+    parser = ArrayObjectParser("dishes")
+    chunks = []
+    for chunk in llm.generate(prompt, lane=LLM_LANE, stream=True):
+        chunks.append(chunk.text)
+        for dish in parser.feed(chunk.text):
+            yield normalize_dish(dish)
+
+    # Cache the complete document so later requests replay it
+    content = "".join(chunks).strip()
+    try:
+        json.loads(clean_json_content(content))
+        llm_cache.set(MODEL_NAME, prompt, content)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing streamed JSON response: {str(e)}")
+
+def surplus_for_request(data):
+    """Surplus ingredients an inventory request is built from; None for other types"""
+    return get_surplus_ingredients() if data.get('type') == 'inventory' else None
+
+def build_dish_prompt(data, surplus_ingredients=None):
+    """Build the generation prompt for a /generate-dishes payload.
+
+    Inventory prompts use surplus_ingredients when given, so callers that
+    also match stored dishes read the surplus only once.
+
+    Returns (prompt, None) or (None, error message).
+    """
+    generation_type = data.get('type')
+    message = data.get('message', '')
+    
+    if not generation_type:
+        return None, "Generation type is required"
+        
+    if generation_type == 'inventory':
+        # Generate dishes based on current inventory
+        if surplus_ingredients is None:
+            surplus_ingredients = get_surplus_ingredients()
+        prompt = f"""Create 2 creative dishes using these surplus ingredients: {surplus_ingredients}.
+        and recipe for creating this dish: {message}
+        
+        Guidelines:
+        - mandatory is to create a recipe for the dish
+        - Use short, catchy names (max 3-4 words)
+        - Use realistic market prices for ingredients
+        - Include all ingredients, even small amounts
+        - Cost should be between $10-30 per dish
+        - Profit margin should be 20-35%
+        - For each ingredient, specify exact quantity and unit (e.g., grams, cups, pieces)
+        
+        Format the response as JSON with this structure:
+        {{
+            "dishes": [
+                {{
+                    "name": "string",
+                    "description": "string",
+                    "recipe": {{
+                        "steps": [
+                            "Step 1: ...",
+                            "Step 2: ...",
+                            "Step 3: ..."
+                        ]
+                    }},
+                    "ingredients": [
+                        {{
+                            "name": "string",
+                            "quantity": number,
+                            "unit": "string"
+                        }}
+                    ],
+                    "cost": number,
+                    "profit_margin": number,
+                    "special_occasion": boolean
+                }}
+            ]
+        }}"""
+        
+    elif generation_type == 'custom':
+        # Generate dishes based on custom ingredients
+        ingredients = data.get('ingredients', [])
+        
+        if not ingredients:
+            return None, "No ingredients provided"
+        
+        prompt = f"""Create 2 creative dishes using these ingredients: {ingredients} and recipe for creating this dish: {message}
+        
+        Guidelines:
+        - mandatory is to create a recipe for the dish
+        - Use short, catchy names (max 3-4 words)
+        - Use realistic market prices for ingredients
+        - Include all ingredients, even small amounts
+        - Cost should be between $10-30 per dish
+        - Profit margin should be 20-35%
+        
+        Format the response as JSON with this structure:
+        {{
+            "dishes": [
+                {{
+                    "name": "string",
+                    "description": "string",
+                    "recipe": {{
+                        "steps": [
+                            "Step 1: ...",
+                            "Step 2: ...",
+                            "Step 3: ..."
+                        ]
+                    }},
+                    "ingredients": [
+                        {{
+                            "name": "string",
+                            "quantity": number,
+                            "unit": "string"
+                        }}
+                    ],
+                    "cost": number,
+                    "profit_margin": number,
+                    "special_occasion": boolean
+                }}
+            ]
+        }}"""
+    else:
+        return None, "Invalid generation type"
+
+    return prompt, None
+
+def run_dish_generation(prompt, use_cache=True):
+    """Run a dish generation prompt and build the response payload"""
+    # Generate response from Gemini API
+    response = generate_ai_response(prompt, use_cache)
+
+    if not response or "dishes" not in response:
+        return {
+            "success": False,
+            "message": "Failed to generate dishes"
+        }
+
+    if response.get("error") and not response["dishes"]:
+        return {
+            "success": False,
+            "message": f"Failed to generate dishes: {response['error']}"
+        }
+
+    return {
+        "success": True,
+        "dishes": response["dishes"]
+    }
+
+def matches_existing_dishes(data):
+    """Inventory requests without a free-text brief can be met by stored dishes.
+
+    A message asks for something specific only the model can write, and
+    generate_new forces fresh dishes.
+    """
+    return data.get('type') == 'inventory' and not data.get('message') and not data.get('generate_new')
+
+def existing_dish_matches(surplus_ingredients=None):
+    """Stored dishes covering the current surplus well enough to serve"""
+    if surplus_ingredients is None:
+        surplus_ingredients = get_surplus_ingredients()
+    return match_surplus(read_db, surplus_ingredients)
+
+def run_inventory_generation(prompt, use_cache=True, surplus_ingredients=None):
+    """Serve an inventory request from the best matching stored dishes.
+
+    The model is only called when no stored dish covers enough of the
+    surplus.
+    """
+    matches = existing_dish_matches(surplus_ingredients)
+    if matches:
+        return {
+            "success": True,
+            "source": "existing",
+            "dishes": matches
+        }
+
+    result = run_dish_generation(prompt, use_cache)
+    result["source"] = "generated"
+    return result
+
+async def run_dish_generation_async(prompt, use_cache=True):
+    """Awaitable run_dish_generation; the blocking model call runs on a worker thread"""
+    return await asyncio.to_thread(run_dish_generation, prompt, use_cache)
+
+async def run_inventory_generation_async(prompt, use_cache=True, surplus_ingredients=None):
+    return await asyncio.to_thread(run_inventory_generation, prompt, use_cache, surplus_ingredients)
 
 # @ai_dish_bp.route('/generate-dishes', methods=['POST'])
 def generate_dishes_func(data):
@@ -165,41 +429,7 @@ def generate_dishes_func(data):
 
         # Process each dish to ensure proper structure
         for dish in response["dishes"]:
-            # Ensure recipe has proper structure
-            if "recipe" not in dish:
-                dish["recipe"] = {"steps": ["No recipe steps available."]}
-            elif isinstance(dish["recipe"], str):
-                # Convert string recipes to proper structure
-                dish["recipe"] = {"steps": [dish["recipe"]]}
-            elif not isinstance(dish["recipe"], dict):
-                dish["recipe"] = {"steps": ["No recipe steps available."]}
-
-            # Make sure steps exist in recipe
-            # print(dish["recipe"])
-            if "steps" not in dish["recipe"]:
-                dish["recipe"]["steps"] = ["No steps provided."]
-
-            # Handle ingredients
-            if "ingredients" not in dish:
-                dish["ingredients"] = []
-            elif isinstance(dish["ingredients"], list):
-                # Convert any string ingredients to proper structure
-                dish["ingredients"] = [
-                    {
-                        "name": ing if isinstance(ing, str) else ing.get("name", ""),
-                        "quantity": 1 if isinstance(ing, str) else ing.get("quantity", 1),
-                        "unit": "unit" if isinstance(ing, str) else ing.get("unit", "unit")
-                    }
-                    for ing in dish["ingredients"]
-                ]
-
-            # Ensure other fields exist
-            if "cost" not in dish:
-                dish["cost"] = 0
-            if "profit_margin" not in dish:
-                dish["profit_margin"] = 0
-            if "special_occasion" not in dish:
-                dish["special_occasion"] = False
+            normalize_dish(dish)
 
         return jsonify({
             "success": True,
@@ -1,18 +1,42 @@
-from flask import Flask, request, jsonify, send_from_directory
-import pandas as pd
-import datetime
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import logging
 import os
+import threading
+from functools import partial
 from werkzeug.utils import secure_filename
-from menu_optimization import optimize_menu
-from ingredients import analyze_image_endpoint
+from menu_optimization import optimize_menu, OPTIMIZE_BATCHED
+from ingredients import analyze_image_endpoint, analyze_images_endpoint, image_analysis_stats
 from dishes import add_dish_endpoint, get_all_dishes
+from dish_import import bulk_import_endpoint
+from ingredient_index import find_dishes_endpoint, ingredient_catalog_endpoint
 from menu import create_menu, get_all_menus, get_menu, update_menu, delete_menu
 import json
 from pymongo import MongoClient
+from db_config import db, read_db, manager
 import uuid
-from ai_dish import ai_dish_bp, get_surplus_ingredients, generate_ai_response
+from ai_dish import (
+    ai_dish_bp, build_dish_prompt, run_dish_generation, stream_dishes, surplus_for_request,
+    matches_existing_dishes, existing_dish_matches, run_inventory_generation
+)
+from surplus_matching import matrix_stats
+from inventory import (
+    get_inventory_endpoint, set_item_endpoint, movements_endpoint,
+    delete_item_endpoint, surplus_endpoint
+)
+from consumption import ingest_consumption_file
+from consumption_archive import archive_enabled
+from forecasting import forecast_endpoint
+from consumption_rollups import rollups_endpoint
+from costing import get_prices_endpoint, set_prices_endpoint
+from jobs import submit_job, job_status_endpoint
+from llm_cache import llm_cache
+from singleflight import llm_flight
+from llm_client import llm_stats
+from photos import serve_upload
+from versioning import bump_version, cached_json_response, response_cache_stats
+from read_cache import read_cache_stats, start_change_stream, READ_CACHE_CHANGE_STREAM
+from indexes import ensure_indexes, report_slow_queries, slow_query_listener
 
 app = Flask(__name__)
 # Configure CORS to allow all origins and methods
@@ -20,7 +44,8 @@ CORS(app, resources={
     r"/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization"],
+        "expose_headers": ["X-Rows-Ingested", "X-Rows-Rejected", "X-Rows-Per-Second", "X-Rows-Archived", "X-Archive-Errors"]
     }
 })
 
@@ -34,13 +59,10 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 # Allowed file extensions
-ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'jpg', 'jpeg', 'png'}
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'jpg', 'jpeg', 'png'}
 
-# High risk ingredients for demonstration
-HIGH_RISK_INGREDIENTS = {
-    "chicken", "beef", "fish", "eggs", "milk", "cheese", 
-    "shellfish", "nuts", "peanuts", "soy", "wheat"
-}
+# Consumption sheets accepted by /upload
+SPREADSHEET_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 
 # MongoDB configuration
 # try:
@@ -59,59 +81,55 @@ HIGH_RISK_INGREDIENTS = {
 #     db = client.kitchen_db
 #     dishes_collection = db.dishes
 
+def _flag(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+def wants_async(data=None):
+    """Whether the caller asked for a background job instead of waiting"""
+    return _flag(request.args.get("async") or (data or {}).get("async"))
+
+def wants_fresh(data=None):
+    """Whether the caller asked to skip the LLM response cache"""
+    flag = request.args.get("no_cache") or (data or {}).get("no_cache")
+    return "no-cache" in request.headers.get("Cache-Control", "") or _flag(flag)
+
+def job_accepted(job_id):
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}"
+    }), 202
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # Route to serve uploaded files
-@app.route('/uploads/<filename>')
+@app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    return serve_upload(filename)
 
 @app.route("/add-dish", methods=["POST"])
 def add_dish():
     return add_dish_endpoint()
 
+@app.route("/dishes/bulk-import", methods=["POST"])
+def bulk_import_dishes():
+    return bulk_import_endpoint()
+
 @app.route("/get-dishes", methods=["GET"])
 def get_dishes():
-    try:
-        # Fetch all dishes from MongoDB
-        dishes = list(dishes_collection.find())
-        
-        # Convert ObjectId to string and format timestamps
-        for dish in dishes:
-            dish["_id"] = str(dish["_id"])
-            dish["created_at"] = dish["created_at"].isoformat() if "created_at" in dish else None
-            dish["updated_at"] = dish["updated_at"].isoformat() if "updated_at" in dish else None
-            
-            # Ensure ingredients have the correct structure
-            if "ingredients" in dish:
-                for ingredient in dish["ingredients"]:
-                    if isinstance(ingredient, str):
-                        # Convert old format to new format
-                        ingredient = {
-                            "name": ingredient,
-                            "quantity": 1,
-                            "unit": "pcs"
-                        }
-                    elif isinstance(ingredient, dict):
-                        # Ensure all required fields exist
-                        if "quantity" not in ingredient:
-                            ingredient["quantity"] = 1
-                        if "unit" not in ingredient:
-                            ingredient["unit"] = "pcs"
-        
-        return jsonify({
-            "success": True,
-            "dishes": dishes
-        })
+    if request.args.get("format") == "ndjson":
+        return get_all_dishes()
+    return cached_json_response(read_db, ["dishes"], get_all_dishes)
 
-    except Exception as e:
-        logging.error(f"Error fetching dishes: {str(e)}")
-        return jsonify({
-            "success": False,
-            "message": "Failed to fetch dishes",
-            "error": str(e)
-        }), 500
+@app.route("/dishes/by-ingredients", methods=["GET"])
+def dishes_by_ingredients():
+    # The ingredient index only changes alongside dish writes
+    return cached_json_response(read_db, ["dishes"], lambda: find_dishes_endpoint(read_db))
+
+@app.route("/ingredients", methods=["GET"])
+def ingredient_catalog():
+    return cached_json_response(read_db, ["dishes", "menus"], lambda: ingredient_catalog_endpoint(read_db))
 
 @app.route("/upload", methods=["POST", "OPTIONS"])
 def upload_file():
@@ -129,8 +147,8 @@ def upload_file():
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
 
-    if not allowed_file(file.filename):
-        return jsonify({"error": "Invalid file type. Only Excel files are allowed"}), 400
+    if not allowed_file(file.filename) or file.filename.rsplit('.', 1)[1].lower() not in SPREADSHEET_EXTENSIONS:
+        return jsonify({"error": "Invalid file type. Only Excel or CSV files are allowed"}), 400
 
     try:
         # Save the file
@@ -139,45 +157,133 @@ def upload_file():
         file.save(filepath)
         logger.debug(f"File saved to: {filepath}")
 
-        # Generate dummy data
-        dummy_data = {
-            'date': [datetime.date.today().isoformat()] * 5,
-            'ingredient': ['chicken', 'rice', 'vegetables', 'fish', 'eggs'],
-            'consumption': [100, 200, 150, 80, 120]
-        }
-        df = pd.DataFrame(dummy_data)
-        logger.debug("Generated dummy data")
-
-        # Add high risk flag and type
-        df["high_risk"] = df["ingredient"].apply(lambda x: x.lower() in HIGH_RISK_INGREDIENTS)
-        df["type"] = "daily"
-        
-        # Convert to records
-        result = df.to_dict(orient="records")
-        logger.debug(f"Successfully processed {len(result)} records")
-        
-        return jsonify(result)
+        extra_fields = {"source_file": filename, "upload_id": str(uuid.uuid4())}
+        if request.form.get("season"):
+            extra_fields["season"] = request.form["season"]
+
+        stats, preview = ingest_consumption_file(
+            filepath,
+            db.consumption,
+            default_date=request.form.get("date"),
+            extra_fields=extra_fields,
+            rollups=db.consumption_rollups,
+            archive=archive_enabled()
+        )
+        bump_version(db, "consumption")
+        logger.debug(f"Successfully processed {stats['rows']} records at {stats['rows_per_sec']} rows/sec")
+
+        response = jsonify(preview)
+        response.headers["X-Rows-Ingested"] = str(stats["rows"])
+        response.headers["X-Rows-Rejected"] = str(stats["rejected"])
+        response.headers["X-Rows-Per-Second"] = str(stats["rows_per_sec"])
+        response.headers["X-Rows-Archived"] = str(stats["archived"])
+        response.headers["X-Archive-Errors"] = str(stats["archive_errors"])
+        return response
 
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         return jsonify({"error": str(e)}), 400
 
+@app.route("/consumption/rollups", methods=["GET"])
+def consumption_rollups():
+    return cached_json_response(read_db, ["consumption"], lambda: rollups_endpoint(read_db))
+
+@app.route("/forecast", methods=["GET"])
+def forecast():
+    return cached_json_response(read_db, ["consumption"], lambda: forecast_endpoint(read_db))
+
 @app.route("/optimize-menu", methods=["POST"])
 def optimize_menu_endpoint():
     try:
-        result = optimize_menu()
+        data = request.get_json(silent=True) or {}
+        use_cache = not wants_fresh(data)
+        batched = _flag(data.get("batched", OPTIMIZE_BATCHED))
+        if wants_async(data):
+            return job_accepted(submit_job("optimize-menu", optimize_menu, use_cache, batched))
+
+        result = optimize_menu(use_cache, batched)
         return jsonify(result)
     except Exception as e:
         logger.error(f"Error in optimize_menu: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/ingredient-prices", methods=["GET"])
+def get_ingredient_prices():
+    return cached_json_response(read_db, ["ingredient_prices"], lambda: get_prices_endpoint(read_db))
+
+@app.route("/ingredient-prices", methods=["POST"])
+def set_ingredient_prices():
+    return set_prices_endpoint(db)
+
+@app.route("/inventory", methods=["GET"])
+def get_inventory():
+    return cached_json_response(read_db, ["inventory"], lambda: get_inventory_endpoint(read_db))
+
+@app.route("/inventory", methods=["POST"])
+def set_inventory_item():
+    return set_item_endpoint(db)
+
+@app.route("/inventory/movements", methods=["POST"])
+def inventory_movements():
+    return movements_endpoint(db)
+
+@app.route("/inventory/surplus", methods=["GET"])
+def inventory_surplus():
+    # Depends on the current date, so not served through the version cache
+    return surplus_endpoint(read_db)
+
+@app.route("/inventory/<name>", methods=["DELETE"])
+def delete_inventory_item(name):
+    return delete_item_endpoint(db, name)
+
 @app.route('/analyze-image', methods=['POST'])
 def analyze_image():
     return analyze_image_endpoint()
 
+@app.route('/analyze-images', methods=['POST'])
+def analyze_images():
+    return analyze_images_endpoint()
+
+@app.route("/stats/responses", methods=["GET"])
+def response_stats():
+    return jsonify({
+        "success": True,
+        "cache": response_cache_stats()
+    })
+
+@app.route("/stats/cache", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "success": True,
+        "cache": read_cache_stats()
+    })
+
+@app.route("/stats/slow-queries", methods=["GET"])
+def slow_query_stats():
+    return jsonify({
+        "success": True,
+        "threshold_ms": slow_query_listener.threshold_ms,
+        "queries": report_slow_queries(db)
+    })
+
+@app.route("/stats/images", methods=["GET"])
+def image_stats():
+    return jsonify({
+        "success": True,
+        "cache": image_analysis_stats()
+    })
+
+@app.route("/stats/matching", methods=["GET"])
+def matching_stats():
+    return jsonify({
+        "success": True,
+        "cache": matrix_stats()
+    })
+
 @app.route("/menus", methods=["GET"])
 def get_menus():
-    return get_all_menus(db)
+    # Menus embed dish details, so they change with either collection
+    return cached_json_response(read_db, ["menus", "dishes"], lambda: get_all_menus(read_db))
 
 @app.route("/menus", methods=["POST"])
 def add_menu():
@@ -185,7 +291,7 @@ def add_menu():
 
 @app.route("/menus/<menu_id>", methods=["GET"])
 def get_single_menu(menu_id):
-    return get_menu(db, menu_id)
+    return cached_json_response(read_db, ["menus", "dishes"], lambda: get_menu(read_db, menu_id))
 
 @app.route("/menus/<menu_id>", methods=["PUT"])
 def update_single_menu(menu_id):
@@ -207,123 +313,25 @@ def generate_dishes():
                 "success": False,
                 "message": "No data provided"
             })
-            
-        generation_type = data.get('type')
-        message = data.get('message', '')
-        
-        if not generation_type:
-            return jsonify({
-                "success": False,
-                "message": "Generation type is required"
-            })
-            
-        if generation_type == 'inventory':
-            # Generate dishes based on current inventory
-            surplus_ingredients = get_surplus_ingredients()
-            prompt = f"""Create 2 creative dishes using these surplus ingredients: {surplus_ingredients}.
-            and recipe for creating this dish: {message}
-            
-            Guidelines:
-            - mandatory is to create a recipe for the dish
-            - Use short, catchy names (max 3-4 words)
-            - Use realistic market prices for ingredients
-            - Include all ingredients, even small amounts
-            - Cost should be between $10-30 per dish
-            - Profit margin should be 20-35%
-            - For each ingredient, specify exact quantity and unit (e.g., grams, cups, pieces)
-            
-            Format the response as JSON with this structure:
-            {{
-                "dishes": [
-                    {{
-                        "name": "string",
-                        "description": "string",
-                        "recipe": {{
-                            "steps": [
-                                "Step 1: ...",
-                                "Step 2: ...",
-                                "Step 3: ..."
-                            ]
-                        }},
-                        "ingredients": [
-                            {{
-                                "name": "string",
-                                "quantity": number,
-                                "unit": "string"
-                            }}
-                        ],
-                        "cost": number,
-                        "profit_margin": number,
-                        "special_occasion": boolean
-                    }}
-                ]
-            }}"""
-            
-        elif generation_type == 'custom':
-            # Generate dishes based on custom ingredients
-            ingredients = data.get('ingredients', [])
-            
-            if not ingredients:
-                return jsonify({
-                    "success": False,
-                    "message": "No ingredients provided"
-                })
-            
-            prompt = f"""Create 2 creative dishes using these ingredients: {ingredients} and recipe for creating this dish: {message}
-            
-            Guidelines:
-            - mandatory is to create a recipe for the dish
-            - Use short, catchy names (max 3-4 words)
-            - Use realistic market prices for ingredients
-            - Include all ingredients, even small amounts
-            - Cost should be between $10-30 per dish
-            - Profit margin should be 20-35%
-            
-            Format the response as JSON with this structure:
-            {{
-                "dishes": [
-                    {{
-                        "name": "string",
-                        "description": "string",
-                        "recipe": {{
-                            "steps": [
-                                "Step 1: ...",
-                                "Step 2: ...",
-                                "Step 3: ..."
-                            ]
-                        }},
-                        "ingredients": [
-                            {{
-                                "name": "string",
-                                "quantity": number,
-                                "unit": "string"
-                            }}
-                        ],
-                        "cost": number,
-                        "profit_margin": number,
-                        "special_occasion": boolean
-                    }}
-                ]
-            }}"""
-        else:
-            return jsonify({
-                "success": False,
-                "message": "Invalid generation type"
-            })
 
-        # Generate response from Gemini API
-        response = generate_ai_response(prompt)
-        
-        if not response or "dishes" not in response:
+        # Read once for both the prompt and the stored dish match
+        surplus = surplus_for_request(data)
+        prompt, error = build_dish_prompt(data, surplus)
+        if error:
             return jsonify({
                 "success": False,
-                "message": "Failed to generate dishes"
+                "message": error
             })
 
-        return jsonify({
-            "success": True,
-            "dishes": response["dishes"]
-        })
+        use_cache = not wants_fresh(data)
+        if matches_existing_dishes(data):
+            run = partial(run_inventory_generation, surplus_ingredients=surplus)
+        else:
+            run = run_dish_generation
+        if wants_async(data):
+            return job_accepted(submit_job("generate-dishes", run, prompt, use_cache))
+
+        return jsonify(run(prompt, use_cache))
 
     except Exception as e:
         print(f"Error in generate_dishes: {str(e)}")
@@ -332,8 +340,91 @@ def generate_dishes():
             "message": str(e)
         })
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/generate-dishes/stream', methods=['POST', 'OPTIONS'])
+def generate_dishes_stream():
+    if request.method == 'OPTIONS':
+        return jsonify({"success": True})
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "success": False,
+            "message": "No data provided"
+        })
+
+    surplus = surplus_for_request(data)
+    prompt, error = build_dish_prompt(data, surplus)
+    if error:
+        return jsonify({
+            "success": False,
+            "message": error
+        })
+
+    use_cache = not wants_fresh(data)
+    matches = existing_dish_matches(surplus) if matches_existing_dishes(data) else []
+
+    def events():
+        count = 0
+        try:
+            # Stored dishes that cover the surplus are sent without a model call
+            for dish in matches or stream_dishes(prompt, use_cache):
+                count += 1
+                yield sse_event("dish", dish)
+        except Exception as e:
+            logger.error(f"Error streaming dishes: {str(e)}")
+            yield sse_event("error", {"message": str(e)})
+        yield sse_event("done", {
+            "success": count > 0,
+            "count": count,
+            "source": "existing" if matches else "generated"
+        })
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job_status(job_id):
+    return job_status_endpoint(job_id)
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    try:
+        manager.ping()
+        return jsonify({"ready": True})
+    except Exception as e:
+        logger.error(f"Readiness check failed: {str(e)}")
+        return jsonify({"ready": False, "error": str(e)}), 503
+
+@app.route("/stats/llm", methods=["GET"])
+def llm_stats_endpoint():
+    return jsonify({
+        "success": True,
+        "cache": llm_cache.stats(),
+        "coalescing": llm_flight.stats(),
+        **llm_stats()
+    })
+
 # Register blueprints
 app.register_blueprint(ai_dish_bp)
 
+def run_startup_tasks():
+    try:
+        ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Failed to ensure indexes: {str(e)}")
+
+@app.before_first_request
+def start_background_tasks():
+    # Runs in each worker after fork, off the request path
+    threading.Thread(target=run_startup_tasks, name="startup", daemon=True).start()
+    if READ_CACHE_CHANGE_STREAM:
+        start_change_stream(db)
+
 if __name__ == "__main__":
     app.run(debug=True, port=5001, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""Async serving mode.
+
+Serves the dish, menu, photo and generation routes from a Quart (ASGI) app
+on the Motor async MongoDB driver, with the same paths, JSON shapes and
+ETag/304 handling as the Flask app in app.py. Run with:
+
+    hypercorn asgi:app --bind 0.0.0.0:5001
+
+Everything else stays on the Flask app, which the frontend must be pointed
+at for: /upload and /consumption/rollups, /forecast, /dishes/bulk-import,
+/dishes/by-ingredients, /ingredients, /ingredient-prices, the /inventory
+routes, /analyze-image(s), /generate-dishes/stream, /jobs/<job_id> and the
+/stats routes.
+"""
+from quart import Quart, request, jsonify, send_from_directory
+import asyncio
+from functools import partial
+import logging
+import async_dishes
+import async_menu
+from photos import resolve_upload, set_upload_caching
+from versioning import cached_json_response_async
+from async_db import async_manager, get_async_db, get_async_read_db
+from ai_dish import (
+    build_dish_prompt, surplus_for_request, matches_existing_dishes,
+    run_dish_generation_async, run_inventory_generation_async
+)
+from menu_optimization import optimize_menu_async, OPTIMIZE_BATCHED
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+}
+
+def _flag(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+def create_app():
+    app = Quart(__name__)
+
+    @app.after_request
+    async def add_cors_headers(response):
+        response.headers.update(CORS_HEADERS)
+        return response
+
+    @app.route("/uploads/<path:filename>")
+    async def uploaded_file(filename):
+        directory, filename, etag, caching = await asyncio.to_thread(resolve_upload, filename)
+        response = await send_from_directory(directory, filename)
+        if etag:
+            response.set_etag(etag)
+        return set_upload_caching(response, caching)
+
+    @app.route("/get-dishes", methods=["GET"])
+    async def get_dishes():
+        if request.args.get("format") == "ndjson":
+            return await async_dishes.get_all_dishes(get_async_read_db())
+        return await cached_json_response_async(get_async_read_db(), ["dishes"], async_dishes.get_all_dishes)
+
+    @app.route("/add-dish", methods=["POST"])
+    async def add_dish():
+        return await async_dishes.add_dish_endpoint(get_async_db())
+
+    @app.route("/menus", methods=["GET"])
+    async def get_menus():
+        return await cached_json_response_async(get_async_read_db(), ["menus", "dishes"], async_menu.get_all_menus)
+
+    @app.route("/menus", methods=["POST"])
+    async def add_menu():
+        return await async_menu.create_menu(get_async_db())
+
+    @app.route("/menus/<menu_id>", methods=["GET"])
+    async def get_single_menu(menu_id):
+        return await cached_json_response_async(
+            get_async_read_db(), ["menus", "dishes"], lambda db: async_menu.get_menu(db, menu_id)
+        )
+
+    @app.route("/menus/<menu_id>", methods=["PUT"])
+    async def update_single_menu(menu_id):
+        return await async_menu.update_menu(get_async_db(), menu_id)
+
+    @app.route("/menus/<menu_id>", methods=["DELETE"])
+    async def delete_single_menu(menu_id):
+        return await async_menu.delete_menu(get_async_db(), menu_id)
+
+    @app.route("/optimize-menu", methods=["POST"])
+    async def optimize_menu_endpoint():
+        try:
+            data = await request.get_json(silent=True) or {}
+            result = await optimize_menu_async(
+                not _flag(data.get("no_cache")),
+                _flag(data.get("batched", OPTIMIZE_BATCHED))
+            )
+            return jsonify(result)
+        except Exception as e:
+            logger.error(f"Error in optimize_menu: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/generate-dishes", methods=["POST", "OPTIONS"])
+    async def generate_dishes():
+        if request.method == "OPTIONS":
+            return jsonify({"success": True})
+
+        try:
+            data = await request.get_json(silent=True)
+            if not data:
+                return jsonify({
+                    "success": False,
+                    "message": "No data provided"
+                })
+
+            # Reads the surplus through blocking pymongo, so off the event loop;
+            # the prompt and the stored dish match share this one read
+            surplus = await asyncio.to_thread(surplus_for_request, data)
+            prompt, error = build_dish_prompt(data, surplus)
+            if error:
+                return jsonify({
+                    "success": False,
+                    "message": error
+                })
+
+            if matches_existing_dishes(data):
+                run = partial(run_inventory_generation_async, surplus_ingredients=surplus)
+            else:
+                run = run_dish_generation_async
+            return jsonify(await run(prompt, not _flag(data.get("no_cache"))))
+        except Exception as e:
+            logger.error(f"Error in generate_dishes: {str(e)}")
+            return jsonify({
+                "success": False,
+                "message": str(e)
+            })
+
+    @app.route("/ready", methods=["GET"])
+    async def ready():
+        try:
+            await async_manager.ping()
+            return jsonify({"ready": True})
+        except Exception as e:
+            logger.error(f"Readiness check failed: {str(e)}")
+            return jsonify({"ready": False, "error": str(e)}), 503
+
+    return app
+
+app = create_app()
@@ -0,0 +1,77 @@
+from contextlib import asynccontextmanager
+import os
+import threading
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ReadPreference
+from db_config import MONGODB_URI, DATABASE_NAME, CLIENT_OPTIONS, READ_PREFERENCE, READ_PREFERENCES, SessionCollection
+
+class AsyncConnectionManager:
+    """Motor counterpart of db_config.ConnectionManager.
+
+    The client is created lazily inside the serving event loop and rebuilt
+    in a process that did not create it.
+    """
+
+    def __init__(self, uri, database_name, options):
+        self.uri = uri
+        self.database_name = database_name
+        self.options = {key: value for key, value in options.items() if value is not None}
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = AsyncIOMotorClient(self.uri, **self.options)
+                    self._pid = os.getpid()
+        return self._client
+
+    def get_db(self, read_preference=None):
+        if read_preference is None:
+            return self.get_client()[self.database_name]
+        return self.get_client().get_database(self.database_name, read_preference=read_preference)
+
+    async def ping(self):
+        await self.get_client().admin.command("ping")
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+async_manager = AsyncConnectionManager(MONGODB_URI, DATABASE_NAME, CLIENT_OPTIONS)
+
+def get_async_db():
+    return async_manager.get_db()
+
+def get_async_read_db():
+    """Database handle for GET routes, honouring MONGO_READ_PREFERENCE"""
+    return async_manager.get_db(READ_PREFERENCES[READ_PREFERENCE])
+
+class SessionDatabase:
+    """A Motor database whose collections read in the given session"""
+
+    def __init__(self, db, session):
+        self._db = db
+        self._session = session
+
+    def __getattr__(self, name):
+        value = getattr(self._db, name)
+        if isinstance(value, AsyncIOMotorCollection):
+            return SessionCollection(value, self._session)
+        return value
+
+    def __getitem__(self, name):
+        return SessionCollection(self._db[name], self._session)
+
+@asynccontextmanager
+async def causal_reads_async(db):
+    """Yield db, bound to a causally consistent session unless it reads from the primary"""
+    if db.read_preference == ReadPreference.PRIMARY:
+        yield db
+        return
+    async with await db.client.start_session(causal_consistency=True) as session:
+        yield SessionDatabase(db, session)
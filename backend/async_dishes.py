@@ -0,0 +1,122 @@
+from quart import request, jsonify, Response
+import asyncio
+import json
+import logging
+from dishes import (
+    MAX_PAGE_SIZE, SORT_KEYS, STREAM_BATCH_SIZE, decode_cursor, encode_cursor,
+    new_dish_document, next_cursor_line, parse_fields, serialize_dish, validate_dish_fields
+)
+from photos import store_photo
+from versioning import bump_version_async
+from ingredient_index import index_dish_async
+from costing import price_dishes_async
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+async def get_all_dishes(db):
+    """Async version of dishes.get_all_dishes, with the same parameters"""
+    try:
+        sort_key = request.args.get("sort", "_id")
+        if sort_key not in SORT_KEYS:
+            return jsonify({"success": False, "message": f"Invalid sort: {sort_key}"}), 400
+
+        limit = request.args.get("limit", type=int)
+        if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+            return jsonify({"success": False, "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+        try:
+            projection = parse_fields(request.args.get("fields"))
+            query = {}
+            if request.args.get("cursor"):
+                query = decode_cursor(request.args["cursor"], sort_key)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        if projection is not None and sort_key == "created_at":
+            projection["created_at"] = 1
+
+        sort = [("_id", 1)] if sort_key == "_id" else [("created_at", 1), ("_id", 1)]
+        cursor = db.dishes.find(query, projection).sort(sort)
+
+        if request.args.get("format") == "ndjson":
+            cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+            if limit:
+                cursor = cursor.limit(limit + 1)
+
+            async def stream():
+                count = 0
+                next_cursor = None
+                async for dish in cursor:
+                    if count == limit:
+                        next_cursor = encode_cursor(last, sort_key)
+                        break
+                    count += 1
+                    last = {"_id": dish["_id"], "created_at": dish.get("created_at")}
+                    yield (json.dumps(serialize_dish(dish), default=str) + "\n").encode()
+                if limit:
+                    yield next_cursor_line(next_cursor).encode()
+
+            return Response(stream(), mimetype="application/x-ndjson")
+
+        if not limit:
+            return jsonify({
+                "success": True,
+                "dishes": [serialize_dish(dish) async for dish in cursor]
+            })
+
+        dishes = await cursor.limit(limit + 1).to_list(length=limit + 1)
+        next_cursor = encode_cursor(dishes[limit - 1], sort_key) if len(dishes) > limit else None
+        return jsonify({
+            "success": True,
+            "dishes": [serialize_dish(dish) for dish in dishes[:limit]],
+            "next_cursor": next_cursor
+        })
+    except Exception as e:
+        logger.error(f"Error fetching dishes: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch dishes",
+            "error": str(e)
+        }), 500
+
+async def add_dish_endpoint(db):
+    """Async version of dishes.add_dish_endpoint"""
+    try:
+        form = await request.form
+        files = await request.files
+
+        fields, error = validate_dish_fields(
+            form.get('name'),
+            form.get('price', 0),
+            form.get('ingredients', '[]')
+        )
+        if error:
+            return jsonify({"error": error}), 400
+
+        photo_url = form.get('photo_url')
+        photo_hash = None
+        photo_file = files.get('photo_file')
+        if photo_file:
+            # Hashing and writing the upload is blocking file I/O
+            try:
+                photo_hash, photo_url = await asyncio.to_thread(store_photo, photo_file)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        dish = new_dish_document(fields, photo_url, photo_hash)
+        await price_dishes_async(db, [dish])
+        result = await db.dishes.insert_one(dish)
+        await bump_version_async(db, "dishes")
+        await index_dish_async(db, result.inserted_id, dish["ingredients"])
+        dish['_id'] = str(result.inserted_id)
+
+        return jsonify({
+            "success": True,
+            "message": "Dish added successfully",
+            "dish": dish
+        })
+    except Exception as e:
+        logger.error(f"Error in add-dish endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
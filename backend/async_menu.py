@@ -0,0 +1,169 @@
+from quart import request, jsonify
+from datetime import datetime
+import logging
+from bson import ObjectId
+from menu import MENU_DISH_PROJECTION, collect_dish_ids, fill_menu_dishes, menu_dish, serialize_menu
+from read_cache import get_cached_dishes, cache_dishes, get_cached_menu, cache_menu, invalidate_menu
+from versioning import bump_version_async, current_versions_async
+from ingredient_index import index_menu_async, unindex_menu_async
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+async def hydrate_menus(db, menus, dishes_version=None):
+    """Async version of menu.hydrate_menus"""
+    if dishes_version is None:
+        dishes_version = (await current_versions_async(db, ["dishes"]))[0]
+    dishes_by_id, missing = get_cached_dishes(collect_dish_ids(menus), dishes_version)
+    if missing:
+        fetched = {}
+        async for dish in db.dishes.find({"_id": {"$in": missing}}, MENU_DISH_PROJECTION):
+            fetched[dish["_id"]] = menu_dish(dish)
+        cache_dishes(fetched, dishes_version)
+        dishes_by_id.update(fetched)
+
+    return fill_menu_dishes(menus, dishes_by_id)
+
+async def create_menu(db):
+    try:
+        data = await request.get_json()
+        menu = {
+            "name": data.get("name"),
+            "description": data.get("description", ""),
+            "dishes": data.get("dishes", []),  # Array of dish IDs
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+
+        result = await db.menus.insert_one(menu)
+        await bump_version_async(db, "menus")
+        await index_menu_async(db, result.inserted_id, menu["dishes"])
+        menu["_id"] = str(result.inserted_id)
+
+        return jsonify({
+            "success": True,
+            "message": "Menu created successfully",
+            "menu": menu
+        })
+    except Exception as e:
+        logger.error(f"Error creating menu: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to create menu",
+            "error": str(e)
+        }), 500
+
+async def get_all_menus(db):
+    try:
+        menus = [serialize_menu(menu) async for menu in db.menus.find()]
+
+        # Fetch dish details for all menus in a single query
+        await hydrate_menus(db, menus)
+
+        return jsonify({
+            "success": True,
+            "menus": menus
+        })
+    except Exception as e:
+        logger.error(f"Error fetching menus: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch menus",
+            "error": str(e)
+        }), 500
+
+async def get_menu(db, menu_id):
+    try:
+        versions = await current_versions_async(db, ["menus", "dishes"])
+        menu = get_cached_menu(menu_id, versions)
+        if menu:
+            return jsonify({
+                "success": True,
+                "menu": menu
+            })
+
+        menu = await db.menus.find_one({"_id": ObjectId(menu_id)})
+        if not menu:
+            return jsonify({
+                "success": False,
+                "message": "Menu not found"
+            }), 404
+
+        serialize_menu(menu)
+        await hydrate_menus(db, [menu], versions[1])
+        cache_menu(menu, versions)
+
+        return jsonify({
+            "success": True,
+            "menu": menu
+        })
+    except Exception as e:
+        logger.error(f"Error fetching menu: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch menu",
+            "error": str(e)
+        }), 500
+
+async def update_menu(db, menu_id):
+    try:
+        data = await request.get_json()
+        update_data = {
+            "name": data.get("name"),
+            "description": data.get("description"),
+            "dishes": data.get("dishes"),
+            "updated_at": datetime.utcnow()
+        }
+
+        result = await db.menus.update_one(
+            {"_id": ObjectId(menu_id)},
+            {"$set": update_data}
+        )
+        await bump_version_async(db, "menus")
+        invalidate_menu(menu_id)
+
+        if result.modified_count == 0:
+            return jsonify({
+                "success": False,
+                "message": "Menu not found"
+            }), 404
+
+        await index_menu_async(db, menu_id, update_data["dishes"])
+
+        return jsonify({
+            "success": True,
+            "message": "Menu updated successfully"
+        })
+    except Exception as e:
+        logger.error(f"Error updating menu: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to update menu",
+            "error": str(e)
+        }), 500
+
+async def delete_menu(db, menu_id):
+    try:
+        result = await db.menus.delete_one({"_id": ObjectId(menu_id)})
+        await bump_version_async(db, "menus")
+        invalidate_menu(menu_id)
+        await unindex_menu_async(db, menu_id)
+
+        if result.deleted_count == 0:
+            return jsonify({
+                "success": False,
+                "message": "Menu not found"
+            }), 404
+
+        return jsonify({
+            "success": True,
+            "message": "Menu deleted successfully"
+        })
+    except Exception as e:
+        logger.error(f"Error deleting menu: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to delete menu",
+            "error": str(e)
+        }), 500
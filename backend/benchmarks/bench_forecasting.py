@@ -0,0 +1,44 @@
+"""Benchmark the batched forecasts on a synthetic ingredients x days matrix.
+
+Needs no database: the history is random Poisson demand with a weekly
+pattern, shaped like what load_consumption_matrix returns.
+
+Usage:
+    python benchmarks/bench_forecasting.py [--ingredients 5000] [--days 365] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from forecasting import forecast_matrix  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ingredients", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=args.days, freq="D")
+    weekly = 1 + 0.3 * np.sin(2 * np.pi * dates.dayofweek.to_numpy() / 7)
+    base = rng.uniform(1, 50, size=(args.ingredients, 1))
+    history = rng.poisson(base * weekly).astype(np.float64)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        forecast_matrix(history, dates)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(f"{args.ingredients} ingredients x {args.days} days, {args.repeat} runs")
+    print(f"median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark menu dish hydration: one query per menu vs one batched query.
+
+Seeds a scratch database on the configured MongoDB deployment, then lists
+menus with both strategies and reports round trips and latency as the
+number of menus grows.
+
+Usage:
+    python benchmarks/bench_menu_hydration.py [--menus 10,100,300] [--dishes-per-menu 8]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from menu import hydrate_menus  # noqa: E402
+from read_cache import dish_cache, menu_cache  # noqa: E402
+
+load_dotenv()
+
+BENCH_DB = "kitchen_db_bench"
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Count commands sent to the server"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate", "getMore"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def seed(db, num_menus, dishes_per_menu, num_dishes):
+    db.dishes.drop()
+    db.menus.drop()
+    dishes = [{
+        "name": f"Dish {i}",
+        "price": round(random.uniform(8, 30), 2),
+        "photo": None,
+        "ingredients": [{"name": f"Ingredient {j}", "quantity": 1, "unit": "pcs"} for j in range(6)]
+    } for i in range(num_dishes)]
+    dish_ids = db.dishes.insert_many(dishes).inserted_ids
+    db.menus.insert_many([{
+        "name": f"Menu {i}",
+        "dishes": [str(dish_id) for dish_id in random.sample(dish_ids, dishes_per_menu)]
+    } for i in range(num_menus)])
+
+def hydrate_per_menu(db, menus):
+    """The previous strategy: one dish query per menu"""
+    for menu in menus:
+        dishes = list(db.dishes.find({"_id": {"$in": [ObjectId(id) for id in menu["dishes"]]}}))
+        menu["dishes"] = [{
+            "_id": str(dish["_id"]),
+            "name": dish["name"],
+            "photo": dish["photo"],
+            "price": dish["price"],
+            "ingredients": dish["ingredients"]
+        } for dish in dishes]
+    return menus
+
+def run(db, counter, strategy, repeat):
+    timings = []
+    for _ in range(repeat):
+        # Measure the queries, not hits on the read cache left by the last run
+        dish_cache.clear()
+        menu_cache.clear()
+        counter.count = 0
+        start = time.perf_counter()
+        menus = list(db.menus.find())
+        strategy(db, menus)
+        timings.append(time.perf_counter() - start)
+    return counter.count, min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--menus", default="10,100,300")
+    parser.add_argument("--dishes-per-menu", type=int, default=8)
+    parser.add_argument("--dishes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    counter = RoundTripCounter()
+    client = MongoClient(os.getenv("MONGODB_URI"), event_listeners=[counter])
+    db = client[BENCH_DB]
+
+    print(f"{'menus':>6} | {'per-menu trips':>14} {'ms':>9} | {'batched trips':>13} {'ms':>9}")
+    try:
+        for num_menus in [int(n) for n in args.menus.split(",")]:
+            seed(db, num_menus, args.dishes_per_menu, args.dishes)
+            legacy_trips, legacy_ms = run(db, counter, hydrate_per_menu, args.repeat)
+            batched_trips, batched_ms = run(db, counter, hydrate_menus, args.repeat)
+            print(f"{num_menus:>6} | {legacy_trips:>14} {legacy_ms:>9.1f} | {batched_trips:>13} {batched_ms:>9.1f}")
+    finally:
+        client.drop_database(BENCH_DB)
+
+if __name__ == "__main__":
+    main()
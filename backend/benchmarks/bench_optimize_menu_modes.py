@@ -0,0 +1,55 @@
+"""Benchmark optimize_menu in per-section and batched (single-call) modes.
+
+Calls Gemini for real with the response cache bypassed, and reports prompt
+tokens, response tokens and wall-clock latency for each mode.
+
+Usage:
+    python benchmarks/bench_optimize_menu_modes.py [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import menu_optimization  # noqa: E402
+from menu_optimization import (  # noqa: E402
+    build_combined_prompt, build_section_prompts, get_current_menu,
+    get_surplus_ingredients, model, optimize_menu
+)
+
+def count_tokens(text):
+    return model.count_tokens(text).total_tokens
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    surplus_ingredients = get_surplus_ingredients()
+    current_menu = get_current_menu()
+    prompt_tokens = {
+        "per-section": sum(count_tokens(p) for p in build_section_prompts(surplus_ingredients, current_menu).values()),
+        "batched": count_tokens(build_combined_prompt(surplus_ingredients, current_menu))
+    }
+
+    print(f"{'mode':>12} | {'prompt tok':>10} {'response tok':>12} | {'median ms':>9} {'max ms':>9} | fallbacks")
+    for mode, batched in (("per-section", False), ("batched", True)):
+        timings = []
+        response_tokens = []
+        fallbacks = 0
+        for _ in range(args.repeat):
+            calls_before = menu_optimization.llm_flight.executed
+            start = time.perf_counter()
+            result = optimize_menu(use_cache=False, batched=batched)
+            timings.append((time.perf_counter() - start) * 1000)
+            response_tokens.append(count_tokens(json.dumps(result)))
+            if batched and menu_optimization.llm_flight.executed - calls_before > 1:
+                fallbacks += 1
+        print(f"{mode:>12} | {prompt_tokens[mode]:>10} {statistics.median(response_tokens):>12.0f} | "
+              f"{statistics.median(timings):>9.0f} {max(timings):>9.0f} | {fallbacks}")
+
+if __name__ == "__main__":
+    main()
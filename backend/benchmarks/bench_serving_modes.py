@@ -0,0 +1,109 @@
+"""Load benchmark comparing the WSGI (app.py) and ASGI (asgi.py) serving modes.
+
+Start both servers first, for example:
+    gunicorn -w 2 --threads 8 -b :5001 app:app
+    hypercorn -w 2 -b :5002 asgi:app
+
+then fire concurrent GET requests at the same path on each and report
+throughput, latency percentiles and errors per concurrency level.
+
+Both apps serve the cached read routes through the same per-version body
+cache, so by default both sides are measured with caching on. Start both
+servers with RESPONSE_CACHE_SIZE=0 to compare them with it off. Before
+measuring, each side is checked for an ETag, and the run stops when only
+one side is caching the path.
+
+Usage:
+    python benchmarks/bench_serving_modes.py --wsgi http://localhost:5001 \\
+        --asgi http://localhost:5002 [--path /menus] [--concurrency 10,50,200]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+async def fetch(host, port, path, headers=None):
+    """One HTTP/1.1 GET over a fresh connection; returns the status code,
+    plus the response headers when headers is a dict to fill"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        if headers is not None:
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+async def is_cached(base_url, path):
+    """Whether the server answers path with an ETag, i.e. through the body cache"""
+    url = urlsplit(base_url)
+    headers = {}
+    await fetch(url.hostname, url.port or 80, path, headers)
+    return "etag" in headers
+
+async def run_level(base_url, path, concurrency, duration):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(host, port, path), timeout=30)
+                if status >= 500:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float("nan")
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99": pct(0.99),
+        "errors": errors
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wsgi", default="http://localhost:5001")
+    parser.add_argument("--asgi", default="http://localhost:5002")
+    parser.add_argument("--path", default="/menus")
+    parser.add_argument("--concurrency", default="10,50,200")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    cached = {mode: await is_cached(base_url, args.path) for mode, base_url in (("wsgi", args.wsgi), ("asgi", args.asgi))}
+    if cached["wsgi"] != cached["asgi"]:
+        raise SystemExit(f"Only one side caches {args.path} ({cached}); the numbers would measure caching")
+    print(f"response caching: {'on' if cached['wsgi'] else 'off'}")
+
+    print(f"{'mode':>5} {'conc':>5} | {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        for mode, base_url in (("wsgi", args.wsgi), ("asgi", args.asgi)):
+            result = await run_level(base_url, args.path, concurrency, args.duration)
+            print(f"{mode:>5} {concurrency:>5} | {result['rps']:>8.1f} {result['p50']:>8.1f} "
+                  f"{result['p99']:>8.1f} {result['errors']:>6}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,191 @@
+import os
+import time
+import logging
+from datetime import datetime
+import pandas as pd
+from consumption_rollups import update_rollups
+import consumption_archive
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Rows read, validated and inserted per batch
+INSERT_BATCH_SIZE = 5000
+
+# Rows echoed back to the client after an upload
+PREVIEW_ROWS = 500
+
+# High risk ingredients for demonstration
+HIGH_RISK_INGREDIENTS = {
+    "chicken", "beef", "fish", "eggs", "milk", "cheese",
+    "shellfish", "nuts", "peanuts", "soy", "wheat"
+}
+
+# Accepted spellings of each column in POS exports
+COLUMN_ALIASES = {
+    "date": {"date", "day", "consumption_date"},
+    "ingredient": {"ingredient", "ingredients", "item", "name", "ingredient_name"},
+    "consumption": {"consumption", "quantity", "qty", "used", "amount"},
+    "type": {"type", "period"}
+}
+
+REQUIRED_COLUMNS = ("ingredient", "consumption")
+
+def iter_xlsx_chunks(filepath, chunk_size=INSERT_BATCH_SIZE):
+    """Stream an .xlsx sheet row by row, yielding DataFrames of chunk_size rows"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else "" for c in header]
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+def iter_csv_chunks(filepath, chunk_size=INSERT_BATCH_SIZE):
+    """Read a CSV file in chunks of chunk_size rows"""
+    yield from pd.read_csv(filepath, chunksize=chunk_size)
+
+def iter_xls_chunks(filepath, chunk_size=INSERT_BATCH_SIZE):
+    """Legacy .xls has no streaming reader, so it is loaded once and sliced"""
+    df = pd.read_excel(filepath)
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+READERS = {
+    "xlsx": iter_xlsx_chunks,
+    "csv": iter_csv_chunks,
+    "xls": iter_xls_chunks
+}
+
+def resolve_columns(columns):
+    """Map the sheet's headers onto the canonical column names"""
+    mapping = {}
+    for column in columns:
+        key = str(column).strip().lower().replace(" ", "_")
+        for canonical, aliases in COLUMN_ALIASES.items():
+            if key in aliases and canonical not in mapping.values():
+                mapping[column] = canonical
+                break
+    missing = [c for c in REQUIRED_COLUMNS if c not in mapping.values()]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    return mapping
+
+def normalize_chunk(df, mapping, default_date):
+    """Validate and normalise one chunk.
+
+    Returns the cleaned DataFrame and the number of rejected rows.
+    """
+    df = df[list(mapping)].rename(columns=mapping)
+
+    df["ingredient"] = df["ingredient"].astype("string").str.strip().fillna("")
+    df["consumption"] = pd.to_numeric(df["consumption"], errors="coerce")
+    if "date" in df:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce").fillna(default_date)
+    else:
+        df["date"] = default_date
+    if "type" in df:
+        df["type"] = df["type"].astype("string").str.strip().str.lower().fillna("daily")
+    else:
+        df["type"] = "daily"
+
+    valid = (df["ingredient"] != "") & df["consumption"].notna()
+    df = df[valid]
+
+    # Vectorized high risk flag
+    df = df.assign(high_risk=df["ingredient"].str.lower().isin(HIGH_RISK_INGREDIENTS))
+    return df, int((~valid).sum())
+
+def to_preview(df):
+    """Format rows the way the demand page expects them"""
+    preview = df[["date", "ingredient", "consumption", "type", "high_risk"]].copy()
+    preview["date"] = preview["date"].dt.date.astype(str)
+    return preview.astype(object).to_dict(orient="records")
+
+def ingest_consumption_file(filepath, collection, default_date=None, extra_fields=None,
+                            chunk_size=INSERT_BATCH_SIZE, preview_rows=PREVIEW_ROWS, rollups=None,
+                            archive=False):
+    """Ingest a consumption sheet into collection in bounded memory.
+
+    The file is read chunk by chunk, each chunk is normalised and bulk
+    inserted before the next one is read; when a rollups collection is
+    given, each chunk is also added to its totals, and with archive each
+    chunk is appended to the Parquet archive. Returns ingestion statistics
+    and a preview of the first rows.
+    """
+    extension = os.path.splitext(filepath)[1].lower().lstrip(".")
+    if extension not in READERS:
+        raise ValueError(f"Unsupported file type: {extension}")
+
+    default_date = pd.Timestamp(default_date or datetime.utcnow().date())
+    extra_fields = extra_fields or {}
+
+    rows = 0
+    rejected = 0
+    archived = 0
+    archive_errors = 0
+    preview = []
+    mapping = None
+    start = time.perf_counter()
+
+    for chunk in READERS[extension](filepath, chunk_size):
+        if mapping is None:
+            mapping = resolve_columns(chunk.columns)
+        df, chunk_rejected = normalize_chunk(chunk, mapping, default_date)
+        rejected += chunk_rejected
+        if df.empty:
+            continue
+
+        if len(preview) < preview_rows:
+            preview.extend(to_preview(df.head(preview_rows - len(preview))))
+
+        records = df.astype(object).to_dict(orient="records")
+        for record in records:
+            record["date"] = record["date"].to_pydatetime()
+            record.update(extra_fields)
+        collection.insert_many(records, ordered=False)
+        if rollups is not None:
+            update_rollups(rollups, df)
+        if archive:
+            # MongoDB stays the source of truth; after a failed append reads
+            # go back to it until the backfill-consumption-archive migration
+            # has rebuilt the archive
+            try:
+                archived += consumption_archive.append_chunk(df, extra_fields.get("upload_id"))
+            except Exception as e:
+                logger.error(f"Error archiving consumption chunk: {str(e)}")
+                consumption_archive.mark_incomplete()
+                archive_errors += 1
+        rows += len(records)
+
+    if rows and not archive:
+        # The archive is now missing these rows; keep forecasts on MongoDB
+        # until it is backfilled again
+        consumption_archive.mark_incomplete()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows": rows,
+        "rejected": rejected,
+        "archived": archived,
+        "archive_errors": archive_errors,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else float(rows)
+    }
+    logger.debug(f"Ingested {filepath}: {stats}")
+    return stats, preview
@@ -0,0 +1,185 @@
+"""Optional Parquet archive of the consumption history.
+
+Rows ingested by /upload are also written to Parquet files partitioned by
+month (month=YYYY-MM directories). Analytics read the archive with
+memory-mapped scans that load only the columns and month partitions a
+query needs, but only once the backfill-consumption-archive migration has
+copied the MongoDB history into it; until then, and after any failed
+append, readers use MongoDB. Off by default and requires pyarrow.
+"""
+from datetime import timedelta
+import logging
+import os
+import shutil
+import uuid
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+CONSUMPTION_ARCHIVE_DIR = os.getenv(
+    "CONSUMPTION_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "consumption_archive")
+)
+
+# Set to true to also write consumption to the Parquet archive
+CONSUMPTION_ARCHIVE = os.getenv("CONSUMPTION_ARCHIVE", "false").lower() in ("1", "true", "yes")
+
+# Written by a completed backfill, removed when an append fails; the leading
+# underscore keeps it out of pyarrow's dataset discovery
+COMPLETE_MARKER = "_BACKFILL_COMPLETE"
+
+ARCHIVE_COLUMNS = ["date", "ingredient", "consumption", "type", "high_risk"]
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("date", pa.timestamp("ms")),
+    ("ingredient", pa.string()),
+    ("consumption", pa.float64()),
+    ("type", pa.string()),
+    ("high_risk", pa.bool_()),
+    ("upload_id", pa.string()),
+]) if pa else None
+
+def archive_enabled():
+    return CONSUMPTION_ARCHIVE and pa is not None
+
+def archive_ready(root=CONSUMPTION_ARCHIVE_DIR):
+    """Whether the archive holds the full history and can replace MongoDB reads"""
+    return archive_enabled() and os.path.exists(os.path.join(root, COMPLETE_MARKER))
+
+def mark_incomplete(root=CONSUMPTION_ARCHIVE_DIR):
+    """Send readers back to MongoDB until the archive is backfilled again"""
+    try:
+        os.remove(os.path.join(root, COMPLETE_MARKER))
+    except FileNotFoundError:
+        pass
+
+def archived_months(root=CONSUMPTION_ARCHIVE_DIR):
+    """Month partitions present in the archive, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name.split("=", 1)[1] for name in os.listdir(root)
+        if name.startswith("month=") and os.path.isdir(os.path.join(root, name))
+    )
+
+def append_chunk(df, upload_id=None, root=CONSUMPTION_ARCHIVE_DIR):
+    """Write a normalised consumption chunk as one Parquet file per month.
+
+    Files are never rewritten: every chunk adds new files under its month
+    partitions, so concurrent uploads do not contend.
+    """
+    if not archive_enabled() or df.empty:
+        return 0
+
+    frame = df[ARCHIVE_COLUMNS].assign(
+        consumption=df["consumption"].astype("float64"),
+        ingredient=df["ingredient"].astype(str),
+        type=df["type"].astype(str),
+        upload_id=upload_id or ""
+    )
+    months = frame["date"].dt.strftime("%Y-%m")
+    written = 0
+    for month, part in frame.groupby(months, sort=False):
+        directory = os.path.join(root, f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_pandas(part, schema=ARCHIVE_SCHEMA, preserve_index=False)
+        pq.write_table(table, os.path.join(directory, f"{uuid.uuid4().hex}.parquet"))
+        written += len(part)
+    return written
+
+def scan(columns, start=None, end=None, ingredients=None, root=CONSUMPTION_ARCHIVE_DIR):
+    """Read only the given columns of the rows between start and end (inclusive days).
+
+    Month partitions outside the range are skipped without being opened,
+    and files are memory-mapped rather than read into buffers.
+    """
+    if not archive_enabled() or not archived_months(root):
+        return pd.DataFrame(columns=columns)
+
+    filters = []
+    if start is not None:
+        filters += [("month", ">=", f"{start:%Y-%m}"), ("date", ">=", pd.Timestamp(start))]
+    if end is not None:
+        end_exclusive = pd.Timestamp(end).normalize() + timedelta(days=1)
+        filters += [("month", "<=", f"{end:%Y-%m}"), ("date", "<", end_exclusive)]
+    if ingredients:
+        filters.append(("ingredient", "in", list(ingredients)))
+
+    table = pq.read_table(
+        root,
+        columns=columns,
+        filters=filters or None,
+        partitioning="hive",
+        memory_map=True
+    )
+    return table.to_pandas()
+
+def latest_date(root=CONSUMPTION_ARCHIVE_DIR):
+    """Most recent consumption date, read from the newest month partition only"""
+    months = archived_months(root)
+    if not archive_enabled() or not months:
+        return None
+    table = pq.read_table(
+        os.path.join(root, f"month={months[-1]}"),
+        columns=["date"],
+        memory_map=True
+    )
+    if table.num_rows == 0:
+        return None
+    return pd.Timestamp(table.column("date").to_pandas().max())
+
+def daily_consumption(start, end, ingredients=None, root=CONSUMPTION_ARCHIVE_DIR):
+    """Consumption summed per ingredient and day, as ingredient/day/consumption rows"""
+    rows = scan(["date", "ingredient", "consumption"], start, end, ingredients, root)
+    if rows.empty:
+        return pd.DataFrame(columns=["ingredient", "day", "consumption"])
+    rows["day"] = pd.to_datetime(rows["date"]).dt.normalize()
+    return rows.groupby(["ingredient", "day"], as_index=False, sort=False)["consumption"].sum()
+
+def backfill_from_mongo(db, batch_size=5000, root=CONSUMPTION_ARCHIVE_DIR):
+    """Rebuild the archive from the consumption rows stored in MongoDB.
+
+    Existing month partitions are replaced, and the archive is marked
+    complete only once every row has been copied. Rows uploaded while the
+    backfill runs may be archived twice, so run it with uploads paused.
+    """
+    if not archive_enabled():
+        raise RuntimeError("The consumption archive needs pyarrow and CONSUMPTION_ARCHIVE=true")
+
+    mark_incomplete(root)
+    for month in archived_months(root):
+        shutil.rmtree(os.path.join(root, f"month={month}"))
+
+    projection = {"_id": 0, "date": 1, "ingredient": 1, "consumption": 1, "type": 1, "high_risk": 1, "upload_id": 1}
+    batch = []
+    archived = 0
+
+    def flush():
+        nonlocal archived
+        if batch:
+            df = pd.DataFrame(batch).reindex(columns=ARCHIVE_COLUMNS + ["upload_id"])
+            df["type"] = df["type"].fillna("daily")
+            df["high_risk"] = df["high_risk"].fillna(False).astype(bool)
+            df["date"] = pd.to_datetime(df["date"])
+            for upload_id, part in df.groupby(df["upload_id"].fillna(""), sort=False):
+                archived += append_chunk(part, upload_id, root)
+            batch.clear()
+
+    for row in db.consumption.find({}, projection):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, COMPLETE_MARKER), "w") as marker:
+        marker.write(f"{archived}\n")
+    return {"archived": archived, "months": len(archived_months(root))}
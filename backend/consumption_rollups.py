@@ -0,0 +1,146 @@
+"""Daily, weekly and monthly consumption totals kept up to date on ingest.
+
+Each summary document holds the totals of one ingredient for one bucket
+(period and start date); a second document per bucket, with ingredient
+set to null, holds the totals over all ingredients. Ingestion adds to
+them with $inc upserts, so reading a dashboard range touches a number of
+documents that depends on the range, not on how many raw rows exist.
+"""
+from flask import request, jsonify
+from datetime import datetime
+import logging
+import pandas as pd
+from pymongo import UpdateOne
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Bucket start of each period for a Series of dates; weeks start on Monday
+PERIODS = {
+    "day": lambda dates: dates.dt.normalize(),
+    "week": lambda dates: dates.dt.to_period("W-SUN").dt.start_time,
+    "month": lambda dates: dates.dt.to_period("M").dt.start_time,
+}
+
+def _rollup_id(period, start, ingredient):
+    return f"{period}:{start:%Y-%m-%d}:{ingredient if ingredient is not None else '*'}"
+
+def _increment(period, start, ingredient, total, high_risk_total, count):
+    return UpdateOne(
+        {"_id": _rollup_id(period, start, ingredient)},
+        {
+            "$inc": {"total": total, "high_risk_total": high_risk_total, "rows": count},
+            "$setOnInsert": {"period": period, "start": start, "ingredient": ingredient}
+        },
+        upsert=True
+    )
+
+def rollup_ops(df):
+    """$inc upserts adding a normalised consumption chunk to every bucket.
+
+    The chunk is summed per bucket first, so a chunk costs one write per
+    distinct (period, bucket, ingredient) rather than one per row.
+    """
+    df = df.assign(high_risk_consumption=df["consumption"].where(df["high_risk"], 0.0))
+    ops = []
+    for period, bucket in PERIODS.items():
+        grouped = df.assign(start=bucket(df["date"])).groupby(["start", "ingredient"], sort=False).agg(
+            total=("consumption", "sum"),
+            high_risk_total=("high_risk_consumption", "sum"),
+            rows=("consumption", "size")
+        )
+        for (start, ingredient), total, high_risk_total, rows in zip(
+                grouped.index, grouped["total"], grouped["high_risk_total"], grouped["rows"]):
+            ops.append(_increment(period, start.to_pydatetime(), ingredient, float(total), float(high_risk_total), int(rows)))
+
+        totals = grouped.groupby(level="start").sum()
+        for start, total, high_risk_total, rows in zip(
+                totals.index, totals["total"], totals["high_risk_total"], totals["rows"]):
+            ops.append(_increment(period, start.to_pydatetime(), None, float(total), float(high_risk_total), int(rows)))
+    return ops
+
+def update_rollups(collection, df):
+    """Add a normalised consumption chunk to the rollups in collection"""
+    ops = rollup_ops(df)
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+    return len(ops)
+
+def rebuild_rollups(db, batch_size=5000):
+    """Recompute every rollup from the raw consumption rows"""
+    db.consumption_rollups.delete_many({})
+    projection = {"_id": 0, "date": 1, "ingredient": 1, "consumption": 1, "high_risk": 1}
+    batch = []
+    buckets = 0
+
+    def flush():
+        nonlocal buckets
+        if batch:
+            df = pd.DataFrame(batch)
+            # Rows stored before the flag existed count as not high risk
+            df["high_risk"] = df.get("high_risk", pd.Series(False, index=df.index)).fillna(False).astype(bool)
+            buckets += update_rollups(db.consumption_rollups, df)
+            batch.clear()
+
+    for row in db.consumption.find({}, projection):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return {"rollups": db.consumption_rollups.count_documents({}), "writes": buckets}
+
+def serialize_rollup(rollup):
+    return {
+        "period": rollup["period"],
+        "start": rollup["start"].date().isoformat(),
+        "ingredient": rollup["ingredient"],
+        "total": rollup.get("total", 0),
+        "high_risk_total": rollup.get("high_risk_total", 0),
+        "rows": rollup.get("rows", 0)
+    }
+
+def rollups_endpoint(db):
+    """GET /consumption/rollups?period=week&start=2025-01-01&end=2025-03-31&ingredients=Milk,Eggs
+
+    Without ingredients only the all-ingredient totals are returned;
+    ingredients=* returns every ingredient.
+    """
+    try:
+        period = request.args.get("period", "day")
+        if period not in PERIODS:
+            return jsonify({"success": False, "message": f"period must be one of {', '.join(PERIODS)}"}), 400
+
+        query = {"period": period}
+        try:
+            date_range = {}
+            if request.args.get("start"):
+                date_range["$gte"] = datetime.fromisoformat(request.args["start"])
+            if request.args.get("end"):
+                date_range["$lte"] = datetime.fromisoformat(request.args["end"])
+        except ValueError:
+            return jsonify({"success": False, "message": "start and end must be YYYY-MM-DD dates"}), 400
+        if date_range:
+            query["start"] = date_range
+
+        ingredients = request.args.get("ingredients", "")
+        if ingredients == "*":
+            query["ingredient"] = {"$ne": None}
+        elif ingredients:
+            query["ingredient"] = {"$in": [name.strip() for name in ingredients.split(",") if name.strip()]}
+        else:
+            query["ingredient"] = None
+
+        rollups = db.consumption_rollups.find(query).sort([("start", 1), ("ingredient", 1)])
+        return jsonify({
+            "success": True,
+            "period": period,
+            "rollups": [serialize_rollup(rollup) for rollup in rollups]
+        })
+    except Exception as e:
+        logger.error(f"Error fetching consumption rollups: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch consumption rollups",
+            "error": str(e)
+        }), 500
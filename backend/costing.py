@@ -0,0 +1,245 @@
+"""Dish costs from an ingredient price table.
+
+Prices are stored per unit (e.g. 12.0 per kg) in ingredient_prices, keyed
+by canonical ingredient name. Every dish ingredient is converted to the
+base unit of its price's dimension, so costing many dishes is one gather
+and one bincount over flat arrays. A price change only recomputes the
+dishes the ingredient inverted index lists for that ingredient.
+"""
+from flask import request, jsonify
+from datetime import datetime
+import logging
+import math
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+from ingredient_index import canonicalize, ingredient_names
+from versioning import bump_version
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Unit -> (dimension, size in the dimension's base unit). Counted units are
+# their own dimension: a clove does not convert to pieces.
+UNITS = {
+    "g": ("mass", 1.0),
+    "kg": ("mass", 1000.0),
+    "ml": ("volume", 1.0),
+    "l": ("volume", 1000.0),
+    "tbsp": ("volume", 15.0),
+    "tsp": ("volume", 5.0),
+    "pcs": ("pcs", 1.0),
+    "slices": ("slices", 1.0),
+    "cloves": ("cloves", 1.0),
+}
+
+UNIT_ALIASES = {
+    "gram": "g", "grams": "g", "gr": "g",
+    "kilogram": "kg", "kilograms": "kg", "kgs": "kg",
+    "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "liter": "l", "liters": "l", "litre": "l", "litres": "l",
+    "tablespoon": "tbsp", "tablespoons": "tbsp", "tbs": "tbsp",
+    "teaspoon": "tsp", "teaspoons": "tsp",
+    "piece": "pcs", "pieces": "pcs", "pc": "pcs",
+    "slice": "slices",
+    "clove": "cloves",
+}
+
+def normalize_unit(unit):
+    """Registry name of a unit, or None when it is not known"""
+    unit = str(unit or "pcs").strip().lower().rstrip(".")
+    unit = UNIT_ALIASES.get(unit, unit)
+    return unit if unit in UNITS else None
+
+def to_base(quantity, unit, dimension):
+    """Quantity in the base unit of dimension; None if the units do not convert"""
+    unit = normalize_unit(unit)
+    if unit is None or UNITS[unit][0] != dimension:
+        return None
+    try:
+        return float(quantity) * UNITS[unit][1]
+    except (TypeError, ValueError):
+        return None
+
+def _price_query(keys):
+    return {"_id": {"$in": list(keys)}} if keys is not None else {}
+
+def _unit_price(entry):
+    dimension, size = UNITS[entry["unit"]]
+    return entry["price"] / size, dimension
+
+def load_prices(db, keys=None):
+    """Price per base unit and dimension, by canonical ingredient name"""
+    return {entry["_id"]: _unit_price(entry) for entry in db.ingredient_prices.find(_price_query(keys))}
+
+async def load_prices_async(db, keys=None):
+    """load_prices for Motor databases"""
+    return {entry["_id"]: _unit_price(entry) async for entry in db.ingredient_prices.find(_price_query(keys))}
+
+def _dish_keys(dishes):
+    return {canonicalize(name) for dish in dishes for name in ingredient_names(dish.get("ingredients"))}
+
+def cost_dishes(dishes, prices):
+    """Cost, margin and unpriced ingredients of each dish, in order.
+
+    Ingredients without a price, or in a unit that does not convert to the
+    price's unit, are left out of the cost and listed as unpriced; a dish
+    with no priced ingredient at all has no cost.
+    """
+    keys = {key: i for i, key in enumerate(prices)}
+    unit_prices = np.array([prices[key][0] for key in keys], dtype=np.float64)
+
+    rows, cols, amounts = [], [], []
+    unpriced = [[] for _ in dishes]
+    for row, dish in enumerate(dishes):
+        for ingredient in dish.get("ingredients") or []:
+            if not isinstance(ingredient, dict):
+                ingredient = {"name": ingredient}
+            name = str(ingredient.get("name") or "").strip()
+            if not name:
+                continue
+            key = canonicalize(name)
+            amount = None
+            if key in keys:
+                amount = to_base(ingredient.get("quantity", 1), ingredient.get("unit"), prices[key][1])
+            if amount is None:
+                unpriced[row].append(name)
+                continue
+            rows.append(row)
+            cols.append(keys[key])
+            amounts.append(amount)
+
+    rows = np.asarray(rows, dtype=np.intp)
+    cols = np.asarray(cols, dtype=np.intp)
+    line_costs = np.asarray(amounts, dtype=np.float64) * unit_prices[cols]
+    costs = np.bincount(rows, weights=line_costs, minlength=len(dishes)).astype(np.float64)
+    costs[np.bincount(rows, minlength=len(dishes)) == 0] = np.nan
+
+    menu_prices = np.array([float(dish.get("price") or 0) for dish in dishes], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margins = np.where(menu_prices > 0, (menu_prices - costs) / menu_prices * 100, np.nan)
+
+    return [{
+        "cost": None if np.isnan(cost) else round(float(cost), 2),
+        "profit_margin": None if np.isnan(margin) else round(float(margin), 2),
+        "unpriced_ingredients": missing
+    } for cost, margin, missing in zip(costs, margins, unpriced)]
+
+def _apply_costs(dishes, prices):
+    now = datetime.utcnow()
+    for dish, costs in zip(dishes, cost_dishes(dishes, prices)):
+        dish.update(costs, cost_updated_at=now)
+    return dishes
+
+def price_dishes(db, dishes):
+    """Set cost fields on new dish documents before they are inserted"""
+    return _apply_costs(dishes, load_prices(db, _dish_keys(dishes)))
+
+async def price_dishes_async(db, dishes):
+    """price_dishes for Motor databases"""
+    return _apply_costs(dishes, await load_prices_async(db, _dish_keys(dishes)))
+
+def recompute_costs(db, dish_ids=None, batch_size=1000):
+    """Recompute and store the costs of the given dishes, or of all dishes"""
+    query = {"_id": {"$in": list(dish_ids)}} if dish_ids is not None else {}
+    dishes = list(db.dishes.find(query, {"price": 1, "ingredients": 1}))
+    if not dishes:
+        return 0
+
+    prices = load_prices(db, None if dish_ids is None else _dish_keys(dishes))
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"_id": dish["_id"]}, {"$set": {**costs, "cost_updated_at": now}})
+        for dish, costs in zip(dishes, cost_dishes(dishes, prices))
+    ]
+    for i in range(0, len(ops), batch_size):
+        db.dishes.bulk_write(ops[i:i + batch_size], ordered=False)
+    bump_version(db, "dishes")
+    return len(ops)
+
+def set_price(db, name, price, unit):
+    """Store an ingredient price and recompute only the dishes using it"""
+    key = canonicalize(name)
+    if not key:
+        raise ValueError("Ingredient name is required")
+    unit = normalize_unit(unit)
+    if unit is None:
+        raise ValueError(f"Unknown unit; use one of {', '.join(UNITS)}")
+    price = float(price)
+    if not math.isfinite(price):
+        raise ValueError("Price must be a finite number")
+    if price < 0:
+        raise ValueError("Price cannot be negative")
+
+    db.ingredient_prices.update_one(
+        {"_id": key},
+        {"$set": {"name": name.strip(), "price": price, "unit": unit, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    bump_version(db, "ingredient_prices")
+
+    # The ingredient inverted index is the reverse index from ingredient to dishes
+    entry = db.ingredient_index.find_one({"_id": key}, {"dish_ids": 1})
+    dish_ids = [ObjectId(dish_id) for dish_id in (entry or {}).get("dish_ids", [])]
+    recomputed = recompute_costs(db, dish_ids) if dish_ids else 0
+    return key, recomputed
+
+def serialize_price(entry):
+    return {
+        "name": entry.get("name", entry["_id"]),
+        "key": entry["_id"],
+        "price": entry["price"],
+        "unit": entry["unit"],
+        "updated_at": entry["updated_at"].isoformat() if entry.get("updated_at") else None
+    }
+
+def get_prices_endpoint(db):
+    try:
+        return jsonify({
+            "success": True,
+            "units": list(UNITS),
+            "prices": [serialize_price(entry) for entry in db.ingredient_prices.find().sort("_id", 1)]
+        })
+    except Exception as e:
+        logger.error(f"Error fetching ingredient prices: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch ingredient prices",
+            "error": str(e)
+        }), 500
+
+def set_prices_endpoint(db):
+    """Set one price or a list of them: {"name", "price", "unit"}"""
+    try:
+        data = request.get_json(silent=True)
+        entries = data if isinstance(data, list) else [data] if data else []
+        if not entries:
+            return jsonify({"success": False, "message": "No prices provided"}), 400
+
+        results = []
+        invalid = False
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("name") or entry.get("price") is None:
+                results.append({"success": False, "message": "name and price are required"})
+                invalid = True
+                continue
+            try:
+                key, recomputed = set_price(db, entry["name"], entry["price"], entry.get("unit"))
+            except (TypeError, ValueError) as e:
+                results.append({"name": entry["name"], "success": False, "message": str(e)})
+                invalid = True
+                continue
+            results.append({"name": entry["name"], "key": key, "success": True, "dishes_recomputed": recomputed})
+
+        return jsonify({
+            "success": not invalid,
+            "prices": results
+        }), 400 if invalid else 200
+    except Exception as e:
+        logger.error(f"Error setting ingredient prices: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to set ingredient prices",
+            "error": str(e)
+        }), 500
@@ -1,25 +1,166 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReadPreference
+from pymongo.collection import Collection
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import partial
 import os
+import threading
 from dotenv import load_dotenv
+from indexes import slow_query_listener
 
 # Load environment variables
 load_dotenv()
 
 # MongoDB Atlas connection string
 MONGODB_URI = os.getenv('MONGODB_URI')
+DATABASE_NAME = os.getenv('MONGODB_DATABASE', 'kitchen_db')
 
-# Initialize MongoDB client
-client = MongoClient(MONGODB_URI)
+def _int_env(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+# Connection pool and timeout settings, per worker process
+CLIENT_OPTIONS = {
+    "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 100),
+    "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 0),
+    "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS"),
+    "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+    "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS", 5000),
+    "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS", 30000),
+}
+
+# Read preference for GET routes, e.g. secondaryPreferred to offload the primary
+READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+class ConnectionManager:
+    """Owns the MongoClient of the current process.
+
+    The client is created on first use rather than at import, so startup
+    never waits on Atlas. A client inherited across fork() is not safe to
+    use, so a process that finds a client created by another PID (a
+    pre-fork server worker) builds its own.
+    """
+
+    def __init__(self, uri, database_name, options):
+        self.uri = uri
+        self.database_name = database_name
+        self.options = {key: value for key, value in options.items() if value is not None}
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = MongoClient(
+                        self.uri,
+                        event_listeners=[slow_query_listener],
+                        **self.options
+                    )
+                    self._pid = os.getpid()
+        return self._client
+
+    def get_db(self, read_preference=None):
+        if read_preference is None:
+            return self.get_client()[self.database_name]
+        return self.get_client().get_database(self.database_name, read_preference=read_preference)
+
+    def ping(self):
+        """Raise unless the deployment answers within the selection timeout"""
+        self.get_client().admin.command("ping")
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+manager = ConnectionManager(MONGODB_URI, DATABASE_NAME, CLIENT_OPTIONS)
+
+# Session that reads through the lazy handles join, set by causal_reads
+_read_session = ContextVar("read_session", default=None)
+
+# Collection methods that take part in the active read session
+SESSION_READ_METHODS = {"find", "find_one", "aggregate", "count_documents", "distinct", "estimated_document_count"}
+
+class SessionCollection:
+    """A Collection whose reads run in the given session"""
+
+    def __init__(self, collection, session):
+        self._collection = collection
+        self._session = session
+
+    def __getattr__(self, name):
+        value = getattr(self._collection, name)
+        if name in SESSION_READ_METHODS:
+            return partial(value, session=self._session)
+        return value
+
+def _in_read_session(value):
+    session = _read_session.get()
+    if session is not None and isinstance(value, Collection):
+        return SessionCollection(value, session)
+    return value
+
+class LazyDatabase:
+    """Stands in for a Database, resolving it on each attribute access"""
+
+    def __init__(self, read_preference=None):
+        self._read_preference = read_preference
+
+    def __getattr__(self, name):
+        return _in_read_session(getattr(manager.get_db(self._read_preference), name))
+
+    def __getitem__(self, name):
+        return _in_read_session(manager.get_db(self._read_preference)[name])
+
+class LazyCollection:
+    """Stands in for a Collection, resolving it on each attribute access"""
+
+    def __init__(self, name, read_preference=None):
+        self._name = name
+        self._read_preference = read_preference
+
+    def __getattr__(self, name):
+        return getattr(_in_read_session(manager.get_db(self._read_preference)[self._name]), name)
+
+@contextmanager
+def _causal_session():
+    with manager.get_client().start_session(causal_consistency=True) as session:
+        token = _read_session.set(session)
+        try:
+            yield session
+        finally:
+            _read_session.reset(token)
+
+def causal_reads(db):
+    """Context in which reads through the lazy handles share one causally consistent session.
+
+    Secondary reads may land on members at different points of replication;
+    within the session each read sees at least what the reads before it saw.
+    Primary reads are already ordered, so for them this does nothing.
+    """
+    read_preference = getattr(db, "_read_preference", None) if isinstance(db, LazyDatabase) else None
+    if read_preference is None or read_preference == ReadPreference.PRIMARY:
+        return nullcontext()
+    return _causal_session()
 
 # Get database
-db = client.kitchen_db
+db = LazyDatabase()
+
+# Database handle for GET routes, honouring MONGO_READ_PREFERENCE
+read_db = LazyDatabase(READ_PREFERENCES[READ_PREFERENCE])
 
 # Get collections
-dishes_collection = db.dishes
-
-# Test connection
-try:
-    client.server_info()
-    print("Successfully connected to MongoDB!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}") 
\ No newline at end of file
+dishes_collection = LazyCollection("dishes")
+read_dishes_collection = LazyCollection("dishes", READ_PREFERENCES[READ_PREFERENCE])
@@ -0,0 +1,187 @@
+from flask import request, jsonify
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+from pymongo.errors import BulkWriteError
+from db_config import dishes_collection
+from dishes import validate_dish_fields, new_dish_document
+from versioning import bump_version
+from ingredient_index import index_dishes
+from costing import price_dishes
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Dishes per insert_many call
+IMPORT_BATCH_SIZE = 1000
+
+# Row errors returned in full; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = {"csv", "xlsx", "ndjson", "jsonl"}
+
+def iter_csv_rows(stream):
+    """Yield (line number, row dict); line 1 is the header"""
+    reader = csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+    for i, row in enumerate(reader, start=2):
+        yield i, row
+
+def iter_xlsx_rows(stream):
+    """Stream rows of the first sheet in read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else "" for c in next(rows, ())]
+        for i, row in enumerate(rows, start=2):
+            if all(value is None for value in row):
+                continue
+            yield i, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+def iter_ndjson_rows(stream):
+    for i, line in enumerate(codecs.iterdecode(stream, "utf-8"), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            row = e
+        yield i, row
+
+READERS = {
+    "csv": iter_csv_rows,
+    "xlsx": iter_xlsx_rows,
+    "ndjson": iter_ndjson_rows,
+    "jsonl": iter_ndjson_rows,
+}
+
+def spreadsheet_ingredients(value):
+    """Spreadsheet cells may hold a JSON list or names separated by ';'"""
+    if isinstance(value, str) and value.strip() and not value.strip().startswith("["):
+        return [name.strip() for name in value.split(";") if name.strip()]
+    return value
+
+def row_to_dish(row, spreadsheet=False):
+    """Validate one row with add_dish_endpoint's rules; returns (dish, error)"""
+    if isinstance(row, Exception):
+        return None, f"Invalid JSON: {str(row)}"
+    if not isinstance(row, dict):
+        return None, "Row is not an object"
+
+    ingredients = row.get("ingredients")
+    if spreadsheet:
+        ingredients = spreadsheet_ingredients(ingredients)
+    fields, error = validate_dish_fields(row.get("name"), row.get("price"), ingredients or '[]')
+    if error:
+        return None, error
+    return new_dish_document(fields, row.get("photo_url") or row.get("photo") or None), None
+
+def import_dishes(rows, collection, spreadsheet=False, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and insert dishes in unordered batches.
+
+    Invalid rows and rows the database rejects are reported with their line
+    number without stopping the import. Any other error stops it, but the
+    dishes version is bumped for whatever batches reached the database.
+    """
+    inserted = 0
+    failed = 0
+    errors = []
+    written = False
+
+    def record_error(line, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": line, "error": message})
+
+    def flush(batch, lines):
+        nonlocal inserted, written
+        if not batch:
+            return
+        price_dishes(collection.database, batch)
+        rejected = set()
+        # A failed insert_many may still have written part of the batch
+        written = True
+        try:
+            inserted += len(collection.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                rejected.add(write_error["index"])
+                record_error(lines[write_error["index"]], write_error.get("errmsg", "Write failed"))
+        # insert_many sets _id on each document it was given
+        index_dishes(collection.database, [dish for i, dish in enumerate(batch) if i not in rejected])
+
+    batch = []
+    lines = []
+    start = time.perf_counter()
+    try:
+        for line, row in rows:
+            dish, error = row_to_dish(row, spreadsheet)
+            if error:
+                record_error(line, error)
+                continue
+            batch.append(dish)
+            lines.append(line)
+            if len(batch) >= batch_size:
+                flush(batch, lines)
+                batch, lines = [], []
+        flush(batch, lines)
+    finally:
+        if written:
+            bump_version(collection.database, "dishes")
+    elapsed = time.perf_counter() - start
+
+    processed = inserted + failed
+    return {
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(processed / elapsed, 1) if elapsed > 0 else float(processed)
+    }
+
+def bulk_import_endpoint():
+    """Import many dishes from a CSV, XLSX or NDJSON upload (form field "file").
+
+    An NDJSON request body (Content-Type application/x-ndjson) is accepted
+    too. Rows carry name, price, ingredients and optionally photo_url.
+    """
+    try:
+        if "file" in request.files:
+            upload = request.files["file"]
+            fmt = os.path.splitext(upload.filename or "")[1].lower().lstrip(".")
+            stream = upload.stream
+        elif request.mimetype in ("application/x-ndjson", "application/jsonl"):
+            fmt = "ndjson"
+            stream = request.stream
+        else:
+            return jsonify({"success": False, "message": "No file uploaded"}), 400
+
+        if fmt not in IMPORT_FORMATS:
+            return jsonify({
+                "success": False,
+                "message": f"Unsupported format: {fmt or 'unknown'}. Use CSV, XLSX or NDJSON"
+            }), 400
+
+        result = import_dishes(READERS[fmt](stream), dishes_collection, spreadsheet=fmt in ("csv", "xlsx"))
+        logger.debug(f"Bulk imported {result['inserted']} dishes ({result['failed']} failed) at {result['rows_per_sec']} rows/sec")
+
+        return jsonify({"success": result["failed"] == 0, **result})
+
+    except Exception as e:
+        logger.error(f"Error in bulk import: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to import dishes",
+            "error": str(e)
+        }), 500
@@ -0,0 +1,71 @@
+import json
+import re
+
+class ArrayObjectParser:
+    """Incrementally extract the objects of a JSON array from streamed text.
+
+    Text is fed chunk by chunk as the model produces it. Once the array held
+    under key has opened, every top-level object inside it is parsed and
+    returned as soon as its closing brace arrives, without waiting for the
+    rest of the document.
+    """
+
+    def __init__(self, key="dishes"):
+        self._array_start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+        self.finished = False
+
+    def feed(self, text):
+        """Consume a chunk of text and return the objects it completed"""
+        self._buffer += text
+        objects = []
+
+        if not self._in_array:
+            match = self._array_start.search(self._buffer)
+            if not match:
+                return objects
+            self._in_array = True
+            self._pos = match.end()
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer) and not self.finished:
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        objects.append(json.loads(buffer[self._object_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._object_start = None
+            elif char == "]" and self._depth == 0:
+                self.finished = True
+            i += 1
+
+        # Drop text that can no longer be part of an object
+        keep_from = self._object_start if self._object_start is not None else i
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._object_start is not None:
+            self._object_start = 0
+        return objects
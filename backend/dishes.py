@@ -1,11 +1,16 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 import os
 import json
+import base64
 import logging
-from werkzeug.utils import secure_filename
 from datetime import datetime
-from db_config import dishes_collection
-import uuid
+from db_config import dishes_collection, read_dishes_collection
+from bson import ObjectId
+from bson.errors import InvalidId
+from photos import store_photo
+from versioning import bump_version
+from ingredient_index import index_dish
+from costing import price_dishes
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -16,65 +21,240 @@ UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Pagination limits for /get-dishes
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 200
+
+# Keys a page can be ordered by; _id is monotonic with creation time
+SORT_KEYS = ("_id", "created_at")
+
+def normalize_ingredients(ingredients):
+    """Bring legacy string ingredients and missing fields into the dict schema.
+
+    Applied when dishes are written; documents stored before that are fixed
+    once by `python migrations.py normalize-ingredients`.
+    """
+    normalized = []
+    for ingredient in ingredients:
+        if isinstance(ingredient, str):
+            ingredient = {"name": ingredient}
+        if isinstance(ingredient, dict):
+            ingredient.setdefault("quantity", 1)
+            ingredient.setdefault("unit", "pcs")
+            normalized.append(ingredient)
+    return normalized
+
+def serialize_dish(dish):
+    """Make a dish document JSON serializable"""
+    dish["_id"] = str(dish["_id"])
+    if "created_at" in dish:
+        dish["created_at"] = dish["created_at"].isoformat() if dish["created_at"] else None
+    if "updated_at" in dish:
+        dish["updated_at"] = dish["updated_at"].isoformat() if dish["updated_at"] else None
+    return dish
+
+def parse_fields(fields):
+    """Build a projection from a comma separated fields= parameter"""
+    if not fields:
+        return None
+    projection = {}
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        if field.startswith("$") or not all(c.isalnum() or c in "_." for c in field):
+            raise ValueError(f"Invalid field: {field}")
+        projection[field] = 1
+    return projection or None
+
+def encode_cursor(dish, sort_key):
+    """Encode the position after the given (raw) dish as an opaque cursor"""
+    position = {"k": sort_key, "id": str(dish["_id"])}
+    if sort_key == "created_at":
+        # Dishes stored before created_at existed sort first, as null
+        created_at = dish.get("created_at")
+        position["v"] = created_at.isoformat() if created_at else None
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor, sort_key):
+    """Turn a cursor back into a keyset filter"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = ObjectId(position["id"])
+        if position["k"] != sort_key:
+            raise ValueError("cursor was issued for a different sort")
+        if sort_key == "_id":
+            return {"_id": {"$gt": last_id}}
+        last_created = position["v"] and datetime.fromisoformat(position["v"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if last_created is None:
+        return {"$or": [
+            {"created_at": {"$ne": None}},
+            {"created_at": None, "_id": {"$gt": last_id}}
+        ]}
+    return {"$or": [
+        {"created_at": {"$gt": last_created}},
+        {"created_at": last_created, "_id": {"$gt": last_id}}
+    ]}
+
+def next_cursor_line(next_cursor):
+    """Last NDJSON line of a limited stream; next_cursor is null on the last page"""
+    return json.dumps({"next_cursor": next_cursor}) + "\n"
+
+def stream_dishes(cursor, limit=None, sort_key="_id"):
+    """Yield dishes as NDJSON lines while the cursor produces them.
+
+    With a limit the cursor is expected to return one dish more than the
+    page; that dish is not sent but ends the stream with a next_cursor line.
+    """
+    next_cursor = None
+    for count, dish in enumerate(cursor):
+        if count == limit:
+            next_cursor = encode_cursor(last, sort_key)
+            break
+        last = {"_id": dish["_id"], "created_at": dish.get("created_at")}
+        yield json.dumps(serialize_dish(dish), default=str) + "\n"
+    if limit:
+        yield next_cursor_line(next_cursor)
+
 def get_all_dishes():
+    """List dishes.
+
+    Query parameters:
+        limit   -- page size; when given the response carries next_cursor
+        cursor  -- next_cursor from the previous page
+        sort    -- "_id" (default) or "created_at"
+        fields  -- comma separated projection, e.g. fields=name,price
+        format  -- "ndjson" streams one dish per line instead of a JSON array,
+                   ending with a {"next_cursor": ...} line when limit is given
+    """
     try:
-        # Fetch all dishes from MongoDB
-        dishes = list(dishes_collection.find())
-        
-        # Convert ObjectId to string for JSON serialization
-        for dish in dishes:
-            dish['_id'] = str(dish['_id'])
-            dish['created_at'] = dish['created_at'].isoformat()
-            dish['updated_at'] = dish['updated_at'].isoformat()
-            
+        sort_key = request.args.get("sort", "_id")
+        if sort_key not in SORT_KEYS:
+            return jsonify({"success": False, "message": f"Invalid sort: {sort_key}"}), 400
+
+        limit = request.args.get("limit", type=int)
+        if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+            return jsonify({"success": False, "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+        try:
+            projection = parse_fields(request.args.get("fields"))
+            query = {}
+            if request.args.get("cursor"):
+                query = decode_cursor(request.args["cursor"], sort_key)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        if projection is not None and sort_key == "created_at":
+            # The cursor needs the sort key even when it was not requested
+            projection["created_at"] = 1
+
+        sort = [("_id", 1)] if sort_key == "_id" else [("created_at", 1), ("_id", 1)]
+        cursor = read_dishes_collection.find(query, projection).sort(sort)
+
+        if request.args.get("format") == "ndjson":
+            cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+            if limit:
+                cursor = cursor.limit(limit + 1)
+            return Response(stream_with_context(stream_dishes(cursor, limit, sort_key)), mimetype="application/x-ndjson")
+
+        if not limit:
+            return jsonify({
+                "success": True,
+                "dishes": [serialize_dish(dish) for dish in cursor]
+            })
+
+        # Fetch one extra document to know whether another page exists
+        dishes = list(cursor.limit(limit + 1))
+        next_cursor = encode_cursor(dishes[limit - 1], sort_key) if len(dishes) > limit else None
         return jsonify({
             "success": True,
-            "dishes": dishes
+            "dishes": [serialize_dish(dish) for dish in dishes[:limit]],
+            "next_cursor": next_cursor
         })
     except Exception as e:
         logger.error(f"Error fetching dishes: {str(e)}")
-        return jsonify({"error": "Failed to fetch dishes"}), 500
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch dishes",
+            "error": str(e)
+        }), 500
+
+def validate_dish_fields(name, price, ingredients):
+    """Check and coerce the fields of a new dish.
+
+    price may be a string and ingredients a JSON string, as they arrive from
+    forms and files. Returns (fields, None) or (None, error message).
+    """
+    try:
+        price = float(price or 0)
+    except (TypeError, ValueError):
+        return None, "Invalid price"
+
+    if isinstance(ingredients, str):
+        try:
+            ingredients = json.loads(ingredients or '[]')
+        except json.JSONDecodeError:
+            return None, "Invalid ingredients"
+
+    if not name or not price or not ingredients:
+        return None, "Missing required fields"
+    if not isinstance(ingredients, list):
+        return None, "Invalid ingredients"
+
+    return {
+        "name": name,
+        "price": price,
+        "ingredients": normalize_ingredients(ingredients)
+    }, None
+
+def new_dish_document(fields, photo_url=None, photo_hash=None):
+    """Create dish object with additional fields"""
+    now = datetime.utcnow()
+    return {
+        **fields,
+        "photo": photo_url,
+        "photo_hash": photo_hash,
+        "created_at": now,
+        "updated_at": now
+    }
 
 def add_dish_endpoint():
     try:
         logger.debug("Received add-dish request")
         
         # Get form data
-        name = request.form.get('name')
-        price = float(request.form.get('price', 0))
-        ingredients = json.loads(request.form.get('ingredients', '[]'))
+        fields, error = validate_dish_fields(
+            request.form.get('name'),
+            request.form.get('price', 0),
+            request.form.get('ingredients', '[]')
+        )
         
         # Handle photo
         photo_url = request.form.get('photo_url')
         photo_file = request.files.get('photo_file')
 
-        if not name or not price or not ingredients:
-            return jsonify({"error": "Missing required fields"}), 400
+        if error:
+            return jsonify({"error": error}), 400
             
         # Save photo if it's a file upload
+        photo_hash = None
         if photo_file:
-            # Generate unique filename to prevent overwriting
-            file_extension = os.path.splitext(photo_file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            filepath = os.path.join(UPLOAD_FOLDER, unique_filename)
-            
-            # Save the file
-            photo_file.save(filepath)
-            photo_url = f"/uploads/{unique_filename}"
+            # Stored once per distinct content; variants are built in the background
+            try:
+                photo_hash, photo_url = store_photo(photo_file)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
             
-        # Create dish object with additional fields
-        dish = {
-            "name": name,
-            "price": price,
-            "ingredients": ingredients,
-            "photo": photo_url,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
+        dish = new_dish_document(fields, photo_url, photo_hash)
         
         # Store in MongoDB
         try:
+            price_dishes(dishes_collection.database, [dish])
             result = dishes_collection.insert_one(dish)
+            bump_version(dishes_collection.database, "dishes")
+            index_dish(dishes_collection.database, result.inserted_id, dish["ingredients"])
             print(f"Dish stored in MongoDB with ID: {result.inserted_id}")
             
             # Add the MongoDB ID to the response
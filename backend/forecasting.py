@@ -0,0 +1,178 @@
+"""Demand forecasts for every ingredient from the consumption history.
+
+History is loaded as one ingredients x days matrix and each method is a
+handful of array operations over all rows at once, so the cost grows with
+the size of the matrix rather than with a Python loop per ingredient.
+"""
+from flask import request, jsonify
+from datetime import timedelta
+import logging
+import os
+import numpy as np
+import pandas as pd
+import consumption_archive
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Days of history loaded, counted back from the latest consumption record
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "365"))
+
+# Defaults for the forecast parameters
+FORECAST_HORIZON_DAYS = 7
+MOVING_AVERAGE_WINDOW = 7
+SMOOTHING_ALPHA = 0.3
+SEASONAL_WEEKS = 8
+
+FORECAST_METHODS = ("moving_average", "exponential_smoothing", "seasonal")
+
+def _daily_from_mongo(db, history_days, ingredients):
+    """Summing to one value per ingredient and day happens in MongoDB"""
+    latest = db.consumption.find_one({}, {"date": 1}, sort=[("date", -1)])
+    if not latest:
+        return None, None, None
+
+    end = pd.Timestamp(latest["date"]).normalize()
+    start = end - timedelta(days=history_days - 1)
+    match = {"date": {"$gte": start.to_pydatetime(), "$lt": (end + timedelta(days=1)).to_pydatetime()}}
+    if ingredients:
+        match["ingredient"] = {"$in": list(ingredients)}
+
+    rows = list(db.consumption.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "ingredient": "$ingredient",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}}
+            },
+            "consumption": {"$sum": "$consumption"}
+        }}
+    ]))
+    daily = pd.DataFrame({
+        "ingredient": [row["_id"]["ingredient"] for row in rows],
+        "day": pd.to_datetime([row["_id"]["day"] for row in rows]),
+        "consumption": [row["consumption"] for row in rows]
+    })
+    return daily, start, end
+
+def _daily_from_archive(history_days, ingredients):
+    """Column-projected scan of the month partitions in the window"""
+    end = consumption_archive.latest_date()
+    if end is None:
+        return None, None, None
+    end = end.normalize()
+    start = end - timedelta(days=history_days - 1)
+    return consumption_archive.daily_consumption(start, end, ingredients), start, end
+
+def load_consumption_matrix(db, history_days=FORECAST_HISTORY_DAYS, ingredients=None):
+    """Daily consumption as a DataFrame, one row per ingredient, one column per day.
+
+    Read from the Parquet archive once it has been backfilled, from MongoDB
+    otherwise. Days without records are filled with zero.
+    """
+    if consumption_archive.archive_ready():
+        daily, start, end = _daily_from_archive(history_days, ingredients)
+    else:
+        daily, start, end = _daily_from_mongo(db, history_days, ingredients)
+    if daily is None or daily.empty:
+        return pd.DataFrame()
+
+    matrix = daily.pivot_table(index="ingredient", columns="day", values="consumption", aggfunc="sum", fill_value=0.0)
+    return matrix.reindex(columns=pd.date_range(start, end, freq="D"), fill_value=0.0).astype(np.float64)
+
+def moving_average(history, window=MOVING_AVERAGE_WINDOW):
+    """Mean of the last window days of each row"""
+    return history[:, -window:].mean(axis=1)
+
+def exponential_smoothing(history, alpha=SMOOTHING_ALPHA):
+    """Final level of simple exponential smoothing for each row.
+
+    The recursion level = alpha * y + (1 - alpha) * level, started from the
+    first observation, unrolls to a fixed weight per day, so all rows are
+    smoothed by one matrix-vector product.
+    """
+    days = history.shape[1]
+    if days == 0:
+        return np.zeros(history.shape[0])
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return history @ weights
+
+def weekday_factors(history, weekdays, weeks=SEASONAL_WEEKS):
+    """Consumption on each weekday relative to the row mean, shape (rows, 7).
+
+    Only the last weeks weeks are used; rows without consumption get 1.
+    """
+    recent = history[:, -weeks * 7:]
+    # One-hot weekday matrix turns the per-weekday sums into one product
+    onehot = np.eye(7)[weekdays[-recent.shape[1]:]]
+    weekday_means = (recent @ onehot) / np.maximum(onehot.sum(axis=0), 1)
+    overall = recent.mean(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factors = np.where(overall > 0, weekday_means / overall, 1.0)
+    return factors
+
+def forecast_matrix(history, dates, horizon=FORECAST_HORIZON_DAYS, window=MOVING_AVERAGE_WINDOW,
+                    alpha=SMOOTHING_ALPHA, weeks=SEASONAL_WEEKS):
+    """Forecast every row of history for the horizon days after dates[-1].
+
+    Returns the forecast dates and an array of shape (rows, horizon) per
+    method. The seasonal forecast scales the smoothed level by the
+    weekday factor of each future day.
+    """
+    dates = pd.DatetimeIndex(dates)
+    future = pd.date_range(dates[-1] + timedelta(days=1), periods=horizon, freq="D")
+
+    average = moving_average(history, window)
+    level = exponential_smoothing(history, alpha)
+    factors = weekday_factors(history, dates.dayofweek.to_numpy(), weeks)
+
+    return future, {
+        "moving_average": np.repeat(average[:, None], horizon, axis=1),
+        "exponential_smoothing": np.repeat(level[:, None], horizon, axis=1),
+        "seasonal": level[:, None] * factors[:, future.dayofweek.to_numpy()]
+    }
+
+def forecast_demand(db, horizon=FORECAST_HORIZON_DAYS, window=MOVING_AVERAGE_WINDOW, alpha=SMOOTHING_ALPHA,
+                    weeks=SEASONAL_WEEKS, history_days=FORECAST_HISTORY_DAYS, ingredients=None):
+    matrix = load_consumption_matrix(db, history_days, ingredients)
+    if matrix.empty:
+        return {"dates": [], "history_days": 0, "forecasts": []}
+
+    future, forecasts = forecast_matrix(matrix.to_numpy(), matrix.columns, horizon, window, alpha, weeks)
+    rounded = {method: np.round(np.maximum(values, 0), 3).tolist() for method, values in forecasts.items()}
+    return {
+        "dates": [day.date().isoformat() for day in future],
+        "history_days": matrix.shape[1],
+        "forecasts": [
+            {"ingredient": ingredient, **{method: rounded[method][i] for method in FORECAST_METHODS}}
+            for i, ingredient in enumerate(matrix.index)
+        ]
+    }
+
+def forecast_endpoint(db):
+    """GET /forecast?horizon=7&window=7&alpha=0.3&weeks=8&ingredients=Chicken,Milk"""
+    try:
+        horizon = request.args.get("horizon", FORECAST_HORIZON_DAYS, type=int)
+        window = request.args.get("window", MOVING_AVERAGE_WINDOW, type=int)
+        alpha = request.args.get("alpha", SMOOTHING_ALPHA, type=float)
+        weeks = request.args.get("weeks", SEASONAL_WEEKS, type=int)
+        history_days = request.args.get("history_days", FORECAST_HISTORY_DAYS, type=int)
+        ingredients = [name.strip() for name in request.args.get("ingredients", "").split(",") if name.strip()]
+
+        if not (0 < alpha <= 1) or min(horizon, window, weeks, history_days) < 1:
+            return jsonify({
+                "success": False,
+                "message": "horizon, window, weeks and history_days must be positive and alpha in (0, 1]"
+            }), 400
+
+        result = forecast_demand(db, horizon, window, alpha, weeks, history_days, ingredients or None)
+        return jsonify({"success": True, **result})
+    except Exception as e:
+        logger.error(f"Error forecasting demand: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to forecast demand",
+            "error": str(e)
+        }), 500
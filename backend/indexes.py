@@ -0,0 +1,118 @@
+from collections import deque
+import json
+import logging
+import os
+import threading
+from bson import json_util
+from pymongo import ASCENDING, monitoring
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Indexes the read paths rely on, by collection
+INDEXES = {
+    "dishes": [
+        [("created_at", ASCENDING), ("_id", ASCENDING)],
+        [("name", ASCENDING)],
+        [("ingredients.name", ASCENDING)],
+    ],
+    "menus": [
+        [("dishes", ASCENDING)],
+    ],
+    "consumption": [
+        [("date", ASCENDING), ("ingredient", ASCENDING)],
+    ],
+    "consumption_rollups": [
+        [("period", ASCENDING), ("ingredient", ASCENDING), ("start", ASCENDING)],
+    ],
+    "inventory": [
+        [("expiry_date", ASCENDING), ("quantity", ASCENDING)],
+    ],
+    "ingredient_index": [
+        [("menu_ids", ASCENDING)],
+    ],
+}
+
+# Queries slower than this are recorded and logged
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "100"))
+
+QUERY_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+def ensure_indexes(db):
+    """Create any missing index from INDEXES; existing ones are left alone"""
+    for collection, indexes in INDEXES.items():
+        for keys in indexes:
+            name = db[collection].create_index(keys)
+            logger.debug(f"Ensured index {collection}.{name}")
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Record query commands that take longer than threshold_ms"""
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, keep=100):
+        self.threshold_ms = threshold_ms
+        self.slow_queries = deque(maxlen=keep)
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in QUERY_COMMANDS:
+            return
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = {
+                "database": event.database_name,
+                "command": event.command_name,
+                "collection": event.command.get(event.command_name),
+                "filter": event.command.get("filter", event.command.get("query")),
+                "pipeline": event.command.get("pipeline")
+            }
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            query = self._started.pop((event.connection_id, event.request_id), None)
+        if query is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.threshold_ms:
+            query["duration_ms"] = round(duration_ms, 1)
+            self.slow_queries.append(query)
+            logger.warning(f"Slow query on {query['collection']} ({query['duration_ms']} ms): {query['filter'] or query['pipeline']}")
+
+    def recent(self):
+        return list(self.slow_queries)
+
+slow_query_listener = SlowQueryListener()
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    children = list(plan.get("inputStages", []))
+    if "inputStage" in plan:
+        children.append(plan["inputStage"])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+def report_slow_queries(db):
+    """Recent slow find queries, each flagged when its plan scans the collection"""
+    report = []
+    for query in slow_query_listener.recent():
+        entry = dict(query)
+        if query["command"] == "find":
+            try:
+                explain = db.client[query["database"]].command(
+                    "explain", {"find": query["collection"], "filter": query["filter"] or {}},
+                    verbosity="queryPlanner"
+                )
+                stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+                entry["unindexed"] = "COLLSCAN" in stages
+            except Exception as e:
+                entry["explain_error"] = str(e)
+        # Filters may hold ObjectIds and dates; render them as extended JSON
+        report.append(json.loads(json_util.dumps(entry)))
+    return report
@@ -0,0 +1,246 @@
+from flask import request, jsonify
+import logging
+import re
+from bson import ObjectId
+from pymongo import UpdateOne
+from indexes import INDEXES
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Results returned by /dishes/by-ingredients unless limit is given
+DEFAULT_MATCH_LIMIT = 20
+MAX_MATCH_LIMIT = 200
+
+# Scratch collection rebuild_index fills before swapping it in
+REBUILD_COLLECTION = "ingredient_index_rebuild"
+
+# Plurals that the suffix rules below get wrong
+IRREGULAR_PLURALS = {
+    "leaves": "leaf",
+    "loaves": "loaf",
+    "halves": "half",
+    "knives": "knife",
+}
+
+# Words ending in s that are not plurals
+SINGULAR_S_WORDS = {
+    "asparagus", "couscous", "hummus", "molasses", "swiss", "citrus",
+    "hibiscus", "octopus", "bass", "grass", "watercress",
+}
+
+def singularize(word):
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word in SINGULAR_S_WORDS or len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def canonicalize(name):
+    """Canonical catalog key of an ingredient name.
+
+    Case, punctuation and spacing are folded and the last word is made
+    singular, so "Fresh  Tomatoes" and "fresh tomato" share one key.
+    """
+    words = re.sub(r"[^a-z0-9 ]+", " ", str(name).lower()).split()
+    if not words:
+        return ""
+    words[-1] = singularize(words[-1])
+    return " ".join(words)
+
+def ingredient_names(ingredients):
+    """Display names of a dish's ingredients, in either storage format"""
+    names = []
+    for ingredient in ingredients or []:
+        name = ingredient.get("name") if isinstance(ingredient, dict) else ingredient
+        if name:
+            names.append(str(name).strip())
+    return names
+
+def dish_index_ops(dish_id, ingredients):
+    """Upserts adding a dish under each of its canonical ingredients"""
+    ops = {}
+    for name in ingredient_names(ingredients):
+        key = canonicalize(name)
+        if key and key not in ops:
+            ops[key] = UpdateOne(
+                {"_id": key},
+                {"$addToSet": {"dish_ids": dish_id, "names": name}},
+                upsert=True
+            )
+    return list(ops.values())
+
+def index_dishes(db, dishes, collection=None):
+    """Add dishes (documents with _id and ingredients) to the inverted index"""
+    ops = []
+    for dish in dishes:
+        ops.extend(dish_index_ops(dish["_id"], dish.get("ingredients")))
+    if ops:
+        (collection if collection is not None else db.ingredient_index).bulk_write(ops, ordered=False)
+
+def index_dish(db, dish_id, ingredients):
+    index_dishes(db, [{"_id": dish_id, "ingredients": ingredients}])
+
+async def index_dish_async(db, dish_id, ingredients):
+    """index_dish for Motor databases"""
+    ops = dish_index_ops(dish_id, ingredients)
+    if ops:
+        await db.ingredient_index.bulk_write(ops, ordered=False)
+
+def _menu_index_ops(menu_id, dish_ingredients):
+    keys = {canonicalize(name) for ingredients in dish_ingredients for name in ingredient_names(ingredients)}
+    return [UpdateOne({"_id": key}, {"$addToSet": {"menu_ids": menu_id}}) for key in keys if key]
+
+def _add_menu(db, menu_id, dish_ids, collection):
+    object_ids = [ObjectId(dish_id) for dish_id in dish_ids or [] if ObjectId.is_valid(dish_id)]
+    if not object_ids:
+        return
+    dish_ingredients = [dish.get("ingredients") for dish in db.dishes.find({"_id": {"$in": object_ids}}, {"ingredients": 1})]
+    ops = _menu_index_ops(menu_id, dish_ingredients)
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+
+def index_menu(db, menu_id, dish_ids):
+    """Record which ingredients a menu uses; replaces earlier entries of the menu"""
+    menu_id = str(menu_id)
+    unindex_menu(db, menu_id)
+    _add_menu(db, menu_id, dish_ids, db.ingredient_index)
+
+def unindex_menu(db, menu_id):
+    db.ingredient_index.update_many({"menu_ids": str(menu_id)}, {"$pull": {"menu_ids": str(menu_id)}})
+
+async def index_menu_async(db, menu_id, dish_ids):
+    """index_menu for Motor databases"""
+    menu_id = str(menu_id)
+    await unindex_menu_async(db, menu_id)
+    object_ids = [ObjectId(dish_id) for dish_id in dish_ids or [] if ObjectId.is_valid(dish_id)]
+    if not object_ids:
+        return
+    dish_ingredients = [dish.get("ingredients") async for dish in db.dishes.find({"_id": {"$in": object_ids}}, {"ingredients": 1})]
+    ops = _menu_index_ops(menu_id, dish_ingredients)
+    if ops:
+        await db.ingredient_index.bulk_write(ops, ordered=False)
+
+async def unindex_menu_async(db, menu_id):
+    await db.ingredient_index.update_many({"menu_ids": str(menu_id)}, {"$pull": {"menu_ids": str(menu_id)}})
+
+def rebuild_index(db, batch_size=1000):
+    """Rebuild the whole index from the dishes and menus collections.
+
+    The new index is written to a scratch collection and renamed over the
+    live one, so lookups keep using the old index until the swap instead
+    of seeing it empty while the rebuild runs.
+    """
+    target = db[REBUILD_COLLECTION]
+    target.drop()
+    for keys in INDEXES["ingredient_index"]:
+        target.create_index(keys)
+
+    batch = []
+    for dish in db.dishes.find({}, {"ingredients": 1}):
+        batch.append(dish)
+        if len(batch) >= batch_size:
+            index_dishes(db, batch, target)
+            batch = []
+    index_dishes(db, batch, target)
+    for menu in db.menus.find({}, {"dishes": 1}):
+        _add_menu(db, str(menu["_id"]), menu.get("dishes"), target)
+
+    ingredients = target.count_documents({})
+    target.rename("ingredient_index", dropTarget=True)
+    return {"ingredients": ingredients}
+
+def find_dishes_by_ingredients(db, names, match="any", limit=DEFAULT_MATCH_LIMIT):
+    """Dishes using any or all of the given ingredients, best coverage first.
+
+    Dishes are ranked by how many requested ingredients they use, then by the
+    share of their own ingredients that were requested.
+    """
+    keys = list(dict.fromkeys(k for k in (canonicalize(name) for name in names) if k))
+    if not keys:
+        return []
+
+    matched = {}
+    for entry in db.ingredient_index.find({"_id": {"$in": keys}}, {"dish_ids": 1}):
+        for dish_id in entry.get("dish_ids", []):
+            matched.setdefault(dish_id, set()).add(entry["_id"])
+
+    if match == "all":
+        matched = {dish_id: found for dish_id, found in matched.items() if len(found) == len(keys)}
+    if not matched:
+        return []
+
+    dishes = db.dishes.find(
+        {"_id": {"$in": list(matched)}},
+        {"name": 1, "price": 1, "photo": 1, "ingredients": 1}
+    )
+    results = []
+    for dish in dishes:
+        found = matched[dish["_id"]]
+        total = len({canonicalize(n) for n in ingredient_names(dish.get("ingredients"))}) or 1
+        results.append({
+            "_id": str(dish["_id"]),
+            "name": dish.get("name"),
+            "price": dish.get("price"),
+            "photo": dish.get("photo"),
+            "matched_ingredients": sorted(found),
+            "coverage": round(len(found) / len(keys), 4),
+            "dish_coverage": round(len(found) / total, 4)
+        })
+    results.sort(key=lambda r: (r["coverage"], r["dish_coverage"]), reverse=True)
+    return results[:limit]
+
+def find_dishes_endpoint(db):
+    """GET /dishes/by-ingredients?ingredients=Mozzarella,Basil&match=all"""
+    try:
+        names = [name for name in request.args.get("ingredients", "").split(",") if name.strip()]
+        if not names:
+            return jsonify({"success": False, "message": "No ingredients provided"}), 400
+
+        match = request.args.get("match", "any")
+        if match not in ("any", "all"):
+            return jsonify({"success": False, "message": "match must be 'any' or 'all'"}), 400
+
+        limit = request.args.get("limit", DEFAULT_MATCH_LIMIT, type=int)
+        if not 0 < limit <= MAX_MATCH_LIMIT:
+            return jsonify({"success": False, "message": f"limit must be between 1 and {MAX_MATCH_LIMIT}"}), 400
+
+        return jsonify({
+            "success": True,
+            "ingredients": [canonicalize(name) for name in names],
+            "dishes": find_dishes_by_ingredients(db, names, match, limit)
+        })
+    except Exception as e:
+        logger.error(f"Error finding dishes by ingredients: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to find dishes",
+            "error": str(e)
+        }), 500
+
+def ingredient_catalog_endpoint(db):
+    """GET /ingredients: canonical ingredients with their spellings and usage"""
+    try:
+        catalog = [{
+            "name": entry["_id"],
+            "names": entry.get("names", []),
+            "dish_count": len(entry.get("dish_ids", [])),
+            "menu_count": len(entry.get("menu_ids", []))
+        } for entry in db.ingredient_index.find({}, {"names": 1, "dish_ids": 1, "menu_ids": 1}).sort("_id", 1)]
+        return jsonify({"success": True, "ingredients": catalog})
+    except Exception as e:
+        logger.error(f"Error fetching ingredient catalog: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch ingredients",
+            "error": str(e)
+        }), 500
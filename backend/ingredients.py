@@ -1,8 +1,17 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import http.client
+import io
+import ipaddress
 import os
 import logging
 import random
+import socket
+import threading
+from urllib.parse import urljoin, urlsplit
+from ttl_cache import TTLCache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -83,17 +92,66 @@ DUMMY_INGREDIENTS = {
     ]
 }
 
-def get_dummy_ingredients():
+# Worker processes for image analysis, created on first use
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_ANALYSIS_TIMEOUT = float(os.getenv("IMAGE_ANALYSIS_TIMEOUT", "30"))
+
+# Limits for images fetched from image_url
+IMAGE_URL_TIMEOUT = 10
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_IMAGE_REDIRECTS = 3
+
+# Analysis results by perceptual hash
+analysis_cache = TTLCache(maxsize=2048, ttl=int(os.getenv("IMAGE_CACHE_TTL_SECONDS", "86400")))
+
+FALLBACK_INGREDIENTS = [
+    {"name": "Ingredient 1", "quantity": 100, "unit": "g"},
+    {"name": "Ingredient 2", "quantity": 2, "unit": "tbsp"},
+    {"name": "Ingredient 3", "quantity": 1, "unit": "pcs"}
+]
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process pool owned by the current process, recreated after a fork"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+            _pool_pid = os.getpid()
+        return _pool
+
+def perceptual_hash(image_bytes):
+    """64-bit difference hash; re-encoded or resized copies of a photo collide"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (64, 64))
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+def get_dummy_ingredients(seed=None):
+    """Pick a plausible ingredient list; the same seed gives the same list"""
+    rng = random.Random(seed)
+
     # Randomly select a food type
-    food_type = random.choice(list(DUMMY_INGREDIENTS.keys()))
-    ingredients = DUMMY_INGREDIENTS[food_type]
+    food_type = rng.choice(list(DUMMY_INGREDIENTS.keys()))
+    ingredients = [dict(ing) for ing in DUMMY_INGREDIENTS[food_type]]
     
     # Add 2-3 random ingredients from other food types
-    other_food_types = random.sample(list(DUMMY_INGREDIENTS.keys()), 3)
+    other_food_types = rng.sample(list(DUMMY_INGREDIENTS.keys()), 3)
     for food in other_food_types:
         if food != food_type:
-            random_ingredient = random.choice(DUMMY_INGREDIENTS[food])
-            ingredients.append(random_ingredient)
+            random_ingredient = rng.choice(DUMMY_INGREDIENTS[food])
+            ingredients.append(dict(random_ingredient))
     
     # Remove duplicates based on ingredient name
     seen_names = set()
@@ -106,22 +164,140 @@ def get_dummy_ingredients():
     # Sort by ingredient name
     return sorted(unique_ingredients, key=lambda x: x["name"])
 
+def recognize_ingredients(image_bytes, image_hash):
+    """Ingredient recognition, run inside a worker process"""
+    return get_dummy_ingredients(seed=image_hash)
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """Connects to an address checked beforehand instead of resolving again"""
+
+    def __init__(self, host, address, **kwargs):
+        super().__init__(host, **kwargs)
+        self._address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self._address, self.port), self.timeout)
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, host, address, **kwargs):
+        super().__init__(host, **kwargs)
+        self._address = address
+
+    def connect(self):
+        sock = socket.create_connection((self._address, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+def _public_address(host, port):
+    """Resolve host, refusing it unless every address is publicly routable.
+
+    Keeps image_url from reaching loopback, private networks, link-local
+    metadata services and other internal hosts.
+    """
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ValueError(f"Cannot resolve image host {host}")
+
+    addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if getattr(ip, "ipv4_mapped", None):
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError("Image URL must point to a public host")
+    return addresses[0]
+
+def read_image_url(image_url):
+    """Fetch an image over http(s) from a public host.
+
+    Every redirect target is checked the same way, the connection goes to
+    the address that was checked, and the body is capped at MAX_IMAGE_BYTES.
+    """
+    for _ in range(MAX_IMAGE_REDIRECTS + 1):
+        parts = urlsplit(image_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("Only http and https image URLs are allowed")
+
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        address = _public_address(parts.hostname, port)
+        connection_class = _PinnedHTTPSConnection if parts.scheme == "https" else _PinnedHTTPConnection
+        connection = connection_class(parts.hostname, address, port=port, timeout=IMAGE_URL_TIMEOUT)
+        try:
+            path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            connection.request("GET", path)
+            response = connection.getresponse()
+
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader("Location")
+                if not location:
+                    raise ValueError("Image URL redirect has no location")
+                image_url = urljoin(image_url, location)
+                continue
+            if response.status != 200:
+                raise ValueError(f"Image URL returned HTTP {response.status}")
+
+            length = response.getheader("Content-Length")
+            if length and length.isdigit() and int(length) > MAX_IMAGE_BYTES:
+                raise ValueError("Image is too large")
+            image_bytes = response.read(MAX_IMAGE_BYTES + 1)
+        finally:
+            connection.close()
+
+        if len(image_bytes) > MAX_IMAGE_BYTES:
+            raise ValueError("Image is too large")
+        return image_bytes
+
+    raise ValueError("Too many redirects for image URL")
+
+def analyze_images(images):
+    """Analyse many images in parallel on the process pool.
+
+    Hashes are computed first; only images whose hash is not cached are sent
+    for recognition. Returns a list of ingredient lists, or exceptions, in
+    input order.
+    """
+    pool = get_pool()
+    hash_futures = [pool.submit(perceptual_hash, image_bytes) for image_bytes in images]
+
+    results = [None] * len(images)
+    pending = {}
+    for i, future in enumerate(hash_futures):
+        try:
+            image_hash = future.result(timeout=IMAGE_ANALYSIS_TIMEOUT)
+        except Exception as e:
+            results[i] = e
+            continue
+        cached = analysis_cache.get(image_hash)
+        if cached is not None:
+            results[i] = copy.deepcopy(cached)
+        else:
+            pending[i] = (image_hash, pool.submit(recognize_ingredients, images[i], image_hash))
+
+    for i, (image_hash, future) in pending.items():
+        try:
+            ingredients = future.result(timeout=IMAGE_ANALYSIS_TIMEOUT)
+        except Exception as e:
+            results[i] = e
+            continue
+        analysis_cache.set(image_hash, ingredients)
+        results[i] = copy.deepcopy(ingredients)
+    return results
+
 def analyze_image(image_data):
     try:
-        # Simulate processing time
-        import time
-        time.sleep(1)
-        
-        # Return dummy ingredients with quantities and units
-        return get_dummy_ingredients()
+        if isinstance(image_data, str):
+            image_data = read_image_url(image_data)
+        elif hasattr(image_data, "read"):
+            image_data = image_data.read()
+
+        result = analyze_images([image_data])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
 
     except Exception as e:
         logger.error(f"Error analyzing image: {e}")
-        return [
-            {"name": "Ingredient 1", "quantity": 100, "unit": "g"},
-            {"name": "Ingredient 2", "quantity": 2, "unit": "tbsp"},
-            {"name": "Ingredient 3", "quantity": 1, "unit": "pcs"}
-        ]
+        return copy.deepcopy(FALLBACK_INGREDIENTS)
 
 def analyze_image_endpoint():
     try:
@@ -129,8 +305,11 @@ def analyze_image_endpoint():
             image_file = request.files['image_file']
             ingredients = analyze_image(image_file)
         elif 'image_url' in request.form:
-            image_url = request.form['image_url']
-            ingredients = analyze_image(image_url)
+            try:
+                image_bytes = read_image_url(request.form['image_url'])
+            except (ValueError, OSError, http.client.HTTPException) as e:
+                return jsonify({"error": f"Could not fetch image: {e}"}), 400
+            ingredients = analyze_image(image_bytes)
         else:
             return jsonify({"error": "No image provided"}), 400
 
@@ -140,9 +319,31 @@ def analyze_image_endpoint():
         logger.error(f"Error in analyze-image endpoint: {e}")
         return jsonify({
             "error": "Failed to analyze image",
-            "ingredients": [
-                {"name": "Ingredient 1", "quantity": 100, "unit": "g"},
-                {"name": "Ingredient 2", "quantity": 2, "unit": "tbsp"},
-                {"name": "Ingredient 3", "quantity": 1, "unit": "pcs"}
-            ]
-        }), 500
\ No newline at end of file
+            "ingredients": copy.deepcopy(FALLBACK_INGREDIENTS)
+        }), 500
+
+def analyze_images_endpoint():
+    """Analyse every file posted as image_files in parallel"""
+    try:
+        image_files = request.files.getlist('image_files')
+        if not image_files:
+            return jsonify({"error": "No images provided"}), 400
+
+        results = analyze_images([image_file.read() for image_file in image_files])
+
+        response = []
+        for image_file, result in zip(image_files, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error analyzing {image_file.filename}: {result}")
+                response.append({"filename": image_file.filename, "error": str(result), "ingredients": []})
+            else:
+                response.append({"filename": image_file.filename, "ingredients": result})
+
+        return jsonify({"results": response})
+
+    except Exception as e:
+        logger.error(f"Error in analyze-images endpoint: {e}")
+        return jsonify({"error": "Failed to analyze images"}), 500
+
+def image_analysis_stats():
+    return analysis_cache.stats()
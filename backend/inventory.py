@@ -0,0 +1,370 @@
+from flask import request, jsonify
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+import time
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from costing import UNITS, normalize_unit, to_base
+from ingredient_index import canonicalize
+from versioning import bump_version
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Items expiring from today up to this many days ahead count as surplus;
+# expired stock is waste, not surplus
+SURPLUS_WINDOW_DAYS = int(os.getenv("SURPLUS_WINDOW_DAYS", "7"))
+
+# Stock up to this quantity is kept in reserve and is never surplus
+SURPLUS_PAR_LEVEL = float(os.getenv("SURPLUS_PAR_LEVEL", "0"))
+
+# Seconds before the in-process expiry queue reloads, picking up writes
+# made by other worker processes
+INVENTORY_REFRESH_SECONDS = int(os.getenv("INVENTORY_REFRESH_SECONDS", "30"))
+
+# Sorts after every real date, for stock that does not expire
+NO_EXPIRY = datetime.max
+
+def parse_expiry(value):
+    """Expiry date from an ISO string; None when missing"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value)[:10])
+
+def serialize_item(item):
+    return {
+        "name": item.get("name", item["_id"]),
+        "key": item["_id"],
+        "quantity": item.get("quantity", 0),
+        "unit": item.get("unit", "pcs"),
+        "par_level": item.get("par_level", 0),
+        "expiry_date": item["expiry_date"].date().isoformat() if item.get("expiry_date") else None,
+        "updated_at": item["updated_at"].isoformat() if item.get("updated_at") else None
+    }
+
+def surplus_item(item, par_level):
+    """The share of an item above both par levels, as generation expects it"""
+    reserve = max(par_level, item.get("par_level", 0))
+    return {
+        "name": item.get("name", item["_id"]),
+        "quantity": item.get("quantity", 0) - reserve,
+        "unit": item.get("unit", "pcs"),
+        "expiry_date": item["expiry_date"].date().isoformat()
+    }
+
+def surplus_window(within_days, now=None):
+    """First and last expiry dates that count as surplus"""
+    now = now or datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today, now + timedelta(days=within_days)
+
+class ExpiryQueue:
+    """Inventory items of this process, kept ordered by expiry date.
+
+    Writes made through this module update it in place; anything else is
+    picked up by a reload every INVENTORY_REFRESH_SECONDS. A surplus lookup
+    walks the front of the order and stops at the first item past the
+    window, without touching MongoDB.
+    """
+
+    def __init__(self, refresh_seconds=INVENTORY_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._items = {}
+        self._order = []
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry(item):
+        return (item.get("expiry_date") or NO_EXPIRY, item["_id"])
+
+    def load(self, items):
+        with self._lock:
+            self._items = {item["_id"]: item for item in items}
+            self._order = sorted(self._entry(item) for item in self._items.values())
+            self._loaded_at = time.monotonic()
+
+    def is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def _discard(self, key):
+        old = self._items.pop(key, None)
+        if old is not None:
+            i = bisect_left(self._order, self._entry(old))
+            if i < len(self._order) and self._order[i][1] == key:
+                del self._order[i]
+
+    def put(self, item):
+        with self._lock:
+            self._discard(item["_id"])
+            self._items[item["_id"]] = item
+            insort(self._order, self._entry(item))
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def surplus(self, within_days=SURPLUS_WINDOW_DAYS, par_level=SURPLUS_PAR_LEVEL, now=None):
+        today, cutoff = surplus_window(within_days, now)
+        surplus = []
+        with self._lock:
+            # Skip past everything that expired before today
+            for expiry_date, key in self._order[bisect_left(self._order, (today,)):]:
+                if expiry_date > cutoff:
+                    break
+                item = self._items[key]
+                if item.get("quantity", 0) > max(par_level, item.get("par_level", 0)):
+                    surplus.append(surplus_item(item, par_level))
+        return surplus
+
+expiry_queue = ExpiryQueue()
+
+def get_expiry_queue(db):
+    if expiry_queue.is_stale():
+        expiry_queue.load(db.inventory.find())
+    return expiry_queue
+
+def get_surplus_ingredients(db, within_days=SURPLUS_WINDOW_DAYS, par_level=SURPLUS_PAR_LEVEL):
+    """Surplus stock soonest to expire first, served from the in-process queue"""
+    return get_expiry_queue(db).surplus(within_days, par_level)
+
+def find_surplus(db, within_days=SURPLUS_WINDOW_DAYS, par_level=SURPLUS_PAR_LEVEL, now=None):
+    """Surplus straight from MongoDB, a range scan on the (expiry_date, quantity) index"""
+    today, cutoff = surplus_window(within_days, now)
+    items = db.inventory.find(
+        {"expiry_date": {"$gte": today, "$lte": cutoff}, "quantity": {"$gt": par_level}}
+    ).sort("expiry_date", 1)
+    return [surplus_item(item, par_level) for item in items if item["quantity"] > item.get("par_level", 0)]
+
+def set_item(db, name, quantity, unit=None, expiry_date=None, par_level=None):
+    """Create or overwrite a stock item, e.g. after a stock count"""
+    key = canonicalize(name)
+    if not key:
+        raise ValueError("Ingredient name is required")
+
+    fields = {"name": name.strip(), "quantity": float(quantity), "updated_at": datetime.utcnow()}
+    if unit is not None:
+        fields["unit"] = unit
+    if expiry_date is not None:
+        fields["expiry_date"] = parse_expiry(expiry_date)
+    if par_level is not None:
+        fields["par_level"] = float(par_level)
+
+    item = db.inventory.find_one_and_update(
+        {"_id": key},
+        {"$set": fields},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    bump_version(db, "inventory")
+    expiry_queue.put(item)
+    return item
+
+def convert_quantity(quantity, unit, to_unit):
+    """quantity in unit expressed in to_unit; ValueError when the units do not convert"""
+    if unit is None or str(unit).strip().lower() == str(to_unit).strip().lower():
+        return quantity
+    target = normalize_unit(to_unit)
+    converted = None
+    if target is not None:
+        dimension, size = UNITS[target]
+        converted = to_base(quantity, unit, dimension)
+    if converted is None:
+        raise ValueError(f"Cannot convert {unit} to the stored unit {to_unit}")
+    return converted / size
+
+def movement_update(name, delta, unit=None, expiry_date=None):
+    """Pipeline update adding delta to an item, inserting it when missing.
+
+    Stock on hand keeps its earliest expiry date: a delivery only sets the
+    expiry when nothing was left, so an old batch cannot look fresh.
+    """
+    fields = {
+        "name": {"$ifNull": ["$name", {"$literal": name.strip()}]},
+        "quantity": {"$add": [{"$ifNull": ["$quantity", 0]}, delta]},
+        "updated_at": datetime.utcnow()
+    }
+    if unit is not None:
+        fields["unit"] = {"$ifNull": ["$unit", {"$literal": unit}]}
+    if expiry_date is not None:
+        fields["expiry_date"] = {"$cond": [
+            {"$gt": [{"$ifNull": ["$quantity", 0]}, 0]},
+            {"$min": ["$expiry_date", expiry_date]},
+            expiry_date
+        ]}
+    return [{"$set": fields}]
+
+def apply_movement(db, name, delta, unit=None, expiry_date=None, attempts=3):
+    """Add (delta > 0) or take (delta < 0) stock atomically.
+
+    delta is converted from unit into the unit the item is stored in; units
+    of another dimension raise ValueError. Taking stock never drives the
+    quantity below zero; when there is not enough on hand nothing is
+    changed and None is returned.
+    """
+    key = canonicalize(name)
+    if not key:
+        raise ValueError("Ingredient name is required")
+    delta = float(delta)
+    expiry_date = parse_expiry(expiry_date)
+
+    for _ in range(attempts):
+        stored = db.inventory.find_one({"_id": key}, {"unit": 1})
+        query = {"_id": key}
+        amount = delta
+        if stored is not None:
+            stored_unit = stored.get("unit")
+            amount = convert_quantity(delta, unit, stored_unit or "pcs")
+            # Applies only if the unit was not changed in the meantime
+            query["unit"] = stored_unit
+        if amount < 0:
+            query["quantity"] = {"$gte": -amount}
+
+        try:
+            item = db.inventory.find_one_and_update(
+                query,
+                movement_update(name, amount, unit, expiry_date),
+                upsert=stored is None and amount >= 0,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Created by another request since the read
+            continue
+        if item is not None:
+            bump_version(db, "inventory")
+            expiry_queue.put(item)
+            return item
+        current = db.inventory.find_one({"_id": key}, {"unit": 1})
+        if current is None or stored is None or current.get("unit") == stored.get("unit"):
+            return None
+    raise ValueError(f"{name} changed concurrently; try again")
+
+def remove_item(db, name):
+    key = canonicalize(name)
+    result = db.inventory.delete_one({"_id": key})
+    if result.deleted_count:
+        bump_version(db, "inventory")
+        expiry_queue.remove(key)
+    return result.deleted_count > 0
+
+def get_inventory_endpoint(db):
+    try:
+        items = db.inventory.find().sort([("expiry_date", 1), ("_id", 1)])
+        return jsonify({
+            "success": True,
+            "inventory": [serialize_item(item) for item in items]
+        })
+    except Exception as e:
+        logger.error(f"Error fetching inventory: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch inventory",
+            "error": str(e)
+        }), 500
+
+def set_item_endpoint(db):
+    try:
+        data = request.get_json(silent=True) or {}
+        if not data.get("name") or data.get("quantity") is None:
+            return jsonify({"success": False, "message": "name and quantity are required"}), 400
+
+        item = set_item(
+            db,
+            data["name"],
+            data["quantity"],
+            unit=data.get("unit"),
+            expiry_date=data.get("expiry_date"),
+            par_level=data.get("par_level")
+        )
+        return jsonify({"success": True, "item": serialize_item(item)})
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error saving inventory item: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to save inventory item",
+            "error": str(e)
+        }), 500
+
+def movements_endpoint(db):
+    """Apply one movement or a list of them: {"name", "delta", "unit", "expiry_date"}"""
+    try:
+        data = request.get_json(silent=True)
+        movements = data if isinstance(data, list) else [data] if data else []
+        if not movements:
+            return jsonify({"success": False, "message": "No movements provided"}), 400
+
+        results = []
+        invalid = False
+        for movement in movements:
+            if not isinstance(movement, dict):
+                results.append({"name": None, "success": False, "message": "Movement is not an object"})
+                continue
+            if not movement.get("name") or movement.get("delta") is None:
+                results.append({"name": movement.get("name"), "success": False, "message": "name and delta are required"})
+                continue
+            try:
+                item = apply_movement(
+                    db,
+                    movement["name"],
+                    movement["delta"],
+                    unit=movement.get("unit"),
+                    expiry_date=movement.get("expiry_date")
+                )
+            except (TypeError, ValueError) as e:
+                invalid = True
+                results.append({"name": movement["name"], "success": False, "message": str(e)})
+                continue
+            if item is None:
+                results.append({"name": movement["name"], "success": False, "message": "Insufficient stock"})
+            else:
+                results.append({"name": movement["name"], "success": True, "item": serialize_item(item)})
+
+        return jsonify({
+            "success": all(result["success"] for result in results),
+            "movements": results
+        }), 400 if invalid else 200
+    except Exception as e:
+        logger.error(f"Error applying stock movements: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to apply stock movements",
+            "error": str(e)
+        }), 500
+
+def delete_item_endpoint(db, name):
+    try:
+        if not remove_item(db, name):
+            return jsonify({"success": False, "message": "Item not found"}), 404
+        return jsonify({"success": True, "message": "Item deleted successfully"})
+    except Exception as e:
+        logger.error(f"Error deleting inventory item: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to delete inventory item",
+            "error": str(e)
+        }), 500
+
+def surplus_endpoint(db):
+    """GET /inventory/surplus?days=7&par_level=0"""
+    try:
+        days = request.args.get("days", SURPLUS_WINDOW_DAYS, type=int)
+        par_level = request.args.get("par_level", SURPLUS_PAR_LEVEL, type=float)
+        return jsonify({
+            "success": True,
+            "surplus": find_surplus(db, days, par_level)
+        })
+    except Exception as e:
+        logger.error(f"Error fetching surplus: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch surplus",
+            "error": str(e)
+        }), 500
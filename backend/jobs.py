@@ -0,0 +1,95 @@
+from flask import jsonify
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import os
+import uuid
+from db_config import db
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Worker threads running background jobs; LLM calls are I/O bound
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+
+# How long finished jobs are kept before MongoDB expires them
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+_indexes_ready = False
+
+def ensure_job_indexes():
+    """Create the TTL index that removes expired jobs"""
+    global _indexes_ready
+    if not _indexes_ready:
+        db.jobs.create_index("expires_at", expireAfterSeconds=0)
+        _indexes_ready = True
+
+def _expires_at():
+    return datetime.utcnow() + timedelta(seconds=JOB_TTL_SECONDS)
+
+def _run_job(job_id, func, args, kwargs):
+    db.jobs.update_one(
+        {"_id": job_id},
+        {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+    )
+    try:
+        result = func(*args, **kwargs)
+        update = {"status": "done", "result": result}
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        update = {"status": "failed", "error": str(e)}
+
+    update["finished_at"] = datetime.utcnow()
+    update["expires_at"] = _expires_at()
+    db.jobs.update_one({"_id": job_id}, {"$set": update})
+
+def submit_job(kind, func, *args, **kwargs):
+    """Queue func(*args, **kwargs) on the worker pool and return the job ID"""
+    ensure_job_indexes()
+    job_id = uuid.uuid4().hex
+    db.jobs.insert_one({
+        "_id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "created_at": datetime.utcnow(),
+        "expires_at": _expires_at()
+    })
+    executor.submit(_run_job, job_id, func, args, kwargs)
+    logger.debug(f"Queued {kind} job {job_id}")
+    return job_id
+
+def get_job(job_id):
+    """Fetch a job with its timestamps formatted, or None"""
+    job = db.jobs.find_one({"_id": job_id})
+    if not job:
+        return None
+
+    job["job_id"] = job.pop("_id")
+    for field in ("created_at", "started_at", "finished_at", "expires_at"):
+        if field in job:
+            job[field] = job[field].isoformat()
+    return job
+
+def job_status_endpoint(job_id):
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({
+                "success": False,
+                "message": "Job not found"
+            }), 404
+
+        return jsonify({
+            "success": True,
+            "job": job
+        })
+    except Exception as e:
+        logger.error(f"Error fetching job: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Failed to fetch job",
+            "error": str(e)
+        }), 500
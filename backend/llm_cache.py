@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from ttl_cache import TTLCache
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# On-disk tier location; an empty value keeps the cache in memory only
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+def prompt_key(model_name, prompt):
+    """Content address of a prompt: model name plus whitespace-normalized text"""
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """Two-tier cache of raw model responses.
+
+    Lookups try an in-memory LRU first and fall back to a SQLite table,
+    promoting disk hits into memory. Both tiers honour the same TTL; the disk
+    tier is trimmed to max_entries by least recent access.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, memory_size=LLM_CACHE_MEMORY_SIZE,
+                 ttl=LLM_CACHE_TTL_SECONDS, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _open(self):
+        try:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, "
+                "created_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            conn.commit()
+            return conn
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache disk tier disabled: {str(e)}")
+            self.path = None
+            return None
+
+    def _connection(self):
+        """SQLite connection of the current process, opened on first use.
+
+        Importing the module opens nothing, and a process that finds a
+        connection opened by another PID (a pre-fork server worker) opens
+        its own, as SQLite connections must not cross fork().
+        """
+        if not self.path:
+            return None
+        if self._conn is None or self._pid != os.getpid():
+            with self._lock:
+                if self.path and (self._conn is None or self._pid != os.getpid()):
+                    self._conn = self._open()
+                    self._pid = os.getpid()
+        return self._conn
+
+    def get(self, model_name, prompt):
+        key = prompt_key(model_name, prompt)
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+
+        conn = self._connection()
+        if conn is not None:
+            now = time.time()
+            with self._lock:
+                row = conn.execute(
+                    "SELECT response FROM llm_cache WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    conn.commit()
+            if row:
+                self.disk_hits += 1
+                self.memory.set(key, row[0])
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def set(self, model_name, prompt, response):
+        key = prompt_key(model_name, prompt)
+        self.memory.set(key, response)
+        conn = self._connection()
+        if conn is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, response, now, now)
+            )
+            # Drop expired rows, then the least recently used beyond the size limit
+            conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+
+    def record_bypass(self):
+        self.bypasses += 1
+
+    def stats(self):
+        disk_entries = None
+        conn = self._connection()
+        if conn is not None:
+            with self._lock:
+                disk_entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        hits = self.memory.hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk_entries": disk_entries
+        }
+
+llm_cache = LLMCache()
@@ -0,0 +1,199 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Client-side quota, kept just under the project's Gemini limits
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+
+# Output tokens reserved per call on top of the prompt estimate
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+
+# Retries of quota and transient server errors
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+
+# Lower value is served first
+LANES = {"interactive": 0, "batch": 1}
+
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+def estimate_tokens(prompt):
+    """Rough token cost of a call: ~4 characters per prompt token plus output"""
+    return len(prompt) // 4 + LLM_EXPECTED_OUTPUT_TOKENS
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to one minute of capacity"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        """Seconds until amount tokens are available"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+class RateLimiter:
+    """Admits model calls in lane priority order against request and token budgets.
+
+    Waiting callers form a single priority queue, so an interactive call
+    queued behind batch work is admitted as soon as budget frees up.
+    """
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE, tokens_per_minute=LLM_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._queue = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._lane_stats = {
+            lane: {"queued": 0, "admitted": 0, "timed_out": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for lane in LANES
+        }
+
+    def acquire(self, lane="interactive", tokens=0, deadline=None):
+        """Block until the call may proceed; returns the seconds spent waiting.
+
+        With a deadline (a time.monotonic() value) the caller leaves the
+        queue without spending any budget once it passes, and TimeoutError
+        is raised.
+        """
+        ticket = (LANES[lane], next(self._counter))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self._lane_stats[lane]["queued"] += 1
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._lane_stats[lane]["queued"] -= 1
+                    self._lane_stats[lane]["timed_out"] += 1
+                    # The next ticket may now be at the front
+                    self._cond.notify_all()
+                    raise TimeoutError("Deadline passed while waiting for the rate limiter")
+                if self._queue[0] == ticket:
+                    delay = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+                    if delay == 0:
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        heapq.heappop(self._queue)
+                        break
+                    self._cond.wait(delay if remaining is None else min(delay, remaining))
+                else:
+                    self._cond.wait(remaining)
+            waited = time.monotonic() - start
+            stats = self._lane_stats[lane]
+            stats["queued"] -= 1
+            stats["admitted"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+            self._cond.notify_all()
+        return waited
+
+    def stats(self):
+        with self._cond:
+            lanes = {}
+            for lane, stats in self._lane_stats.items():
+                lanes[lane] = {
+                    "queue_depth": stats["queued"],
+                    "admitted": stats["admitted"],
+                    "timed_out": stats["timed_out"],
+                    "avg_wait_seconds": round(stats["total_wait"] / stats["admitted"], 3) if stats["admitted"] else 0.0,
+                    "max_wait_seconds": round(stats["max_wait"], 3)
+                }
+            return {
+                "queue_depth": len(self._queue),
+                "requests_available": round(self.requests.tokens, 1),
+                "tokens_available": round(self.tokens.tokens),
+                "lanes": lanes
+            }
+
+class LLMClient:
+    """Gemini model wrapper that rate limits and retries every call"""
+
+    def __init__(self, model_name, limiter):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name=model_name)
+        self.limiter = limiter
+        self.retries = 0
+        self.failures = 0
+
+    def generate(self, prompt, lane="interactive", deadline=None, **kwargs):
+        """Call generate_content, backing off exponentially with jitter on retryable errors.
+
+        With a deadline (a time.monotonic() value) no attempt is started and
+        no backoff is slept past it; TimeoutError is raised instead.
+        """
+        attempt = 0
+        while True:
+            try:
+                self.limiter.acquire(lane, estimate_tokens(prompt), deadline)
+            except TimeoutError:
+                self.failures += 1
+                raise
+            try:
+                return self.model.generate_content(prompt, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= LLM_MAX_RETRIES:
+                    self.failures += 1
+                    raise
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self.failures += 1
+                    raise
+                logger.warning(f"{self.model_name} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                self.retries += 1
+                attempt += 1
+                time.sleep(delay)
+
+    def stats(self):
+        return {"retries": self.retries, "failures": self.failures}
+
+limiter = RateLimiter()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(model_name):
+    """Shared client per model, all drawing on the same rate limiter"""
+    with _clients_lock:
+        if model_name not in _clients:
+            _clients[model_name] = LLMClient(model_name, limiter)
+        return _clients[model_name]
+
+def llm_stats():
+    return {
+        "rate_limiter": limiter.stats(),
+        "clients": {name: client.stats() for name, client in _clients.items()}
+    }
@@ -2,11 +2,84 @@ from flask import request, jsonify
 from datetime import datetime
 import logging
 from bson import ObjectId
+from photos import photo_variants
+from versioning import bump_version, current_versions
+from ingredient_index import index_menu, unindex_menu
+from read_cache import get_cached_dishes, cache_dishes, get_cached_menu, cache_menu, invalidate_menu
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Dish fields embedded in hydrated menus
+MENU_DISH_PROJECTION = {"name": 1, "photo": 1, "price": 1, "ingredients": 1}
+
+def _to_object_ids(dish_ids):
+    """Convert dish ID strings to ObjectIds, skipping malformed ones"""
+    object_ids = []
+    for dish_id in dish_ids:
+        if isinstance(dish_id, ObjectId):
+            object_ids.append(dish_id)
+        elif ObjectId.is_valid(dish_id):
+            object_ids.append(ObjectId(dish_id))
+    return object_ids
+
+def collect_dish_ids(menus):
+    dish_ids = set()
+    for menu in menus:
+        dish_ids.update(_to_object_ids(menu.get("dishes") or []))
+    return dish_ids
+
+def menu_dish(dish):
+    """Dish details as embedded in a menu"""
+    return {
+        "_id": str(dish["_id"]),
+        "name": dish.get("name"),
+        "photo": dish.get("photo"),
+        "photo_variants": photo_variants(dish.get("photo")),
+        "price": dish.get("price"),
+        "ingredients": dish.get("ingredients", [])
+    }
+
+def fill_menu_dishes(menus, dishes_by_id):
+    """Swap dish IDs for details, keeping each menu's dish order"""
+    for menu in menus:
+        if "dishes" not in menu:
+            continue
+        menu["dishes"] = [
+            dishes_by_id[dish_id]
+            for dish_id in _to_object_ids(menu["dishes"] or [])
+            if dish_id in dishes_by_id
+        ]
+    return menus
+
+def serialize_menu(menu):
+    # Convert ObjectId to string and format timestamps
+    menu["_id"] = str(menu["_id"])
+    menu["created_at"] = menu["created_at"].isoformat() if "created_at" in menu else None
+    menu["updated_at"] = menu["updated_at"].isoformat() if "updated_at" in menu else None
+    return menu
+
+def hydrate_menus(db, menus, dishes_version=None):
+    """Replace the dish IDs of each menu with dish details.
+
+    All dish IDs referenced by the given menus are fetched with one projected
+    query, then put back into each menu in its original dish order. Dishes
+    that no longer exist are dropped. Dishes in the read cache at the current
+    dishes version are not fetched again.
+    """
+    if dishes_version is None:
+        dishes_version = current_versions(db, ["dishes"])[0]
+    dishes_by_id, missing = get_cached_dishes(collect_dish_ids(menus), dishes_version)
+    if missing:
+        fetched = {}
+        for dish in db.dishes.find({"_id": {"$in": missing}}, MENU_DISH_PROJECTION):
+            fetched[dish["_id"]] = menu_dish(dish)
+        cache_dishes(fetched, dishes_version)
+        dishes_by_id.update(fetched)
+
+    return fill_menu_dishes(menus, dishes_by_id)
+
 def create_menu(db):
     try:
         data = request.get_json()
@@ -19,6 +92,8 @@ def create_menu(db):
         }
         
         result = db.menus.insert_one(menu)
+        bump_version(db, "menus")
+        index_menu(db, result.inserted_id, menu["dishes"])
         menu["_id"] = str(result.inserted_id)
         
         return jsonify({
@@ -40,21 +115,10 @@ def get_all_menus(db):
         
         # Convert ObjectId to string and format timestamps
         for menu in menus:
-            menu["_id"] = str(menu["_id"])
-            menu["created_at"] = menu["created_at"].isoformat() if "created_at" in menu else None
-            menu["updated_at"] = menu["updated_at"].isoformat() if "updated_at" in menu else None
-            
-            # Fetch dish details for each menu
-            if "dishes" in menu:
-                dish_ids = menu["dishes"]
-                dishes = list(db.dishes.find({"_id": {"$in": [ObjectId(id) for id in dish_ids]}}))
-                menu["dishes"] = [{
-                    "_id": str(dish["_id"]),
-                    "name": dish["name"],
-                    "photo": dish["photo"],
-                    "price": dish["price"],
-                    "ingredients": dish["ingredients"]
-                } for dish in dishes]
+            serialize_menu(menu)
+        
+        # Fetch dish details for all menus in a single query
+        hydrate_menus(db, menus)
         
         return jsonify({
             "success": True,
@@ -70,6 +134,14 @@ def get_all_menus(db):
 
 def get_menu(db, menu_id):
     try:
+        versions = current_versions(db, ["menus", "dishes"])
+        menu = get_cached_menu(menu_id, versions)
+        if menu:
+            return jsonify({
+                "success": True,
+                "menu": menu
+            })
+
         menu = db.menus.find_one({"_id": ObjectId(menu_id)})
         if not menu:
             return jsonify({
@@ -77,21 +149,11 @@ def get_menu(db, menu_id):
                 "message": "Menu not found"
             }), 404
             
-        menu["_id"] = str(menu["_id"])
-        menu["created_at"] = menu["created_at"].isoformat() if "created_at" in menu else None
-        menu["updated_at"] = menu["updated_at"].isoformat() if "updated_at" in menu else None
+        serialize_menu(menu)
         
         # Fetch dish details
-        if "dishes" in menu:
-            dish_ids = menu["dishes"]
-            dishes = list(db.dishes.find({"_id": {"$in": [ObjectId(id) for id in dish_ids]}}))
-            menu["dishes"] = [{
-                "_id": str(dish["_id"]),
-                "name": dish["name"],
-                "photo": dish["photo"],
-                "price": dish["price"],
-                "ingredients": dish["ingredients"]
-            } for dish in dishes]
+        hydrate_menus(db, [menu], versions[1])
+        cache_menu(menu, versions)
         
         return jsonify({
             "success": True,
@@ -119,12 +181,17 @@ def update_menu(db, menu_id):
             {"_id": ObjectId(menu_id)},
             {"$set": update_data}
         )
+        bump_version(db, "menus")
+        invalidate_menu(menu_id)
         
         if result.modified_count == 0:
             return jsonify({
                 "success": False,
                 "message": "Menu not found"
             }), 404
+
+        # The update replaces the dish list, so re-derive its ingredients
+        index_menu(db, menu_id, update_data["dishes"])
             
         return jsonify({
             "success": True,
@@ -141,6 +208,9 @@ def update_menu(db, menu_id):
 def delete_menu(db, menu_id):
     try:
         result = db.menus.delete_one({"_id": ObjectId(menu_id)})
+        bump_version(db, "menus")
+        invalidate_menu(menu_id)
+        unindex_menu(db, menu_id)
         
         if result.deleted_count == 0:
             return jsonify({
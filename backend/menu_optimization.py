@@ -1,7 +1,17 @@
 import google.generativeai as genai
 import os
 import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from dotenv import load_dotenv
+from llm_cache import llm_cache, prompt_key
+from singleflight import llm_flight
+from llm_client import get_client
+from db_config import db
+import inventory
+from menu import collect_dish_ids
+from ingredient_index import ingredient_names
 
 # Load environment variables
 load_dotenv()
@@ -10,111 +20,222 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 
+MODEL_NAME = "gemini-2.0-flash"
+
+# Menu optimization yields to interactive generation under load
+LLM_LANE = "batch"
+
 # Initialize the correct model
 try:
-    model = genai.GenerativeModel(model_name="gemini-2.0-flash")  # Ensure this model exists
+    llm = get_client(MODEL_NAME)  # Ensure this model exists
+    model = llm.model
 except Exception as e:
     print(f"Error initializing model: {e}")
     exit()
 
+# Seconds each section prompt of optimize_menu may take
+SECTION_TIMEOUT_SECONDS = float(os.getenv("OPTIMIZE_SECTION_TIMEOUT", "30"))
+
+# Ask for all sections in one combined prompt by default
+OPTIMIZE_BATCHED = os.getenv("OPTIMIZE_BATCHED", "false").lower() in ("1", "true", "yes")
+
+# Dishes of the current menu sent with the prompts
+CURRENT_MENU_DISHES = int(os.getenv("OPTIMIZE_MENU_DISHES", "50"))
+
 def get_surplus_ingredients():
-    return [
-        {"name": "Chicken Breast", "quantity": 15, "expiry_date": "2024-03-25"},
-        {"name": "Fresh Basil", "quantity": 8, "expiry_date": "2024-03-24"},
-        {"name": "Mozzarella", "quantity": 12, "expiry_date": "2024-03-26"},
-    ]
-
-def get_current_menu():
-    return [
-        {
-            "name": "Margherita Pizza",
-            "ingredients": ["Dough", "Tomato Sauce", "Mozzarella", "Fresh Basil"],
-            "cost": 8.50,
-            "profit_margin": 30,
-        },
-        {
-            "name": "Chicken Alfredo",
-            "ingredients": ["Pasta", "Chicken Breast", "Cream", "Parmesan"],
-            "cost": 12.75,
-            "profit_margin": 25,
-        },
-    ]
-
-def generate_ai_response(prompt):
-    try:
-        response = model.generate_content(prompt)  # Correct API call
-        content = response.text.strip()
+    return inventory.get_surplus_ingredients(db)
+
+def get_current_menu(limit=CURRENT_MENU_DISHES):
+    """Dishes on the menus with their stored costs; all dishes when no menu exists"""
+    dish_ids = collect_dish_ids(db.menus.find({}, {"dishes": 1}))
+    query = {"_id": {"$in": list(dish_ids)}} if dish_ids else {}
+    dishes = db.dishes.find(query, {"name": 1, "ingredients": 1, "cost": 1, "profit_margin": 1}).limit(limit)
+    return [{
+        "name": dish.get("name"),
+        "ingredients": ingredient_names(dish.get("ingredients")),
+        "cost": dish.get("cost"),
+        "profit_margin": dish.get("profit_margin"),
+    } for dish in dishes]
 
-        # Ensure JSON response is well-formatted
-        if content.startswith('```json'):
-            content = content[7:]
-        if content.endswith('```'):
-            content = content[:-3]
+def clean_json_content(content):
+    # Ensure JSON response is well-formatted
+    if content.startswith('```json'):
+        content = content[7:]
+    if content.endswith('```'):
+        content = content[:-3]
+    return content
 
-        return json.loads(content)  # Convert to JSON
+def _generate_and_parse(prompt, deadline=None):
+    response = llm.generate(prompt, lane=LLM_LANE, deadline=deadline)  # Correct API call
+    content = response.text.strip()
+    result = json.loads(clean_json_content(content))  # Convert to JSON
+    llm_cache.set(MODEL_NAME, prompt, content)
+    return result
+
+def generate_ai_response(prompt, use_cache=True, deadline=None):
+    try:
+        if use_cache:
+            content = llm_cache.get(MODEL_NAME, prompt)
+            if content is not None:
+                return json.loads(clean_json_content(content))
+        else:
+            llm_cache.record_bypass()
+
+        # Identical prompts already in flight share one model call
+        return llm_flight.do(prompt_key(MODEL_NAME, prompt), _generate_and_parse, prompt, deadline)
     except Exception as e:
         print(f"Error in generate_ai_response: {str(e)}")
         return {"error": str(e)}
 
-def optimize_menu():
+def run_section_prompts(prompts, timeout=SECTION_TIMEOUT_SECONDS, use_cache=True, deadline=None):
+    """Run one prompt per result section concurrently.
+
+    Every section gets at most timeout seconds, counted from dispatch, or
+    until deadline (a time.monotonic() value) when one is given. A section
+    that fails or times out is returned empty and listed under
+    missing_sections with its reason in errors.
+
+    A running call cannot be cancelled, so each run gets its own threads,
+    one per section, rather than holding up a shared pool; the deadline is
+    passed down so an abandoned call stops retrying once it has passed.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + timeout
+    executor = ThreadPoolExecutor(max_workers=max(len(prompts), 1), thread_name_prefix="optimize")
+    futures = {
+        section: executor.submit(generate_ai_response, prompt, use_cache, deadline)
+        for section, prompt in prompts.items()
+    }
+    executor.shutdown(wait=False)
+
+    result = {}
+    errors = {}
+    for section, future in futures.items():
+        try:
+            response = future.result(timeout=max(0, deadline - time.monotonic()))
+        except TimeoutError:
+            response = {"error": "timed out"}
+        except Exception as e:
+            response = {"error": str(e)}
+
+        if not isinstance(response, dict):
+            response = {"error": "unexpected response"}
+
+        if section in response:
+            result[section] = response[section]
+        else:
+            result[section] = []
+            errors[section] = response.get("error", "section missing from response")
+
+    if errors:
+        print(f"optimize_menu sections failed: {errors}")
+        result["missing_sections"] = list(errors)
+        result["errors"] = errors
+    return result
+
+def build_section_prompts(surplus_ingredients, current_menu):
+    """One prompt per result section"""
+    # Generate AI responses with structured prompts
+    daily_specials_prompt = f"""Create 2 daily special dishes using these surplus ingredients: {json.dumps(surplus_ingredients)}.
+    Format the response as JSON with this structure:
+    {{
+        "daily_specials": [
+            {{
+                "name": "string",
+                "ingredients": ["string"],
+                "cost": number,
+                "profit_margin": number,
+                "special_occasion": true
+            }}
+        ]
+    }}"""
+
+    cost_optimization_prompt = f"""Suggest cost optimizations for this menu: {json.dumps(current_menu)}.
+    Format the response as JSON with this structure:
+    {{
+        "cost_optimizations": [
+            {{
+                "item": "string",
+                "current_cost": number,
+                "suggested_cost": number,
+                "potential_savings": number
+            }}
+        ]
+    }}"""
+
+    new_dishes_prompt = f"""Create 2 new dishes to complement this menu: {json.dumps(current_menu)}.
+    Format the response as JSON with this structure:
+    {{
+        "new_dishes": [
+            {{
+                "name": "string",
+                "ingredients": ["string"],
+                "cost": number,
+                "profit_margin": number,
+                "special_occasion": false
+            }}
+        ]
+    }}"""
+
+    return {
+        "daily_specials": daily_specials_prompt,
+        "cost_optimizations": cost_optimization_prompt,
+        "new_dishes": new_dishes_prompt
+    }
+
+def build_combined_prompt(surplus_ingredients, current_menu):
+    """A single prompt asking for all sections, sending the menu only once"""
+    return f"""Surplus ingredients: {json.dumps(surplus_ingredients, separators=(",", ":"))}
+Current menu: {json.dumps(current_menu, separators=(",", ":"))}
+Tasks:
+1. daily_specials: 2 daily special dishes using the surplus ingredients.
+2. cost_optimizations: cost optimizations for the current menu.
+3. new_dishes: 2 new dishes that complement the current menu.
+Respond with JSON only, using this structure:
+{{"daily_specials":[{{"name":"string","ingredients":["string"],"cost":number,"profit_margin":number,"special_occasion":true}}],
+"cost_optimizations":[{{"item":"string","current_cost":number,"suggested_cost":number,"potential_savings":number}}],
+"new_dishes":[{{"name":"string","ingredients":["string"],"cost":number,"profit_margin":number,"special_occasion":false}}]}}"""
+
+def run_combined_prompt(surplus_ingredients, current_menu, use_cache=True):
+    """Ask for every section in one call.
+
+    Sections missing or malformed in the combined response are fetched again
+    with their own per-section prompts. The combined call and the fallback
+    share one SECTION_TIMEOUT_SECONDS budget.
+    """
+    deadline = time.monotonic() + SECTION_TIMEOUT_SECONDS
+    prompts = build_section_prompts(surplus_ingredients, current_menu)
+    response = generate_ai_response(build_combined_prompt(surplus_ingredients, current_menu), use_cache, deadline)
+    if not isinstance(response, dict):
+        response = {}
+
+    result = {}
+    for section in prompts:
+        if isinstance(response.get(section), list):
+            result[section] = response[section]
+
+    missing = {section: prompt for section, prompt in prompts.items() if section not in result}
+    if missing:
+        print(f"Combined optimize_menu response lacked {list(missing)}, falling back to per-section calls")
+        fallback = run_section_prompts(missing, use_cache=use_cache, deadline=deadline)
+        result.update(fallback)
+    return result
+
+def optimize_menu(use_cache=True, batched=OPTIMIZE_BATCHED):
     try:
         surplus_ingredients = get_surplus_ingredients()
         current_menu = get_current_menu()
 
-        # Generate AI responses with structured prompts
-        daily_specials_prompt = f"""Create 2 daily special dishes using these surplus ingredients: {json.dumps(surplus_ingredients)}.
-        Format the response as JSON with this structure:
-        {{
-            "daily_specials": [
-                {{
-                    "name": "string",
-                    "ingredients": ["string"],
-                    "cost": number,
-                    "profit_margin": number,
-                    "special_occasion": true
-                }}
-            ]
-        }}"""
-
-        cost_optimization_prompt = f"""Suggest cost optimizations for this menu: {json.dumps(current_menu)}.
-        Format the response as JSON with this structure:
-        {{
-            "cost_optimizations": [
-                {{
-                    "item": "string",
-                    "current_cost": number,
-                    "suggested_cost": number,
-                    "potential_savings": number
-                }}
-            ]
-        }}"""
-
-        new_dishes_prompt = f"""Create 2 new dishes to complement this menu: {json.dumps(current_menu)}.
-        Format the response as JSON with this structure:
-        {{
-            "new_dishes": [
-                {{
-                    "name": "string",
-                    "ingredients": ["string"],
-                    "cost": number,
-                    "profit_margin": number,
-                    "special_occasion": false
-                }}
-            ]
-        }}"""
-
-        daily_specials = generate_ai_response(daily_specials_prompt)
-        cost_optimizations = generate_ai_response(cost_optimization_prompt)
-        new_dishes = generate_ai_response(new_dishes_prompt)
-
-        result = {
-            "daily_specials": daily_specials.get("daily_specials", []),
-            "cost_optimizations": cost_optimizations.get("cost_optimizations", []),
-            "new_dishes": new_dishes.get("new_dishes", [])
-        }
-        
-        return result
+        if batched:
+            return run_combined_prompt(surplus_ingredients, current_menu, use_cache)
+
+        prompts = build_section_prompts(surplus_ingredients, current_menu)
+        return run_section_prompts(prompts, use_cache=use_cache)
 
     except Exception as e:
         print(f"Error in optimize_menu: {str(e)}")
         return {"error": str(e)}
+
+async def optimize_menu_async(use_cache=True, batched=OPTIMIZE_BATCHED):
+    """Awaitable optimize_menu; the blocking model calls run on worker threads"""
+    return await asyncio.to_thread(optimize_menu, use_cache, batched)
@@ -0,0 +1,123 @@
+"""One-off data migrations.
+
+Usage:
+    python migrations.py normalize-ingredients [--dry-run] [--batch-size 1000]
+"""
+import argparse
+import copy
+import logging
+from datetime import datetime
+from pymongo import UpdateOne
+from db_config import db
+from dishes import normalize_ingredients
+from versioning import bump_version
+from ingredient_index import rebuild_index
+from consumption_rollups import rebuild_rollups
+import consumption_archive
+from costing import recompute_costs
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Dishes with at least one ingredient outside the canonical schema
+LEGACY_INGREDIENTS_QUERY = {"$or": [
+    {"ingredients": {"$elemMatch": {"$type": "string"}}},
+    {"ingredients": {"$elemMatch": {"quantity": {"$exists": False}}}},
+    {"ingredients": {"$elemMatch": {"unit": {"$exists": False}}}},
+]}
+
+def normalize_legacy_ingredients(db, batch_size=1000, dry_run=False):
+    """Rewrite legacy ingredients to {name, quantity, unit} with bulk_write.
+
+    Each update is guarded on the ingredients it read, so a dish edited
+    concurrently is left for the next run rather than overwritten.
+    """
+    scanned = 0
+    modified = 0
+    ops = []
+
+    def flush():
+        nonlocal modified
+        if ops and not dry_run:
+            modified += db.dishes.bulk_write(ops, ordered=False).modified_count
+        ops.clear()
+
+    for dish in db.dishes.find(LEGACY_INGREDIENTS_QUERY, {"ingredients": 1}):
+        scanned += 1
+        ingredients = normalize_ingredients(copy.deepcopy(dish["ingredients"]))
+        if ingredients == dish["ingredients"]:
+            continue
+        ops.append(UpdateOne(
+            {"_id": dish["_id"], "ingredients": dish["ingredients"]},
+            {"$set": {"ingredients": ingredients, "updated_at": datetime.utcnow()}}
+        ))
+        if dry_run:
+            modified += 1
+        if len(ops) >= batch_size:
+            flush()
+    flush()
+
+    if modified and not dry_run:
+        bump_version(db, "dishes")
+    logger.info(f"normalize-ingredients: scanned {scanned}, {'would modify' if dry_run else 'modified'} {modified}")
+    return {"scanned": scanned, "modified": modified}
+
+def rebuild_ingredient_index(db, batch_size=1000, dry_run=False):
+    """Recreate the ingredient inverted index from dishes and menus"""
+    if dry_run:
+        return {"dishes": db.dishes.count_documents({}), "menus": db.menus.count_documents({})}
+    result = rebuild_index(db, batch_size=batch_size)
+    # /dishes/by-ingredients and /ingredients are cached on these versions
+    bump_version(db, "dishes")
+    bump_version(db, "menus")
+    logger.info(f"rebuild-ingredient-index: {result['ingredients']} ingredients indexed")
+    return result
+
+def rebuild_consumption_rollups(db, batch_size=1000, dry_run=False):
+    """Recompute the consumption rollups from the raw rows"""
+    if dry_run:
+        return {"consumption": db.consumption.count_documents({})}
+    result = rebuild_rollups(db, batch_size=batch_size)
+    bump_version(db, "consumption")
+    logger.info(f"rebuild-consumption-rollups: {result['rollups']} rollups")
+    return result
+
+def backfill_consumption_archive(db, batch_size=1000, dry_run=False):
+    """Rebuild the Parquet archive from MongoDB and switch forecasts to it"""
+    if not consumption_archive.archive_enabled():
+        raise SystemExit("Set CONSUMPTION_ARCHIVE=true and install pyarrow to use the archive")
+    if dry_run:
+        return {"consumption": db.consumption.count_documents({})}
+    result = consumption_archive.backfill_from_mongo(db, batch_size=batch_size)
+    logger.info(f"backfill-consumption-archive: {result['archived']} rows in {result['months']} months")
+    return result
+
+def recompute_dish_costs(db, batch_size=1000, dry_run=False):
+    """Recompute the stored cost of every dish from the price table"""
+    if dry_run:
+        return {"dishes": db.dishes.count_documents({})}
+    recomputed = recompute_costs(db, batch_size=batch_size)
+    logger.info(f"recompute-dish-costs: {recomputed} dishes")
+    return {"recomputed": recomputed}
+
+MIGRATIONS = {
+    "normalize-ingredients": normalize_legacy_ingredients,
+    "rebuild-ingredient-index": rebuild_ingredient_index,
+    "rebuild-consumption-rollups": rebuild_consumption_rollups,
+    "backfill-consumption-archive": backfill_consumption_archive,
+    "recompute-dish-costs": recompute_dish_costs,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a data migration")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    result = MIGRATIONS[args.migration](db, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+UPLOAD_FOLDER = 'uploads'
+ORIGINALS_FOLDER = os.path.join(UPLOAD_FOLDER, 'originals')
+VARIANTS_FOLDER = os.path.join(UPLOAD_FOLDER, 'variants')
+for folder in (ORIGINALS_FOLDER, VARIANTS_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+
+# Widths of the WebP variants generated for every photo
+VARIANT_WIDTHS = (320, 640, 1280)
+WEBP_QUALITY = 80
+
+# Content-addressed files never change, so clients may cache them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+ALLOWED_PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+
+HASHED_PHOTO_URL = re.compile(r"^/uploads/originals/([0-9a-f]{64})\.\w+$")
+HASHED_PATH = re.compile(r"^(originals|variants)/([0-9a-f]{64})(-\d+)?\.\w+$")
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="photo")
+
+# Hashes with variant generation queued or running in this process
+_pending = set()
+_pending_lock = threading.Lock()
+
+def variant_path(photo_hash, width):
+    return os.path.join(VARIANTS_FOLDER, f"{photo_hash}-{width}.webp")
+
+def generate_variants(original_path, photo_hash):
+    """Write resized WebP copies of an original, never upscaling"""
+    from PIL import Image
+
+    try:
+        with Image.open(original_path) as image:
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            for width in VARIANT_WIDTHS:
+                path = variant_path(photo_hash, width)
+                if os.path.exists(path):
+                    continue
+                variant = image
+                if image.width > width:
+                    height = round(image.height * width / image.width)
+                    variant = image.resize((width, height), Image.LANCZOS)
+                tmp_path = f"{path}.tmp"
+                variant.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+                os.replace(tmp_path, path)
+        logger.debug(f"Generated variants for {photo_hash}")
+    except Exception as e:
+        logger.error(f"Error generating variants for {photo_hash}: {str(e)}")
+    finally:
+        with _pending_lock:
+            _pending.discard(photo_hash)
+
+def queue_variants(original_path, photo_hash):
+    """Generate missing variants in the background, once per photo at a time"""
+    with _pending_lock:
+        if photo_hash in _pending:
+            return
+        _pending.add(photo_hash)
+    executor.submit(generate_variants, original_path, photo_hash)
+
+def store_photo(photo_file):
+    """Store an uploaded photo by the SHA-256 of its content.
+
+    Identical uploads map to the same file and are stored once. Variant
+    generation is queued in the background. Returns (photo_hash, photo_url).
+    """
+    extension = os.path.splitext(photo_file.filename or "")[1].lower()
+    if extension not in ALLOWED_PHOTO_EXTENSIONS:
+        raise ValueError(f"Unsupported photo type: {extension or 'unknown'}")
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=ORIGINALS_FOLDER, suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            for chunk in iter(lambda: photo_file.stream.read(64 * 1024), b""):
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        photo_hash = digest.hexdigest()
+        filename = f"{photo_hash}{extension}"
+        original_path = os.path.join(ORIGINALS_FOLDER, filename)
+        if os.path.exists(original_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, original_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if any(not os.path.exists(variant_path(photo_hash, width)) for width in VARIANT_WIDTHS):
+        queue_variants(original_path, photo_hash)
+    return photo_hash, f"/uploads/originals/{filename}"
+
+def photo_variants(photo_url):
+    """Variant URLs by width for a content-addressed photo.
+
+    The URLs depend only on the photo hash, so cached responses stay valid
+    while variants are still being generated; serve_upload answers with the
+    original until they exist.
+    """
+    match = HASHED_PHOTO_URL.match(photo_url or "")
+    if not match:
+        return {}
+    photo_hash = match.group(1)
+    return {str(width): f"/uploads/variants/{photo_hash}-{width}.webp" for width in VARIANT_WIDTHS}
+
+def find_original(photo_hash):
+    """Path of the original a photo hash was stored from, or None"""
+    for extension in ALLOWED_PHOTO_EXTENSIONS:
+        path = os.path.join(ORIGINALS_FOLDER, f"{photo_hash}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def resolve_upload(filename):
+    """Where to serve an uploads path from: (directory, filename, etag, caching).
+
+    caching is "immutable" for content-addressed files, whose hash is their
+    ETag; "revalidate" when a variant not generated yet is answered with its
+    original, which clients must not keep under the variant URL; and None
+    for legacy uploads.
+    """
+    match = HASHED_PATH.match(filename)
+    if not match:
+        return UPLOAD_FOLDER, filename, None, None
+
+    if match.group(1) == "variants" and not os.path.exists(os.path.join(UPLOAD_FOLDER, filename)):
+        path = find_original(match.group(2))
+        if path is None:
+            return UPLOAD_FOLDER, filename, None, None
+        # Not generated yet, or lost: queue it again
+        queue_variants(path, match.group(2))
+        return ORIGINALS_FOLDER, os.path.basename(path), None, "revalidate"
+
+    return UPLOAD_FOLDER, filename, match.group(2) + (match.group(3) or ""), "immutable"
+
+def set_upload_caching(response, caching):
+    """Cache-Control for a response resolved by resolve_upload"""
+    if caching == "immutable":
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    elif caching == "revalidate":
+        response.cache_control.max_age = 0
+        response.cache_control.no_cache = True
+    return response
+
+def serve_upload(filename):
+    """Serve a file under uploads with conditional and Range request support.
+
+    Content-addressed files get their hash as a strong ETag and a long-lived
+    immutable Cache-Control; legacy uploads keep Flask's defaults.
+    """
+    from flask import send_from_directory
+
+    directory, filename, etag, caching = resolve_upload(filename)
+    response = send_from_directory(directory, filename, conditional=True, etag=etag or True)
+    return set_upload_caching(response, caching)
@@ -0,0 +1,112 @@
+from collections import defaultdict
+import copy
+import logging
+import os
+import threading
+import time
+from bson import ObjectId
+from ttl_cache import TTLCache
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+READ_CACHE_TTL_SECONDS = int(os.getenv("READ_CACHE_TTL_SECONDS", "300"))
+DISH_CACHE_SIZE = int(os.getenv("DISH_CACHE_SIZE", "5000"))
+MENU_CACHE_SIZE = int(os.getenv("MENU_CACHE_SIZE", "500"))
+
+# Watch MongoDB for writes from other processes and invalidate on them
+READ_CACHE_CHANGE_STREAM = os.getenv("READ_CACHE_CHANGE_STREAM", "false").lower() in ("1", "true", "yes")
+
+# Entries are stored with the collection versions they were read at and only
+# served while those are still current, so a write from any process makes
+# them stale at once; the TTL and change stream only reclaim memory sooner.
+
+# (dishes version, menu-embedded dish details) by dish ObjectId
+dish_cache = TTLCache(maxsize=DISH_CACHE_SIZE, ttl=READ_CACHE_TTL_SECONDS)
+
+# ((menus, dishes) versions, hydrated serialized menu) by menu ID string
+menu_cache = TTLCache(maxsize=MENU_CACHE_SIZE, ttl=READ_CACHE_TTL_SECONDS)
+
+# Which cached menus embed which dish, so a dish write drops exactly those
+_menus_by_dish = defaultdict(set)
+_lock = threading.Lock()
+
+invalidations = {"dishes": 0, "menus": 0}
+
+def get_cached_dishes(dish_ids, version):
+    """Split dish IDs into entries cached at this dishes version and the IDs still to fetch"""
+    found = {}
+    missing = []
+    for dish_id in dish_ids:
+        entry = dish_cache.get(dish_id)
+        if entry is None or entry[0] != version:
+            missing.append(dish_id)
+        else:
+            found[dish_id] = entry[1]
+    return found, missing
+
+def cache_dishes(dishes_by_id, version):
+    for dish_id, dish in dishes_by_id.items():
+        dish_cache.set(dish_id, (version, dish))
+
+def get_cached_menu(menu_id, versions):
+    """A hydrated menu cached at these (menus, dishes) versions, or None"""
+    entry = menu_cache.get(str(menu_id))
+    if entry is None or entry[0] != versions:
+        return None
+    return copy.deepcopy(entry[1])
+
+def cache_menu(menu, versions):
+    menu_id = str(menu["_id"])
+    with _lock:
+        for dish in menu.get("dishes") or []:
+            if isinstance(dish, dict):
+                _menus_by_dish[dish["_id"]].add(menu_id)
+    menu_cache.set(menu_id, (versions, copy.deepcopy(menu)))
+
+def invalidate_menu(menu_id):
+    invalidations["menus"] += 1
+    menu_cache.pop(str(menu_id))
+
+def invalidate_dish(dish_id):
+    """Drop a dish and every cached menu that embeds it"""
+    invalidations["dishes"] += 1
+    dish_cache.pop(ObjectId(dish_id))
+    with _lock:
+        menu_ids = _menus_by_dish.pop(str(dish_id), set())
+    for menu_id in menu_ids:
+        invalidate_menu(menu_id)
+
+def _watch_changes(db):
+    pipeline = [{"$match": {"ns.coll": {"$in": ["dishes", "menus"]}}}]
+    resume_token = None
+    while True:
+        try:
+            with db.watch(pipeline, resume_after=resume_token) as stream:
+                for change in stream:
+                    resume_token = stream.resume_token
+                    document_id = change.get("documentKey", {}).get("_id")
+                    if document_id is None:
+                        continue
+                    if change["ns"]["coll"] == "dishes":
+                        invalidate_dish(document_id)
+                    else:
+                        invalidate_menu(document_id)
+        except Exception as e:
+            logger.error(f"Read cache change stream failed, restarting: {str(e)}")
+            time.sleep(5)
+
+def start_change_stream(db):
+    """Evict entries on writes made by any process; needs a replica set (Atlas)"""
+    thread = threading.Thread(target=_watch_changes, args=(db,), name="read-cache-watch", daemon=True)
+    thread.start()
+    return thread
+
+def read_cache_stats():
+    return {
+        "dishes": dish_cache.stats(),
+        "menus": menu_cache.stats(),
+        "invalidations": dict(invalidations),
+        "change_stream": READ_CACHE_CHANGE_STREAM
+    }
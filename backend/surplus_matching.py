@@ -0,0 +1,205 @@
+"""Match surplus inventory against the existing dishes.
+
+Dishes are held as a dish x ingredient quantity matrix (rebuilt when the
+dishes collection changes), so scoring every dish against the surplus is a
+handful of numpy operations. Inventory requests are served from the best
+matches, and Gemini is only asked for new dishes when no existing dish
+covers enough of what is in surplus.
+"""
+from datetime import date, datetime
+import logging
+import os
+import threading
+import numpy as np
+from costing import UNITS, normalize_unit
+from ingredient_index import canonicalize
+from ttl_cache import TTLCache
+from versioning import get_versions
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Share of a dish's ingredients the surplus must cover to skip the model
+MATCH_COVERAGE_THRESHOLD = float(os.getenv("MATCH_COVERAGE_THRESHOLD", "0.6"))
+
+# Weight of expiry urgency against quantity coverage in the score
+EXPIRY_WEIGHT = float(os.getenv("MATCH_EXPIRY_WEIGHT", "0.4"))
+
+# Urgency decays by 1/e every this many days until expiry
+EXPIRY_HORIZON_DAYS = float(os.getenv("MATCH_EXPIRY_HORIZON_DAYS", "7"))
+
+# Existing dishes returned per request, as many as the model is asked for
+MATCH_LIMIT = 2
+
+DISH_FIELDS = {
+    "name": 1, "description": 1, "price": 1, "photo": 1, "ingredients": 1, "recipe": 1,
+    "cost": 1, "profit_margin": 1
+}
+
+class DishMatrix:
+    """Required quantity of each canonical ingredient (columns) per dish (rows).
+
+    Quantities are held in the base unit of their dimension (g, ml, or the
+    counted unit itself), with the dimension of each cell alongside, so they
+    can be compared with surplus recorded in other units.
+    """
+
+    def __init__(self, dishes):
+        self.dishes = dishes
+        self.columns = {}
+        self.dimensions = {}
+        cells = {}
+        for row, dish in enumerate(dishes):
+            for ingredient in dish.get("ingredients") or []:
+                name = ingredient.get("name") if isinstance(ingredient, dict) else ingredient
+                key = canonicalize(name or "")
+                if not key:
+                    continue
+                col = self.columns.setdefault(key, len(self.columns))
+                dimension, quantity = _base_quantity(ingredient)
+                dim = self.dimensions.setdefault(dimension, len(self.dimensions))
+                cell = cells.get((row, col))
+                # Repeated ingredients within a dish add up when their units convert
+                if cell is None:
+                    cells[(row, col)] = [dim, quantity]
+                elif cell[0] == dim:
+                    cell[1] += quantity
+
+        self.quantities = np.zeros((len(dishes), len(self.columns)), dtype=np.float64)
+        self.cell_dimensions = np.zeros((len(dishes), len(self.columns)), dtype=np.intp)
+        if cells:
+            rows, cols = (np.asarray(index, dtype=np.intp) for index in zip(*cells))
+            values = np.asarray(list(cells.values()), dtype=np.float64)
+            self.quantities[rows, cols] = values[:, 1]
+            self.cell_dimensions[rows, cols] = values[:, 0].astype(np.intp)
+        self.uses = self.quantities > 0
+        self.ingredient_counts = np.maximum(self.uses.sum(axis=1), 1)
+
+def _quantity(ingredient):
+    try:
+        quantity = float(ingredient.get("quantity", 1)) if isinstance(ingredient, dict) else 1.0
+    except (TypeError, ValueError):
+        return 1.0
+    return quantity if quantity > 0 else 1.0
+
+def _base_quantity(ingredient):
+    """(dimension, quantity in its base unit); unknown units are their own dimension"""
+    raw_unit = ingredient.get("unit") if isinstance(ingredient, dict) else None
+    unit = normalize_unit(raw_unit)
+    if unit is None:
+        return f"unit:{str(raw_unit).strip().lower()}", _quantity(ingredient)
+    dimension, size = UNITS[unit]
+    return dimension, _quantity(ingredient) * size
+
+_matrices = TTLCache(maxsize=4)
+_build_lock = threading.Lock()
+
+def get_dish_matrix(db):
+    """The matrix for the current version of the dishes collection"""
+    key = get_versions(db, ["dishes"])
+    matrix = _matrices.get(key)
+    if matrix is None:
+        with _build_lock:
+            matrix = _matrices.get(key)
+            if matrix is None:
+                matrix = DishMatrix(list(db.dishes.find({}, DISH_FIELDS)))
+                _matrices.set(key, matrix)
+                logger.debug(f"Built dish matrix {matrix.quantities.shape} for dishes version {key[0]}")
+    return matrix
+
+def days_until(expiry_date, today=None):
+    """Days from today to an ISO date or datetime; None when unknown"""
+    today = today or date.today()
+    if isinstance(expiry_date, datetime):
+        return (expiry_date.date() - today).days
+    if isinstance(expiry_date, date):
+        return (expiry_date - today).days
+    try:
+        return (date.fromisoformat(str(expiry_date)[:10]) - today).days
+    except ValueError:
+        return None
+
+def surplus_vectors(matrix, surplus, today=None):
+    """Available quantity per matrix column and dimension, and expiry urgency per column"""
+    available = np.zeros((len(matrix.columns), max(len(matrix.dimensions), 1)))
+    present = np.zeros(len(matrix.columns), dtype=bool)
+    urgency = np.zeros(len(matrix.columns))
+    for item in surplus:
+        col = matrix.columns.get(canonicalize(item.get("name", "")))
+        if col is None:
+            continue
+        present[col] = True
+        dimension, quantity = _base_quantity(item)
+        dim = matrix.dimensions.get(dimension)
+        if dim is not None:
+            available[col, dim] += max(quantity, 0)
+        days = days_until(item.get("expiry_date"), today)
+        if days is None:
+            days = EXPIRY_HORIZON_DAYS
+        # Already expired stock is as urgent as it gets
+        urgency[col] = max(urgency[col], np.exp(-max(days, 0) / EXPIRY_HORIZON_DAYS))
+    return available, present, urgency
+
+def score_dishes(matrix, surplus, today=None):
+    """Score every dish against the surplus.
+
+    coverage is the average share of each ingredient's required quantity the
+    surplus can supply, compared in base units; an ingredient in surplus
+    only in units that do not convert to the dish's counts as covered.
+    urgency is the share of the surplus's expiry weight the dish would use
+    up. Returns (score, coverage, urgency) arrays.
+    """
+    available, present, urgency = surplus_vectors(matrix, surplus, today)
+    # Surplus of each cell's ingredient in the cell's own dimension
+    in_dimension = available[np.arange(len(matrix.columns)), matrix.cell_dimensions]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fill = np.where(in_dimension > 0, np.minimum(in_dimension / matrix.quantities, 1.0), present.astype(np.float64))
+    fill = np.where(matrix.uses, fill, 0.0)
+    coverage = fill.sum(axis=1) / matrix.ingredient_counts
+
+    in_stock = urgency * present
+    total_urgency = in_stock.sum()
+    used_urgency = matrix.uses.astype(np.float64) @ in_stock
+    urgency_share = used_urgency / total_urgency if total_urgency > 0 else np.zeros(len(matrix.dishes))
+
+    score = (1 - EXPIRY_WEIGHT) * coverage + EXPIRY_WEIGHT * urgency_share
+    return score, coverage, urgency_share
+
+def matched_dish(dish, score, coverage, urgency):
+    """A stored dish in the shape /generate-dishes returns"""
+    return {
+        "_id": str(dish["_id"]),
+        "name": dish.get("name"),
+        "description": dish.get("description", ""),
+        "recipe": dish.get("recipe") or {"steps": []},
+        "ingredients": dish.get("ingredients", []),
+        "price": dish.get("price"),
+        "photo": dish.get("photo"),
+        "cost": dish.get("cost"),
+        "profit_margin": dish.get("profit_margin"),
+        "special_occasion": False,
+        "match": {
+            "score": round(float(score), 4),
+            "coverage": round(float(coverage), 4),
+            "expiry_urgency": round(float(urgency), 4)
+        }
+    }
+
+def match_surplus(db, surplus, limit=MATCH_LIMIT, today=None):
+    """Best existing dishes for the surplus, highest score first.
+
+    Only dishes whose coverage reaches MATCH_COVERAGE_THRESHOLD are returned;
+    an empty list means the model should be asked instead.
+    """
+    matrix = get_dish_matrix(db)
+    if not matrix.dishes or not surplus:
+        return []
+
+    score, coverage, urgency = score_dishes(matrix, surplus, today)
+    eligible = np.flatnonzero(coverage >= MATCH_COVERAGE_THRESHOLD)
+    best = eligible[np.argsort(-score[eligible], kind="stable")][:limit]
+    return [matched_dish(matrix.dishes[i], score[i], coverage[i], urgency[i]) for i in best]
+
+def matrix_stats():
+    return _matrices.stats()
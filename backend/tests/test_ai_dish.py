@@ -0,0 +1,26 @@
+import ai_dish
+
+def test_inventory_request_reads_the_surplus_once(monkeypatch):
+    reads = []
+    surplus = [{"name": "Tomato", "quantity": 4, "unit": "kg"}]
+
+    def get_surplus_ingredients():
+        reads.append(1)
+        return surplus
+
+    monkeypatch.setattr(ai_dish, "get_surplus_ingredients", get_surplus_ingredients)
+    monkeypatch.setattr(ai_dish, "match_surplus", lambda db, ingredients: [{"name": "Tomato Soup", "surplus": ingredients}])
+
+    data = {"type": "inventory"}
+    found = ai_dish.surplus_for_request(data)
+    prompt, error = ai_dish.build_dish_prompt(data, found)
+    result = ai_dish.run_inventory_generation(prompt, True, found)
+
+    assert error is None and "Tomato" in prompt
+    assert result["source"] == "existing"
+    assert result["dishes"][0]["surplus"] is surplus
+    assert len(reads) == 1
+
+def test_custom_request_does_not_read_the_surplus(monkeypatch):
+    monkeypatch.setattr(ai_dish, "get_surplus_ingredients", lambda: 1 / 0)
+    assert ai_dish.surplus_for_request({"type": "custom", "ingredients": ["basil"]}) is None
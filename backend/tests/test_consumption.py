@@ -0,0 +1,29 @@
+import consumption
+import consumption_archive
+
+class _Collection:
+    def __init__(self):
+        self.rows = []
+
+    def insert_many(self, records, ordered=False):
+        self.rows.extend(records)
+
+def _sheet(tmp_path):
+    path = tmp_path / "consumption.csv"
+    path.write_text("date,ingredient,consumption\n2024-05-01,Tomato,3\n2024-05-01,,2\n2024-05-02,Basil,1.5\n")
+    return str(path)
+
+def test_ingest_normalises_and_counts_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(consumption_archive, "mark_incomplete", lambda: None)
+    collection = _Collection()
+    stats, preview = consumption.ingest_consumption_file(_sheet(tmp_path), collection)
+    assert stats["rows"] == 2
+    assert stats["rejected"] == 1
+    assert [row["ingredient"] for row in collection.rows] == ["Tomato", "Basil"]
+    assert preview[0]["date"] == "2024-05-01"
+
+def test_unarchived_upload_invalidates_archive(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(consumption_archive, "mark_incomplete", lambda: calls.append(True))
+    consumption.ingest_consumption_file(_sheet(tmp_path), _Collection(), archive=False)
+    assert calls == [True]
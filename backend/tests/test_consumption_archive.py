@@ -0,0 +1,35 @@
+import pandas as pd
+import consumption_archive
+
+def _chunk():
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-30", "2024-02-01"]),
+        "ingredient": ["tomato", "basil"],
+        "consumption": [3.0, 1.5],
+        "type": ["daily", "daily"],
+        "high_risk": [False, True]
+    })
+
+def test_archive_is_off_by_default():
+    assert consumption_archive.CONSUMPTION_ARCHIVE is False
+
+def test_appends_alone_do_not_make_the_archive_readable(tmp_path, monkeypatch):
+    monkeypatch.setattr(consumption_archive, "CONSUMPTION_ARCHIVE", True)
+    root = str(tmp_path)
+
+    assert consumption_archive.append_chunk(_chunk(), "upload", root) == 2
+    assert consumption_archive.archived_months(root) == ["2024-01", "2024-02"]
+    assert not consumption_archive.archive_ready(root)
+
+def test_failed_append_sends_reads_back_to_mongo(tmp_path, monkeypatch):
+    monkeypatch.setattr(consumption_archive, "CONSUMPTION_ARCHIVE", True)
+    root = str(tmp_path)
+    (tmp_path / consumption_archive.COMPLETE_MARKER).write_text("0\n")
+    consumption_archive.append_chunk(_chunk(), "upload", root)
+    assert consumption_archive.archive_ready(root)
+
+    # The marker must not be picked up as a data file
+    assert len(consumption_archive.scan(["ingredient"], root=root)) == 2
+
+    consumption_archive.mark_incomplete(root)
+    assert not consumption_archive.archive_ready(root)
@@ -0,0 +1,46 @@
+from datetime import datetime
+import pandas as pd
+from consumption_rollups import rollup_ops
+
+def _chunk(rows):
+    return pd.DataFrame(rows, columns=["date", "ingredient", "consumption", "high_risk"]).assign(
+        date=lambda df: pd.to_datetime(df["date"])
+    )
+
+CHUNK = _chunk([
+    ("2024-04-29 08:00", "Milk", 2.0, True),
+    ("2024-05-01 12:00", "Milk", 3.0, True),
+    ("2024-05-01 19:00", "Basil", 1.0, False),
+    ("2024-05-05 10:00", "Basil", 4.0, False),
+])
+
+def _increments(ops):
+    return {op._filter["_id"]: op._doc["$inc"] for op in ops}
+
+def test_rollup_ops_sum_each_bucket_once():
+    ops = rollup_ops(CHUNK)
+    increments = _increments(ops)
+
+    assert len(ops) == len(increments) == 15
+    assert increments["day:2024-05-01:Milk"] == {"total": 3.0, "high_risk_total": 3.0, "rows": 1}
+    assert increments["day:2024-05-01:*"] == {"total": 4.0, "high_risk_total": 3.0, "rows": 2}
+    # Monday to Sunday is one week
+    assert increments["week:2024-04-29:Basil"] == {"total": 5.0, "high_risk_total": 0.0, "rows": 2}
+    assert increments["week:2024-04-29:*"] == {"total": 10.0, "high_risk_total": 5.0, "rows": 4}
+    assert increments["month:2024-04-01:*"] == {"total": 2.0, "high_risk_total": 2.0, "rows": 1}
+    assert increments["month:2024-05-01:*"] == {"total": 8.0, "high_risk_total": 3.0, "rows": 3}
+
+def test_rollup_ops_upsert_bucket_fields():
+    op = next(op for op in rollup_ops(CHUNK) if op._filter["_id"] == "week:2024-04-29:*")
+    assert op._upsert
+    assert op._doc["$setOnInsert"] == {"period": "week", "start": datetime(2024, 4, 29), "ingredient": None}
+
+def test_chunks_add_up_to_the_whole():
+    whole = _increments(rollup_ops(CHUNK))
+    combined = {}
+    for chunk in (CHUNK.iloc[:2], CHUNK.iloc[2:]):
+        for key, inc in _increments(rollup_ops(chunk)).items():
+            totals = combined.setdefault(key, {"total": 0.0, "high_risk_total": 0.0, "rows": 0})
+            for field, value in inc.items():
+                totals[field] += value
+    assert combined == whole
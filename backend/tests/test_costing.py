@@ -0,0 +1,54 @@
+import pytest
+from costing import cost_dishes, set_price
+
+@pytest.mark.parametrize("price", [float("nan"), float("inf"), "-inf", "NaN"])
+def test_set_price_rejects_non_finite_prices(price):
+    # Rejected before anything is written, so no database is needed
+    with pytest.raises(ValueError):
+        set_price(None, "Tomato", price, "kg")
+
+# Price per base unit and dimension, as load_prices returns them
+PRICES = {
+    "tomato": (0.004, "mass"),
+    "basil": (0.5, "pcs"),
+}
+
+def test_cost_dishes_converts_units_and_computes_margins():
+    dishes = [
+        {"price": 10, "ingredients": [
+            {"name": "Tomatoes", "quantity": 0.5, "unit": "kg"},
+            {"name": "Basil", "quantity": 2, "unit": "pieces"},
+        ]},
+        {"price": 4, "ingredients": [{"name": "Tomato", "quantity": 250, "unit": "g"}]},
+    ]
+    assert cost_dishes(dishes, PRICES) == [
+        {"cost": 3.0, "profit_margin": 70.0, "unpriced_ingredients": []},
+        {"cost": 1.0, "profit_margin": 75.0, "unpriced_ingredients": []},
+    ]
+
+def test_cost_dishes_lists_unpriced_and_unconvertible_ingredients():
+    dishes = [{"price": 8, "ingredients": [
+        {"name": "Tomato", "quantity": 100, "unit": "ml"},
+        "Salt",
+        {"name": "Basil", "quantity": 4, "unit": "pcs"},
+    ]}]
+    assert cost_dishes(dishes, PRICES) == [
+        {"cost": 2.0, "profit_margin": 75.0, "unpriced_ingredients": ["Tomato", "Salt"]},
+    ]
+
+def test_cost_dishes_without_priced_ingredients_or_menu_price():
+    dishes = [
+        {"price": 5, "ingredients": ["Salt"]},
+        {"ingredients": [{"name": "Basil", "quantity": 1, "unit": "pcs"}]},
+        {"price": 5},
+    ]
+    assert cost_dishes(dishes, PRICES) == [
+        {"cost": None, "profit_margin": None, "unpriced_ingredients": ["Salt"]},
+        {"cost": 0.5, "profit_margin": None, "unpriced_ingredients": []},
+        {"cost": None, "profit_margin": None, "unpriced_ingredients": []},
+    ]
+
+def test_cost_dishes_with_an_empty_price_table():
+    assert cost_dishes([{"ingredients": ["Basil"]}], {}) == [
+        {"cost": None, "profit_margin": None, "unpriced_ingredients": ["Basil"]},
+    ]
@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from pymongo import MongoClient, ReadPreference
+import db_config
+
+class _Client(MongoClient):
+    """Never connects; start_session would need a server to check support"""
+
+    def __init__(self):
+        super().__init__("mongodb://localhost:1", connect=False)
+        self.session_options = None
+
+    @contextmanager
+    def start_session(self, **options):
+        self.session_options = options
+        yield object()
+
+def test_reads_join_the_causal_session(monkeypatch):
+    client = _Client()
+    monkeypatch.setattr(db_config.manager, "get_client", lambda: client)
+    read_db = db_config.LazyDatabase(ReadPreference.SECONDARY_PREFERRED)
+
+    with db_config.causal_reads(read_db) as session:
+        assert client.session_options == {"causal_consistency": True}
+        collection = read_db.collection_versions
+        assert isinstance(collection, db_config.SessionCollection)
+        assert collection.find.keywords == {"session": session}
+        assert db_config.LazyCollection("dishes").find.keywords == {"session": session}
+
+    assert not isinstance(read_db.collection_versions, db_config.SessionCollection)
+    client.close()
+
+def test_primary_reads_need_no_session():
+    with db_config.causal_reads(db_config.LazyDatabase()) as session:
+        assert session is None
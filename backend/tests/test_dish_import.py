@@ -0,0 +1,46 @@
+import pytest
+from pymongo.errors import AutoReconnect
+import dish_import
+
+class _Result:
+    def __init__(self, ids):
+        self.inserted_ids = ids
+
+class _Collection:
+    database = object()
+
+    def __init__(self, fail_on_call):
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def insert_many(self, batch, ordered=False):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise AutoReconnect("connection lost")
+        return _Result([i for i, _ in enumerate(batch)])
+
+def _rows(count):
+    return [(line, {"name": f"Dish {line}", "price": 10, "ingredients": ["salt"]}) for line in range(1, count + 1)]
+
+@pytest.fixture
+def bumps(monkeypatch):
+    bumped = []
+    monkeypatch.setattr(dish_import, "price_dishes", lambda db, dishes: dishes)
+    monkeypatch.setattr(dish_import, "index_dishes", lambda db, dishes: None)
+    monkeypatch.setattr(dish_import, "bump_version", lambda db, name: bumped.append(name))
+    return bumped
+
+def test_failed_import_still_bumps_version_for_committed_batches(bumps):
+    with pytest.raises(AutoReconnect):
+        dish_import.import_dishes(_rows(5), _Collection(fail_on_call=2), batch_size=2)
+    assert bumps == ["dishes"]
+
+def test_import_without_writes_does_not_bump_version(bumps):
+    result = dish_import.import_dishes([(1, {"name": ""})], _Collection(fail_on_call=None))
+    assert result["inserted"] == 0
+    assert bumps == []
+
+def test_successful_import_bumps_version_once(bumps):
+    result = dish_import.import_dishes(_rows(5), _Collection(fail_on_call=None), batch_size=2)
+    assert result["inserted"] == 5
+    assert bumps == ["dishes"]
@@ -0,0 +1,41 @@
+import json
+from dish_stream import ArrayObjectParser
+
+DISHES = [
+    {"name": "Tomato {Soup}", "description": "A \"classic\" \\ bowl", "ingredients": [{"name": "Tomato", "quantity": 2}]},
+    {"name": "Basil Toast", "recipe": {"steps": ["Step 1: toast", "Step 2: top ]"]}},
+]
+
+DOCUMENT = '```json\n{"dishes": ' + json.dumps(DISHES, indent=2) + ', "note": {"x": 1}}\n```'
+
+def _feed(parser, text, size):
+    objects = []
+    for start in range(0, len(text), size):
+        objects.extend(parser.feed(text[start:start + size]))
+    return objects
+
+def test_objects_are_returned_whatever_the_chunking():
+    for size in (1, 3, 17, len(DOCUMENT)):
+        parser = ArrayObjectParser()
+        assert _feed(parser, DOCUMENT, size) == DISHES
+        assert parser.finished
+
+def test_each_object_is_returned_as_soon_as_it_closes():
+    parser = ArrayObjectParser()
+    first = json.dumps(DISHES[0])
+    assert parser.feed('{"dishes": [' + first[:-1]) == []
+    assert parser.feed("}, ") == [DISHES[0]]
+
+def test_text_after_the_array_is_ignored():
+    parser = ArrayObjectParser()
+    assert parser.feed('{"dishes": [], "other": [{"name": "x"}]}') == []
+    assert parser.finished
+
+def test_malformed_objects_are_skipped():
+    parser = ArrayObjectParser()
+    assert parser.feed('{"dishes": [{"name": oops}, {"name": "ok"}]}') == [{"name": "ok"}]
+
+def test_other_keys_are_not_mistaken_for_the_array():
+    parser = ArrayObjectParser(key="dishes")
+    assert parser.feed('{"side_dishes_count": 2, "menu": [{"name": "x"}], ') == []
+    assert parser.feed('"dishes": [{"name": "y"}]}') == [{"name": "y"}]
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+from bson import ObjectId
+import pytest
+from dishes import decode_cursor, encode_cursor, parse_fields, stream_dishes
+
+def test_created_at_cursor_for_dish_without_created_at():
+    dish_id = ObjectId()
+    cursor = encode_cursor({"_id": dish_id}, "created_at")
+    assert decode_cursor(cursor, "created_at") == {"$or": [
+        {"created_at": {"$ne": None}},
+        {"created_at": None, "_id": {"$gt": dish_id}}
+    ]}
+
+def test_created_at_cursor_round_trip():
+    dish_id = ObjectId()
+    created_at = datetime(2024, 5, 10, 12, 30)
+    cursor = encode_cursor({"_id": dish_id, "created_at": created_at}, "created_at")
+    assert decode_cursor(cursor, "created_at")["$or"][1] == {"created_at": created_at, "_id": {"$gt": dish_id}}
+
+def test_id_cursor_round_trip():
+    dish_id = ObjectId()
+    assert decode_cursor(encode_cursor({"_id": dish_id}, "_id"), "_id") == {"_id": {"$gt": dish_id}}
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor({"_id": ObjectId()}, "_id")])
+def test_invalid_or_mismatched_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "created_at")
+
+def test_parse_fields_builds_a_projection():
+    assert parse_fields("name, price,ingredients.name,") == {"name": 1, "price": 1, "ingredients.name": 1}
+    assert parse_fields("") is None
+    assert parse_fields(" , ") is None
+
+@pytest.mark.parametrize("fields", ["$where", "name,price;drop", "name:1"])
+def test_parse_fields_rejects_operators_and_odd_names(fields):
+    with pytest.raises(ValueError):
+        parse_fields(fields)
+
+def _dishes(count):
+    return [{"_id": ObjectId(), "name": f"Dish {i}"} for i in range(count)]
+
+def test_limited_ndjson_stream_ends_with_next_cursor():
+    dishes = _dishes(3)
+    second_id = dishes[1]["_id"]
+    # The cursor is limited to limit + 1 dishes
+    lines = [json.loads(line) for line in stream_dishes(iter(dishes), limit=2)]
+    assert [line.get("name") for line in lines[:2]] == ["Dish 0", "Dish 1"]
+    assert decode_cursor(lines[2]["next_cursor"], "_id") == {"_id": {"$gt": second_id}}
+
+def test_limited_ndjson_stream_on_last_page():
+    lines = [json.loads(line) for line in stream_dishes(iter(_dishes(2)), limit=2)]
+    assert len(lines) == 3
+    assert lines[2] == {"next_cursor": None}
+
+def test_unlimited_ndjson_stream_has_no_cursor_line():
+    lines = list(stream_dishes(iter(_dishes(2))))
+    assert len(lines) == 2
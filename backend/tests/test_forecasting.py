@@ -0,0 +1,85 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import consumption_archive
+import forecasting
+from forecasting import exponential_smoothing, forecast_demand, forecast_matrix, moving_average, weekday_factors
+
+def _smoothed(row, alpha):
+    level = row[0]
+    for value in row[1:]:
+        level = alpha * value + (1 - alpha) * level
+    return level
+
+def test_moving_average_uses_the_last_window_days():
+    history = np.array([[1.0, 2.0, 3.0, 4.0], [0.0, 0.0, 10.0, 20.0]])
+    assert moving_average(history, window=2).tolist() == [3.5, 15.0]
+
+def test_exponential_smoothing_matches_the_recursion():
+    history = np.random.default_rng(7).uniform(0, 50, size=(5, 30))
+    expected = [_smoothed(row, 0.3) for row in history]
+    assert exponential_smoothing(history, alpha=0.3) == pytest.approx(expected)
+
+def test_exponential_smoothing_without_history():
+    assert exponential_smoothing(np.empty((3, 0))).tolist() == [0.0, 0.0, 0.0]
+
+def test_weekday_factors_follow_a_weekly_pattern():
+    # Two weeks starting on a Monday: double consumption every Saturday
+    weekdays = np.arange(14) % 7
+    history = np.array([
+        np.where(weekdays == 5, 16.0, 8.0),
+        np.zeros(14),
+    ])
+    factors = weekday_factors(history, weekdays, weeks=2)
+    assert factors[0, 5] == pytest.approx(2 * factors[0, 0])
+    assert factors[1].tolist() == [1.0] * 7
+
+def test_forecast_matrix_dates_and_shapes():
+    dates = pd.date_range("2024-05-06", periods=14, freq="D")
+    history = np.full((2, 14), 4.0)
+    future, forecasts = forecast_matrix(history, dates, horizon=3)
+
+    assert [day.date().isoformat() for day in future] == ["2024-05-20", "2024-05-21", "2024-05-22"]
+    for method in forecasting.FORECAST_METHODS:
+        assert forecasts[method].shape == (2, 3)
+        assert forecasts[method] == pytest.approx(np.full((2, 3), 4.0))
+
+class _Consumption:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def find_one(self, query, projection, sort):
+        if not self.rows:
+            return None
+        return {"date": max(row["date"] for row in self.rows)}
+
+    def aggregate(self, pipeline):
+        totals = {}
+        for row in self.rows:
+            key = (row["ingredient"], row["date"].strftime("%Y-%m-%d"))
+            totals[key] = totals.get(key, 0) + row["consumption"]
+        return [{"_id": {"ingredient": ingredient, "day": day}, "consumption": total}
+                for (ingredient, day), total in totals.items()]
+
+class _Database:
+    def __init__(self, rows):
+        self.consumption = _Consumption(rows)
+
+def test_forecast_demand_fills_missing_days_with_zero(monkeypatch):
+    monkeypatch.setattr(consumption_archive, "archive_ready", lambda: False)
+    db = _Database([
+        {"ingredient": "Milk", "date": datetime(2024, 5, 1, 9), "consumption": 3.0},
+        {"ingredient": "Milk", "date": datetime(2024, 5, 1, 18), "consumption": 3.0},
+        {"ingredient": "Milk", "date": datetime(2024, 5, 3, 12), "consumption": 6.0},
+    ])
+    result = forecast_demand(db, horizon=2, window=3, history_days=3)
+
+    assert result["dates"] == ["2024-05-04", "2024-05-05"]
+    assert result["history_days"] == 3
+    assert result["forecasts"][0]["ingredient"] == "Milk"
+    assert result["forecasts"][0]["moving_average"] == [4.0, 4.0]
+
+def test_forecast_demand_without_history(monkeypatch):
+    monkeypatch.setattr(consumption_archive, "archive_ready", lambda: False)
+    assert forecast_demand(_Database([])) == {"dates": [], "history_days": 0, "forecasts": []}
@@ -0,0 +1,114 @@
+import pytest
+from bson import ObjectId
+from flask import Flask
+import ingredient_index
+from ingredient_index import canonicalize, find_dishes_endpoint, rebuild_index, singularize
+
+@pytest.mark.parametrize("word, singular", [
+    ("tomatoes", "tomato"),
+    ("berries", "berry"),
+    ("dishes", "dish"),
+    ("boxes", "box"),
+    ("glasses", "glass"),
+    ("leaves", "leaf"),
+    ("eggs", "egg"),
+    ("chives", "chive"),
+    ("asparagus", "asparagus"),
+    ("hummus", "hummus"),
+    ("basis", "basis"),
+    ("gas", "gas"),
+    ("egg", "egg"),
+])
+def test_singularize(word, singular):
+    assert singularize(word) == singular
+
+@pytest.mark.parametrize("name, key", [
+    ("Fresh  Tomatoes", "fresh tomato"),
+    ("fresh tomato", "fresh tomato"),
+    ("Extra-Virgin Olive Oil!", "extra virgin olive oil"),
+    ("Chili (dried) Flakes", "chili dried flake"),
+    ("  ", ""),
+])
+def test_canonicalize(name, key):
+    assert canonicalize(name) == key
+
+class _Collection:
+    def __init__(self, db, name, docs=()):
+        self.db = db
+        self.name = name
+        self.docs = list(docs)
+        self.entries = {}
+
+    def find(self, query=None, projection=None):
+        return list(self.docs)
+
+    def drop(self):
+        self.entries = {}
+
+    def create_index(self, keys):
+        return "_".join(key for key, _ in keys)
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            key = op._filter["_id"]
+            if key not in self.entries and not op._upsert:
+                continue
+            entry = self.entries.setdefault(key, {})
+            for field, value in op._doc["$addToSet"].items():
+                entry.setdefault(field, [])
+                if value not in entry[field]:
+                    entry[field].append(value)
+
+    def delete_many(self, query):
+        self.db.live_deletes += 1
+        self.entries = {}
+
+    def count_documents(self, query):
+        return len(self.entries)
+
+    def rename(self, new_name, dropTarget=False):
+        assert dropTarget
+        self.db.collections[new_name] = self
+        del self.db.collections[self.name]
+        self.name = new_name
+
+class _Database:
+    def __init__(self, dishes, menus):
+        self.live_deletes = 0
+        self.collections = {
+            "dishes": _Collection(self, "dishes", dishes),
+            "menus": _Collection(self, "menus", menus),
+            "ingredient_index": _Collection(self, "ingredient_index"),
+        }
+        self.collections["ingredient_index"].entries = {"stale": {"dish_ids": ["gone"]}}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, _Collection(self, name))
+
+    def __getattr__(self, name):
+        return self[name]
+
+def test_rebuild_swaps_in_a_new_index():
+    dish_id = ObjectId()
+    db = _Database(
+        dishes=[{"_id": dish_id, "ingredients": [{"name": "Tomatoes"}, "Basil"]}],
+        menus=[{"_id": "menu-1", "dishes": [str(dish_id)]}]
+    )
+    live = db.ingredient_index
+
+    assert rebuild_index(db) == {"ingredients": 2}
+    assert db.live_deletes == 0
+    assert db.ingredient_index is not live
+    assert ingredient_index.REBUILD_COLLECTION not in db.collections
+    assert db.ingredient_index.entries == {
+        "tomato": {"dish_ids": [dish_id], "names": ["Tomatoes"], "menu_ids": ["menu-1"]},
+        "basil": {"dish_ids": [dish_id], "names": ["Basil"], "menu_ids": ["menu-1"]},
+    }
+
+@pytest.mark.parametrize("limit", ["0", "-1", str(ingredient_index.MAX_MATCH_LIMIT + 1)])
+def test_find_dishes_rejects_out_of_range_limit(limit):
+    app = Flask(__name__)
+    with app.test_request_context(f"/dishes/by-ingredients?ingredients=basil&limit={limit}"):
+        response, status = find_dishes_endpoint(db=None)
+    assert status == 400
+    assert response.get_json()["success"] is False
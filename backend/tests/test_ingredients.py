@@ -0,0 +1,17 @@
+import pytest
+from ingredients import read_image_url
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd",
+    "ftp://example.com/image.png",
+    "http://127.0.0.1/image.png",
+    "http://localhost:5001/uploads/x.png",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/image.png",
+    "http://192.168.1.10/image.png",
+    "http://[::1]/image.png",
+    "http://[::ffff:127.0.0.1]/image.png",
+])
+def test_read_image_url_rejects_non_public_targets(url):
+    with pytest.raises(ValueError):
+        read_image_url(url)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import pytest
+from inventory import ExpiryQueue, convert_quantity, find_surplus, movement_update
+
+NOW = datetime(2024, 5, 10, 15, 30)
+
+def _item(key, days, quantity=5.0):
+    return {
+        "_id": key,
+        "name": key.title(),
+        "quantity": quantity,
+        "unit": "kg",
+        "expiry_date": datetime(2024, 5, 10) + timedelta(days=days)
+    }
+
+ITEMS = [
+    _item("milk", -1),
+    _item("cream", 0),
+    _item("tomato", 3),
+    _item("rice", 30),
+    {"_id": "salt", "name": "Salt", "quantity": 2.0}
+]
+
+def test_expiry_queue_surplus_excludes_expired_items():
+    queue = ExpiryQueue()
+    queue.load(ITEMS)
+    surplus = queue.surplus(within_days=7, par_level=0, now=NOW)
+    assert [item["name"] for item in surplus] == ["Cream", "Tomato"]
+
+class _Cursor(list):
+    def sort(self, key, direction):
+        return _Cursor(sorted(self, key=lambda item: item[key]))
+
+class _Inventory:
+    def find(self, query):
+        expiry = query["expiry_date"]
+        return _Cursor(
+            item for item in ITEMS
+            if "expiry_date" in item
+            and expiry["$gte"] <= item["expiry_date"] <= expiry["$lte"]
+            and item["quantity"] > query["quantity"]["$gt"]
+        )
+
+class _Db:
+    inventory = _Inventory()
+
+def test_find_surplus_queries_from_today():
+    surplus = find_surplus(_Db(), within_days=7, par_level=0, now=NOW)
+    assert [item["name"] for item in surplus] == ["Cream", "Tomato"]
+
+def test_movement_converted_into_stored_unit():
+    assert convert_quantity(500, "g", "kg") == pytest.approx(0.5)
+    assert convert_quantity(2, "tbsp", "ml") == pytest.approx(30)
+    assert convert_quantity(3, None, "kg") == 3
+    assert convert_quantity(3, "Kg", "kg") == 3
+
+def test_movement_in_another_dimension_is_rejected():
+    with pytest.raises(ValueError):
+        convert_quantity(500, "ml", "kg")
+    with pytest.raises(ValueError):
+        convert_quantity(2, "pcs", "kg")
+
+def test_delivery_keeps_earliest_expiry_of_stock_on_hand():
+    delivery = datetime(2024, 6, 1)
+    fields = movement_update("Milk", 2.0, "l", delivery)[0]["$set"]
+    assert fields["expiry_date"] == {"$cond": [
+        {"$gt": [{"$ifNull": ["$quantity", 0]}, 0]},
+        {"$min": ["$expiry_date", delivery]},
+        delivery
+    ]}
@@ -0,0 +1,76 @@
+import os
+import llm_cache
+from llm_cache import LLMCache
+
+def test_disk_tier_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = LLMCache(path=str(path))
+    assert not path.exists()
+
+    cache.set("model", "prompt", "response")
+    assert path.exists()
+
+def test_disk_tier_is_reopened_after_fork(tmp_path, monkeypatch):
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set("model", "prompt", "response")
+    parent_conn = cache._connection()
+
+    child_pid = os.getpid() + 1
+    monkeypatch.setattr(llm_cache.os, "getpid", lambda: child_pid)
+    child_conn = cache._connection()
+    assert child_conn is not parent_conn
+
+    cache.memory.clear()
+    assert cache.get("model", "prompt") == "response"
+
+def test_unusable_path_disables_the_disk_tier(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "missing" / "cache.sqlite3"))
+    cache.set("model", "prompt", "response")
+    assert cache.stats()["disk_entries"] is None
+    assert cache.get("model", "prompt") == "response"
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def _disk_get(cache, prompt):
+    # Skip the memory tier so the lookup reaches SQLite
+    cache.memory.clear()
+    return cache.get("model", prompt)
+
+def test_disk_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.set("model", "prompt", "response")
+
+    clock.now += 59
+    assert _disk_get(cache, "prompt") == "response"
+    clock.now += 2
+    assert _disk_get(cache, "prompt") is None
+
+def test_disk_tier_evicts_the_least_recently_used(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("model", "a", "A")
+    clock.now += 1
+    cache.set("model", "b", "B")
+    clock.now += 1
+    assert _disk_get(cache, "a") == "A"
+    clock.now += 1
+    cache.set("model", "c", "C")
+
+    assert cache.stats()["disk_entries"] == 2
+    assert _disk_get(cache, "b") is None
+    assert _disk_get(cache, "a") == "A"
+    assert _disk_get(cache, "c") == "C"
+
+def test_prompts_differing_only_in_whitespace_share_an_entry(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set("model", "Create  2 dishes\n using basil", "response")
+    assert _disk_get(cache, "Create 2 dishes using basil") == "response"
+    assert cache.get("other-model", "Create 2 dishes using basil") is None
@@ -0,0 +1,42 @@
+import threading
+import time
+import pytest
+from llm_client import RateLimiter
+
+def test_expired_ticket_leaves_queue_without_spending_budget():
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=1000)
+    limiter.acquire("interactive", 10)
+    requests_left = limiter.requests.tokens
+
+    with pytest.raises(TimeoutError):
+        limiter.acquire("batch", 10, deadline=time.monotonic() + 0.05)
+
+    stats = limiter.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["lanes"]["batch"]["timed_out"] == 1
+    assert stats["lanes"]["batch"]["admitted"] == 0
+    assert limiter.requests.tokens <= requests_left + 0.01
+
+def test_expired_ticket_at_front_unblocks_the_next_caller():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1000)
+    limiter.tokens.tokens = 0
+    errors = []
+
+    def too_large():
+        # Needs a minute of token refill: stays at the front until its deadline
+        try:
+            limiter.acquire("interactive", 1000, deadline=time.monotonic() + 0.2)
+        except TimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=too_large)
+    thread.start()
+    for _ in range(200):
+        if limiter.stats()["queue_depth"]:
+            break
+        time.sleep(0.005)
+
+    waited = limiter.acquire("batch", 1)
+    thread.join()
+    assert len(errors) == 1
+    assert 0.1 < waited < 2
@@ -0,0 +1,47 @@
+import threading
+import time
+import menu_optimization
+
+def test_timed_out_sections_do_not_hold_up_later_runs(monkeypatch):
+    release = threading.Event()
+    deadlines = []
+
+    def generate(prompt, use_cache=True, deadline=None):
+        deadlines.append(deadline)
+        if prompt == "slow":
+            release.wait(5)
+        return {prompt: [prompt]}
+
+    monkeypatch.setattr(menu_optimization, "generate_ai_response", generate)
+    try:
+        # Enough stuck calls to fill any fixed-size pool
+        slow = menu_optimization.run_section_prompts({f"s{i}": "slow" for i in range(8)}, timeout=0.1)
+        assert slow["missing_sections"] == [f"s{i}" for i in range(8)]
+
+        start = time.monotonic()
+        fast = menu_optimization.run_section_prompts({"fast": "fast"}, timeout=1)
+        assert fast == {"fast": ["fast"]}
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+    assert all(deadline is not None for deadline in deadlines)
+
+def test_combined_fallback_shares_the_combined_deadline(monkeypatch):
+    deadlines = {}
+
+    def generate(prompt, use_cache=True, deadline=None):
+        if prompt.startswith("Surplus ingredients"):
+            deadlines["combined"] = deadline
+            return {"daily_specials": [], "new_dishes": "malformed"}
+        deadlines[prompt] = deadline
+        return {"new_dishes": ["dish"], "cost_optimizations": ["saving"]}
+
+    monkeypatch.setattr(menu_optimization, "generate_ai_response", generate)
+    monkeypatch.setattr(menu_optimization, "build_section_prompts", lambda surplus, menu: {
+        "daily_specials": "specials", "cost_optimizations": "costs", "new_dishes": "new"
+    })
+    result = menu_optimization.run_combined_prompt([], [])
+
+    assert result == {"daily_specials": [], "cost_optimizations": ["saving"], "new_dishes": ["dish"]}
+    assert deadlines["combined"] is not None
+    assert deadlines["costs"] == deadlines["new"] == deadlines["combined"]
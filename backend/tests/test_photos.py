@@ -0,0 +1,44 @@
+import app as app_module
+import photos
+
+PHOTO_HASH = "ab" * 32
+
+def _use_folders(tmp_path, monkeypatch):
+    originals = tmp_path / "originals"
+    variants = tmp_path / "variants"
+    originals.mkdir()
+    variants.mkdir()
+    monkeypatch.setattr(photos, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(photos, "ORIGINALS_FOLDER", str(originals))
+    monkeypatch.setattr(photos, "VARIANTS_FOLDER", str(variants))
+    return originals, variants
+
+def test_photo_variants_do_not_depend_on_generated_files(tmp_path, monkeypatch):
+    _use_folders(tmp_path, monkeypatch)
+    variants = photos.photo_variants(f"/uploads/originals/{PHOTO_HASH}.jpg")
+    assert variants == {
+        str(width): f"/uploads/variants/{PHOTO_HASH}-{width}.webp" for width in photos.VARIANT_WIDTHS
+    }
+    assert photos.photo_variants("/uploads/legacy.jpg") == {}
+
+def test_missing_variant_falls_back_to_original(tmp_path, monkeypatch):
+    originals, variants = _use_folders(tmp_path, monkeypatch)
+    (originals / f"{PHOTO_HASH}.jpg").write_bytes(b"original")
+    queued = []
+    monkeypatch.setattr(photos, "queue_variants", lambda path, photo_hash: queued.append(photo_hash))
+
+    with app_module.app.test_request_context():
+        response = photos.serve_upload(f"variants/{PHOTO_HASH}-320.webp")
+        response.direct_passthrough = False
+        assert response.status_code == 200
+        assert response.get_data() == b"original"
+        assert response.cache_control.no_cache
+        assert not response.cache_control.immutable
+    assert queued == [PHOTO_HASH]
+
+    (variants / f"{PHOTO_HASH}-320.webp").write_bytes(b"variant")
+    with app_module.app.test_request_context():
+        response = photos.serve_upload(f"variants/{PHOTO_HASH}-320.webp")
+        response.direct_passthrough = False
+        assert response.get_data() == b"variant"
+        assert response.cache_control.immutable
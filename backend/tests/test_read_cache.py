@@ -0,0 +1,23 @@
+from bson import ObjectId
+import read_cache
+
+def test_dish_entries_are_only_served_at_their_version():
+    dish_id = ObjectId()
+    read_cache.cache_dishes({dish_id: {"name": "Old"}}, 1)
+
+    found, missing = read_cache.get_cached_dishes([dish_id], 1)
+    assert found == {dish_id: {"name": "Old"}}
+    assert missing == []
+
+    # Another process bumped the dishes version
+    found, missing = read_cache.get_cached_dishes([dish_id], 2)
+    assert found == {}
+    assert missing == [dish_id]
+
+def test_menu_entries_are_only_served_at_their_versions():
+    menu = {"_id": str(ObjectId()), "name": "Lunch", "dishes": []}
+    read_cache.cache_menu(menu, (3, 7))
+
+    assert read_cache.get_cached_menu(menu["_id"], (3, 7)) == menu
+    assert read_cache.get_cached_menu(menu["_id"], (3, 8)) is None
+    assert read_cache.get_cached_menu(menu["_id"], (4, 7)) is None
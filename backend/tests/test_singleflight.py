@@ -0,0 +1,65 @@
+import threading
+import time
+import pytest
+from singleflight import SingleFlight
+
+def _run_coalesced(flight, func, callers=4):
+    """Start callers on one key while the leader is held inside func"""
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = [None] * callers
+
+    def leader_func():
+        started.set()
+        release.wait(5)
+        return func()
+
+    def call(i):
+        try:
+            outcomes[i] = ("ok", flight.do("key", leader_func))
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    started.wait(5)
+    for i in range(1, callers):
+        threads.append(threading.Thread(target=call, args=(i,)))
+        threads[-1].start()
+    # Waiters join the call once they have been counted as coalesced
+    while flight.coalesced < callers - 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+    error = RuntimeError("model unavailable")
+
+    def fail():
+        raise error
+
+    outcomes = _run_coalesced(flight, fail)
+    assert outcomes == [("error", error)] * 4
+    assert flight.executed == 1
+    assert flight.stats()["in_flight"] == 0
+
+def test_failures_are_not_remembered():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("first")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: {"ok": True}) == {"ok": True}
+    assert flight.executed == 2
+
+def test_every_caller_gets_its_own_copy():
+    flight = SingleFlight()
+    outcomes = _run_coalesced(flight, lambda: {"dishes": []})
+    results = [result for _, result in outcomes]
+    assert results == [{"dishes": []}] * 4
+    assert len({id(result) for result in results}) == 4
@@ -0,0 +1,13 @@
+import app as app_module
+
+def test_llm_stats_route():
+    client = app_module.app.test_client()
+    response = client.get("/stats/llm")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["success"] is True
+    assert "cache" in data
+    assert "coalescing" in data
+    assert "rate_limiter" in data
+    assert "clients" in data
@@ -0,0 +1,37 @@
+from datetime import date
+import pytest
+from surplus_matching import DishMatrix, score_dishes
+
+TODAY = date(2024, 5, 10)
+
+def _dish(*ingredients):
+    return {"name": "Dish", "ingredients": [
+        {"name": name, "quantity": quantity, "unit": unit} for name, quantity, unit in ingredients
+    ]}
+
+def _coverage(dish, surplus):
+    _, coverage, _ = score_dishes(DishMatrix([dish]), surplus, TODAY)
+    return float(coverage[0])
+
+def test_quantities_are_compared_in_base_units():
+    dish = _dish(("Flour", 500, "g"), ("Milk", 1, "l"))
+    surplus = [
+        {"name": "flour", "quantity": 0.25, "unit": "kg", "expiry_date": "2024-05-12"},
+        {"name": "milk", "quantity": 2000, "unit": "ml", "expiry_date": "2024-05-12"}
+    ]
+    # 250 g of 500 g flour, all of the milk
+    assert _coverage(dish, surplus) == pytest.approx(0.75)
+
+def test_unconvertible_units_fall_back_to_presence():
+    dish = _dish(("Egg", 3, "pcs"), ("Garlic", 2, "cloves"))
+    surplus = [
+        {"name": "egg", "quantity": 0.1, "unit": "kg", "expiry_date": "2024-05-12"},
+        {"name": "garlic", "quantity": 1, "unit": "cloves", "expiry_date": "2024-05-12"}
+    ]
+    # Eggs by weight cannot be compared with eggs by count, so they count as covered
+    assert _coverage(dish, surplus) == pytest.approx((1.0 + 0.5) / 2)
+
+def test_missing_ingredients_are_not_covered():
+    dish = _dish(("Rice", 200, "g"), ("Basil", 1, "bunch"))
+    surplus = [{"name": "basil", "quantity": 2, "unit": "bunch", "expiry_date": "2024-05-12"}]
+    assert _coverage(dish, surplus) == pytest.approx(0.5)
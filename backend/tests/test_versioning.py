@@ -0,0 +1,79 @@
+import pytest
+from flask import Flask, jsonify
+import versioning
+from versioning import cached_json_response, current_versions
+
+class _Versions:
+    def __init__(self, versions):
+        self.versions = versions
+        self.reads = 0
+
+    def find(self, query):
+        self.reads += 1
+        return [{"_id": name, "version": version} for name, version in self.versions.items()]
+
+class _Database:
+    def __init__(self, **versions):
+        self.collection_versions = _Versions(versions)
+
+@pytest.fixture
+def app():
+    versioning.response_cache.clear()
+    return Flask(__name__)
+
+def test_build_reuses_the_versions_read_for_the_etag(app):
+    db = _Database(menus=3, dishes=7)
+    seen = []
+
+    def build():
+        seen.append(current_versions(db, ["menus", "dishes"]))
+        return jsonify({"success": True})
+
+    with app.test_request_context("/menus/1"):
+        response = cached_json_response(db, ["menus", "dishes"], build)
+
+    assert response.status_code == 200
+    assert seen == [(3, 7)]
+    assert db.collection_versions.reads == 1
+
+def test_current_versions_reads_collections_it_was_not_given(app):
+    db = _Database(menus=3, dishes=7)
+    with app.test_request_context("/menus"):
+        cached_json_response(db, ["dishes"], lambda: jsonify({}))
+        assert current_versions(db, ["menus", "dishes"]) == (3, 7)
+    assert db.collection_versions.reads == 2
+
+def _large_body():
+    return jsonify({"dishes": ["dish"] * 1000})
+
+def test_gzip_and_identity_bodies_have_distinct_etags(app):
+    db = _Database(dishes=1)
+    with app.test_request_context("/get-dishes"):
+        identity = cached_json_response(db, ["dishes"], _large_body)
+    with app.test_request_context("/get-dishes", headers={"Accept-Encoding": "gzip"}):
+        compressed = cached_json_response(db, ["dishes"], _large_body)
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.get_etag()[0] == identity.get_etag()[0] + "-gz"
+
+@pytest.mark.parametrize("encoding", ["", "gzip"])
+def test_if_none_match_accepts_either_variant(app, encoding):
+    db = _Database(dishes=1)
+    with app.test_request_context("/get-dishes", headers={"Accept-Encoding": encoding}):
+        etag = cached_json_response(db, ["dishes"], _large_body).get_etag()[0]
+
+    with app.test_request_context("/get-dishes", headers={"If-None-Match": f'"{etag}"'}):
+        response = cached_json_response(db, ["dishes"], _large_body)
+    assert response.status_code == 304
+    assert response.get_etag()[0] == etag
+
+def test_new_version_invalidates_the_etag(app):
+    db = _Database(dishes=1)
+    with app.test_request_context("/get-dishes"):
+        etag = cached_json_response(db, ["dishes"], _large_body).get_etag()[0]
+
+    db.collection_versions.versions["dishes"] = 2
+    with app.test_request_context("/get-dishes", headers={"If-None-Match": f'"{etag}"'}):
+        response = cached_json_response(db, ["dishes"], _large_body)
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
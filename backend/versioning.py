@@ -0,0 +1,167 @@
+from flask import request, make_response, current_app, g, has_app_context
+import gzip
+import hashlib
+import logging
+import os
+from db_config import causal_reads
+from ttl_cache import TTLCache
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Serialized read responses kept per (request, collection versions);
+# 0 turns off the body cache and ETags, e.g. for benchmarks
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE)
+
+def bump_version(db, name):
+    """Record a write to a collection; every write handler must call this"""
+    db.collection_versions.update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+async def bump_version_async(db, name):
+    """bump_version for Motor databases"""
+    await db.collection_versions.update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+def get_versions(db, names):
+    """Current write counters of the given collections, in order"""
+    versions = {doc["_id"]: doc.get("version", 0) for doc in db.collection_versions.find({"_id": {"$in": list(names)}})}
+    return tuple(versions.get(name, 0) for name in names)
+
+async def get_versions_async(db, names):
+    """get_versions for Motor databases"""
+    versions = {doc["_id"]: doc.get("version", 0) async for doc in db.collection_versions.find({"_id": {"$in": list(names)}})}
+    return tuple(versions.get(name, 0) for name in names)
+
+def _remember_versions(ctx_globals, collections, versions):
+    ctx_globals.collection_versions = dict(zip(collections, versions))
+
+def _known_versions(ctx_globals, names):
+    known = ctx_globals.get("collection_versions") or {}
+    if all(name in known for name in names):
+        return tuple(known[name] for name in names)
+    return None
+
+def current_versions(db, names):
+    """get_versions, reusing the versions cached_json_response read for this request"""
+    versions = _known_versions(g, names) if has_app_context() else None
+    return versions if versions is not None else get_versions(db, names)
+
+async def current_versions_async(db, names):
+    """current_versions for the Quart app on Motor"""
+    from quart import g as async_g, has_app_context as has_async_app_context
+
+    versions = _known_versions(async_g, names) if has_async_app_context() else None
+    return versions if versions is not None else await get_versions_async(db, names)
+
+def _response_key(req, versions):
+    """Body cache key and ETag of a request at the given collection versions"""
+    key = (req.full_path, versions)
+    return key, hashlib.sha1(repr(key).encode()).hexdigest()
+
+def _gzip_etag(etag):
+    # The gzip body is a different representation, so it gets its own tag
+    return etag + "-gz"
+
+def _matching_etag(req, etag):
+    """The variant of etag the client sent in If-None-Match, if any"""
+    for candidate in (etag, _gzip_etag(etag)):
+        if candidate in req.if_none_match:
+            return candidate
+    return None
+
+def _not_modified(response_class, etag):
+    response = response_class("", status=304)
+    response.set_etag(etag)
+    return response
+
+def _cache_entry(body, mimetype):
+    compressed = gzip.compress(body) if len(body) >= GZIP_MIN_BYTES else None
+    return (body, compressed, mimetype)
+
+def _serve_entry(response_class, req, entry, etag):
+    body, compressed, mimetype = entry
+    if compressed is not None and "gzip" in req.headers.get("Accept-Encoding", ""):
+        response = response_class(compressed)
+        response.headers["Content-Encoding"] = "gzip"
+        etag = _gzip_etag(etag)
+    else:
+        response = response_class(body)
+    response.mimetype = mimetype
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    # Clients may store the body but must revalidate it on every use
+    response.cache_control.no_cache = True
+    return response
+
+def cached_json_response(db, collections, build):
+    """Serve a read endpoint with ETags and a per-version body cache.
+
+    The ETag is derived from the request and the write counters of the
+    collections the response depends on. A matching If-None-Match gets a
+    304; otherwise the body built for the current versions is reused,
+    gzip-compressed ahead of time when large enough.
+
+    With a secondary read preference the versions and the body are read in
+    one causally consistent session, so a body is never older than the
+    versions it is cached and tagged under.
+    """
+    if not RESPONSE_CACHE_SIZE:
+        return build()
+
+    with causal_reads(db):
+        versions = get_versions(db, collections)
+        # build reuses these through current_versions
+        _remember_versions(g, collections, versions)
+        key, etag = _response_key(request, versions)
+        matched = _matching_etag(request, etag)
+        if matched:
+            return _not_modified(current_app.response_class, matched)
+
+        entry = response_cache.get(key)
+        if entry is None:
+            response = make_response(build())
+            if response.status_code != 200:
+                return response
+            entry = _cache_entry(response.get_data(), response.mimetype)
+            response_cache.set(key, entry)
+
+    return _serve_entry(current_app.response_class, request, entry, etag)
+
+async def cached_json_response_async(db, collections, build):
+    """cached_json_response for the Quart app on Motor.
+
+    build is called with the database to read from and returns an awaitable
+    of the view's result. With a secondary read preference that database
+    reads in the causally consistent session the versions were read in.
+    """
+    from quart import request as async_request, current_app as async_app, make_response as make_async_response, g as async_g
+    from async_db import causal_reads_async
+
+    if not RESPONSE_CACHE_SIZE:
+        return await build(db)
+
+    async with causal_reads_async(db) as session_db:
+        versions = await get_versions_async(session_db, collections)
+        _remember_versions(async_g, collections, versions)
+        key, etag = _response_key(async_request, versions)
+        matched = _matching_etag(async_request, etag)
+        if matched:
+            return _not_modified(async_app.response_class, matched)
+
+        entry = response_cache.get(key)
+        if entry is None:
+            response = await make_async_response(await build(session_db))
+            if response.status_code != 200:
+                return response
+            entry = _cache_entry(await response.get_data(), response.mimetype)
+            response_cache.set(key, entry)
+
+    return _serve_entry(async_app.response_class, async_request, entry, etag)
+
+def response_cache_stats():
+    return response_cache.stats()